@@ -0,0 +1,187 @@
+"""Agendador justo para as chamadas ao Gemini.
+
+- Concorrência global limitada.
+- No máximo um pedido em andamento por usuário (o histórico fica coerente).
+- Rodízio entre servidores e, dentro de cada servidor, entre usuários:
+  um servidor movimentado não monopoliza as vagas.
+- Controle de admissão: com a fila cheia o pedido é recusado na hora,
+  com uma estimativa de espera.
+"""
+import asyncio
+import math
+import time
+from collections import deque
+
+
+class FilaCheia(Exception):
+    def __init__(self, eta: float):
+        super().__init__(f"fila cheia, tente em ~{eta:.0f}s")
+        self.eta = eta
+
+
+class Pedido:
+    __slots__ = ("user_id", "grupo", "posicao", "liberado", "evento")
+
+    def __init__(self, user_id: int, grupo: int):
+        self.user_id = user_id
+        self.grupo = grupo
+        self.posicao = 0
+        self.liberado = False
+        self.evento = asyncio.Event()
+
+
+class AgendadorIA:
+    def __init__(self, concorrencia: int, max_fila: int, tempo_inicial: float = 15.0):
+        self.concorrencia = concorrencia
+        self.max_fila = max_fila
+        self.tempo_medio = tempo_inicial  # média móvel da duração de um pedido
+        self.ativos = 0
+        self.na_fila = 0
+        self._pendentes: dict[int, deque[Pedido]] = {}  # por usuário
+        self._ocupados: set[int] = set()                # usuários com pedido em andamento
+        self._prontos: dict[int, deque[int]] = {}       # por grupo: usuários que podem andar
+        self._rodizio: deque[int] = deque()             # grupos com usuários prontos
+
+    def eta(self, posicao: int) -> float:
+        """Espera estimada, em segundos, para quem está na posição dada."""
+        return math.ceil(posicao / self.concorrencia) * self.tempo_medio
+
+    async def executar(self, user_id: int, grupo: int, fabrica, ao_mudar_posicao=None):
+        """Espera a vez do usuário e roda `fabrica()`.
+
+        `ao_mudar_posicao(posicao)` é chamado enquanto o pedido espera,
+        sempre que a posição na fila muda.
+        """
+        if self.na_fila >= self.max_fila:
+            raise FilaCheia(self.eta(self.na_fila + 1))
+
+        pedido = Pedido(user_id, grupo)
+        self._enfileirar(pedido)
+        self._despachar()
+
+        anunciada = 0
+        try:
+            while not pedido.liberado:
+                if ao_mudar_posicao and pedido.posicao != anunciada:
+                    anunciada = pedido.posicao
+                    await ao_mudar_posicao(anunciada)
+                    continue
+                pedido.evento.clear()
+                await pedido.evento.wait()
+        except BaseException:
+            if pedido.liberado:
+                self._concluir(pedido)
+            else:
+                self._remover(pedido)
+            raise
+
+        inicio = time.monotonic()
+        try:
+            return await fabrica()
+        finally:
+            self.tempo_medio = 0.8 * self.tempo_medio + 0.2 * (time.monotonic() - inicio)
+            self._concluir(pedido)
+
+    # ------------------------------
+    # Estruturas internas
+    # ------------------------------
+    def _enfileirar(self, pedido: Pedido):
+        fila = self._pendentes.setdefault(pedido.user_id, deque())
+        fila.append(pedido)
+        self.na_fila += 1
+        if len(fila) == 1 and pedido.user_id not in self._ocupados:
+            self._marcar_pronto(pedido.user_id, pedido.grupo)
+
+    def _marcar_pronto(self, user_id: int, grupo: int):
+        prontos = self._prontos.get(grupo)
+        if prontos is None:
+            prontos = self._prontos[grupo] = deque()
+            self._rodizio.append(grupo)
+        prontos.append(user_id)
+
+    def _remover(self, pedido: Pedido):
+        fila = self._pendentes[pedido.user_id]
+        era_primeiro = fila[0] is pedido
+        fila.remove(pedido)
+        self.na_fila -= 1
+        if era_primeiro and pedido.user_id not in self._ocupados:
+            self._desmarcar_pronto(pedido.user_id, pedido.grupo)
+            if fila:
+                self._marcar_pronto(pedido.user_id, fila[0].grupo)
+        if not fila:
+            del self._pendentes[pedido.user_id]
+        self._atualizar_posicoes()
+
+    def _desmarcar_pronto(self, user_id: int, grupo: int):
+        prontos = self._prontos[grupo]
+        prontos.remove(user_id)
+        if not prontos:
+            del self._prontos[grupo]
+            self._rodizio.remove(grupo)
+
+    def _concluir(self, pedido: Pedido):
+        self.ativos -= 1
+        self._ocupados.discard(pedido.user_id)
+        fila = self._pendentes.get(pedido.user_id)
+        if fila:
+            self._marcar_pronto(pedido.user_id, fila[0].grupo)
+        self._despachar()
+
+    def _despachar(self):
+        liberou = False
+        while self.ativos < self.concorrencia and self._rodizio:
+            grupo = self._rodizio.popleft()
+            prontos = self._prontos[grupo]
+            user_id = prontos.popleft()
+            if prontos:
+                self._rodizio.append(grupo)
+            else:
+                del self._prontos[grupo]
+
+            fila = self._pendentes[user_id]
+            pedido = fila.popleft()
+            if not fila:
+                del self._pendentes[user_id]
+            self.na_fila -= 1
+            self.ativos += 1
+            self._ocupados.add(user_id)
+            pedido.liberado = True
+            pedido.posicao = 0
+            pedido.evento.set()
+            liberou = True
+        if liberou or self.na_fila:
+            self._atualizar_posicoes()
+
+    def _atualizar_posicoes(self):
+        """Simula o rodízio sobre a fila atual e avisa quem mudou de posição.
+
+        Usuários ocupados entram no fim do rodízio do seu grupo, já que só
+        andam depois que o pedido em curso terminar.
+        """
+        filas: dict[int, deque[deque[Pedido]]] = {}
+        rodizio = deque(self._rodizio)
+        for grupo in self._rodizio:
+            filas[grupo] = deque(deque(self._pendentes[uid]) for uid in self._prontos[grupo])
+        for user_id in self._ocupados:
+            fila = self._pendentes.get(user_id)
+            if fila:
+                grupo = fila[0].grupo
+                if grupo not in filas:
+                    filas[grupo] = deque()
+                    rodizio.append(grupo)
+                filas[grupo].append(deque(fila))
+
+        posicao = 0
+        while rodizio:
+            grupo = rodizio.popleft()
+            usuarios = filas[grupo]
+            fila = usuarios.popleft()
+            pedido = fila.popleft()
+            posicao += 1
+            if pedido.posicao != posicao:
+                pedido.posicao = posicao
+                pedido.evento.set()
+            if fila:
+                usuarios.append(fila)
+            if usuarios:
+                rodizio.append(grupo)
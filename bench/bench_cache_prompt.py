@@ -0,0 +1,146 @@
+"""Verificação do cache do SYSTEM_PROMPT contra o stub do Gemini (sem rede).
+
+Sobe bench/stub_gemini.py no próprio processo, importa main com
+GEMINI_BASE_URL apontando para ele e passa o CacheSystemPrompt real (com o
+SDK real) por todo o ciclo de vida, adiantando o relógio dos caches:
+
+1. criação no início, gerações citando o cache;
+2. renovação perto do fim do TTL (mesmo nome);
+3. um 400 que não é do cache (entrada longa demais) não derruba o cache;
+4. cache expirado no servidor: a geração cai para o prompt inline;
+5. recriação depois da espera;
+6. criação recusada pelo servidor: segue inline;
+7. encerramento apaga os caches.
+
+    python bench/bench_cache_prompt.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.stub_gemini import ConfigStub, criar_app  # noqa: E402
+
+
+class Relogio:
+    """time.monotonic com um deslocamento ajustável."""
+
+    def __init__(self):
+        self.deslocamento = 0.0
+
+    def __call__(self) -> float:
+        return time.monotonic() + self.deslocamento
+
+
+async def verificar():
+    config = ConfigStub(ttft=0.0, variacao=0.0, trechos=2, intervalo=0.0, tamanho=200)
+    app = criar_app(config)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    porta = runner.addresses[0][1]
+    url = f"http://127.0.0.1:{porta}"
+    estado = app["estado"]
+
+    async def stub(caminho: str, metodo: str = "GET") -> dict:
+        async with aiohttp.ClientSession() as sessao:
+            async with sessao.request(metodo, url + caminho) as resposta:
+                return await resposta.json()
+
+    os.environ.update({
+        "DISCORD_TOKEN": "token-falso", "GEMINI_API_KEY": "chave-falsa",
+        "GEMINI_BASE_URL": url, "GEMINI_CACHE_PROMPT": "1",
+        "GEMINI_CACHE_TTL": "3600", "BOT_MODO_ENXUTO": "1", "METRICAS_PORTA": "0", "VIGIA_ATIVO": "0",
+        "LOGS_DIR": tempfile.mkdtemp(prefix="bench_cache_"), "IA_HISTORICO_DB": "", "IMG_CACHE_DIR": "",
+    })
+    import main  # constrói o bot sem conectar ao Discord
+
+    await main.iniciar_servicos()
+    try:
+        await main.preparar_gemini()
+        nivel = main.roteador.leve
+        cache = main.caches_prompt[next(k for k in main.caches_prompt if k[1] == nivel.modelo)]
+        relogio = Relogio()
+        cache.relogio = relogio
+        pergunta = [main._content("user", "oi")]
+
+        def passo(descricao: str):
+            print(f"ok  {descricao}")
+
+        # 1. Criação
+        assert cache.ativo and (await stub("/status"))["caches_ativos"] == len(main.caches_prompt)
+        nome = cache.nome
+        await main.gerar_resposta(pergunta, nivel)
+        assert estado["com_cache"] == 1, estado
+        passo(f"criado {nome}; geração citou o cache")
+
+        # 2. Renovação perto do fim do TTL
+        relogio.deslocamento = cache.ttl - cache.margem + 1
+        await cache.renovar_se_preciso()
+        assert cache.nome == nome and estado["renovacoes"] == 1 and cache.expira - relogio() > cache.margem
+        passo("renovado antes de vencer, mesmo nome")
+
+        # 3. 400 que não é do cache
+        config.max_entrada = 50
+        chamadas = estado["chamadas"]
+        try:
+            await main.gerar_resposta([main._content("user", "x" * 200)], nivel)
+        except Exception as e:
+            assert main.status_do_erro(e) == 400, e
+        else:
+            raise AssertionError("o stub deveria recusar a entrada longa")
+        config.max_entrada = 0
+        assert cache.ativo and cache.nome == nome, "400 sem relação com o cache não deveria invalidá-lo"
+        assert estado["chamadas"] == chamadas + 1, "sem repetição inline para erro que não é do cache"
+        passo("400 de entrada longa não invalidou o cache nem repetiu a chamada")
+
+        # 4. Expirou no servidor: a geração cai para o inline
+        await stub("/admin/expirar", "POST")
+        com_cache, chamadas = estado["com_cache"], estado["chamadas"]
+        await main.gerar_resposta(pergunta, nivel)
+        assert not cache.ativo and cache.falhas == 1
+        assert estado["chamadas"] == chamadas + 2 and estado["com_cache"] == com_cache
+        assert "system_instruction" in cache.config()
+        passo("cache sumido no servidor: 403, repetido inline e cache desligado")
+
+        # 5. Recriação depois da espera
+        await cache.renovar_se_preciso()
+        assert not cache.ativo, "não deveria recriar antes de espera_recriar"
+        relogio.deslocamento += cache.espera_recriar + 1
+        await cache.renovar_se_preciso()
+        assert cache.ativo and cache.nome != nome
+        await main.gerar_resposta(pergunta, nivel)
+        assert estado["com_cache"] == com_cache + 1
+        passo(f"recriado como {cache.nome} e usado de novo")
+
+        # 6. Criação recusada: segue inline
+        config.cache_min = 10 ** 9
+        await stub("/admin/expirar", "POST")
+        cache.nome = None
+        relogio.deslocamento += cache.espera_recriar + 1
+        await cache.renovar_se_preciso()
+        assert not cache.ativo and "system_instruction" in cache.config()
+        chamadas = estado["chamadas"]
+        await main.gerar_resposta(pergunta, nivel)
+        assert estado["chamadas"] == chamadas + 1
+        config.cache_min = 0
+        passo("criação recusada (prompt pequeno demais): gerações inline, sem erro")
+    finally:
+        await main.encerrar_servicos()
+
+    # 7. Encerramento apaga os caches que restaram
+    assert (await stub("/status"))["caches_ativos"] == 0, estado
+    print("ok  encerramento apagou os caches")
+    print(f"stub: {estado}")
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(verificar())
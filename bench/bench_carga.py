@@ -0,0 +1,321 @@
+"""Teste de carga do bot sem rede: Discord, Gemini e Hugging Face falsos.
+
+Sobe bench/stub_gemini.py e bench/stub_hf.py em processos próprios (para
+não dividirem o loop com o bot), importa main sem conectar ao Discord,
+inicia os serviços e faz milhares de usuários simulados chamarem
+on_message (menção), !ia e !img com objetos falsos de canal e autor. Cada
+envio ou edição no "Discord" espera --discord-latencia segundos.
+
+    python bench/bench_carga.py --usuarios 2000 --duracao 30 --img 0.1
+    python bench/bench_carga.py --semente 1 --json resultado.json   # para comparar rodadas
+
+Os comandos são chamados pelo callback, sem passar pelos cooldowns por
+usuário. O relatório traz pedidos/s, latência ponta a ponta por tipo
+(p50/p95/p99/máx), os resultados registrados no diário, o atraso do loop
+medido pelo vigia e o RSS de pico deste processo (o bot; os stubs não
+entram na conta).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from types import SimpleNamespace
+
+import aiohttp
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+ID_BOT = 900000000000000001
+ID_BASE_USUARIO = 300000000000000000
+PERGUNTAS_CURTAS = ("oi, tudo bem?", "qual a diferença entre lista e tupla?", "me explica o que é DNS",
+                    "bom dia!", "o que é recursão?")
+PERGUNTAS_PESADAS = ("faz um site html de uma padaria com css", "escreve um script python que lê um csv",
+                     "cria uma api em javascript com express", "refatora essa função para usar async")
+DESCRICOES = ("um gato astronauta", "paisagem cyberpunk à noite", "castelo na montanha, aquarela")
+
+
+# ==============================
+# DISCORD FALSO
+# ==============================
+class Digitando:
+    """`await canal.typing()` e `async with canal.typing()`."""
+
+    def __await__(self):
+        return iter(())
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *erro):
+        return False
+
+
+class MensagemFalsa:
+    def __init__(self, canal, content):
+        self.canal = canal
+        self.content = content
+
+    async def edit(self, content=None, **kwargs):
+        await self.canal.atraso()
+        self.canal.edicoes += 1
+        if content is not None:
+            self.content = content
+        return self
+
+    async def delete(self):
+        await self.canal.atraso()
+
+
+class CanalFalso:
+    def __init__(self, guild_id: int, latencia: float):
+        self.id = guild_id + 1
+        self.guild = SimpleNamespace(id=guild_id)
+        self.latencia = latencia
+        self.envios = 0
+        self.edicoes = 0
+
+    async def atraso(self):
+        if self.latencia:
+            await asyncio.sleep(self.latencia)
+
+    async def send(self, content=None, **kwargs):
+        await self.atraso()
+        self.envios += 1
+        return MensagemFalsa(self, content)
+
+    def typing(self):
+        return Digitando()
+
+
+class AutorFalso:
+    bot = False
+
+    def __init__(self, uid: int):
+        self.id = uid
+        self.name = f"usuario{uid % 100000}"
+        self.display_name = self.name
+        self.mention = f"<@{uid}>"
+
+    def __str__(self):
+        return self.name
+
+
+class CtxFalso:
+    def __init__(self, autor, canal):
+        self.author = autor
+        self.channel = canal
+        self.guild = canal.guild
+        self.send = canal.send
+
+
+# ==============================
+# STUBS
+# ==============================
+async def subir_stub(script: str, porta: int, argumentos: list[str]) -> subprocess.Popen:
+    processo = subprocess.Popen(
+        [sys.executable, os.path.join(RAIZ, "bench", script), "--porta", str(porta), *argumentos],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    async with aiohttp.ClientSession() as sessao:
+        for _ in range(100):
+            try:
+                async with sessao.get(f"http://127.0.0.1:{porta}/status") as resposta:
+                    if resposta.status == 200:
+                        return processo
+            except aiohttp.ClientError:
+                await asyncio.sleep(0.1)
+    processo.kill()
+    raise RuntimeError(f"{script} não subiu na porta {porta}")
+
+
+async def status_stub(porta: int) -> dict:
+    async with aiohttp.ClientSession() as sessao:
+        async with sessao.get(f"http://127.0.0.1:{porta}/status") as resposta:
+            return await resposta.json()
+
+
+# ==============================
+# CARGA
+# ==============================
+def percentis(valores: list[float]) -> dict:
+    if not valores:
+        return {"n": 0}
+    ordenados = sorted(valores)
+
+    def p(q):
+        return ordenados[min(len(ordenados) - 1, int(q * len(ordenados)))]
+
+    return {"n": len(ordenados), "p50": p(0.5), "p95": p(0.95), "p99": p(0.99), "max": ordenados[-1]}
+
+
+def rss_pico_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB no Linux
+
+
+async def simular(main, args) -> dict:
+    rng = random.Random(args.semente)
+    latencias = defaultdict(list)
+    falhas = Counter()  # exceções que escaparam dos handlers (bugs, não recusas)
+    canais = [CanalFalso(100000000000000000 + i * 10, args.discord_latencia) for i in range(args.canais)]
+
+    async def pedido(tipo: str, autor, canal):
+        inicio = time.perf_counter()
+        try:
+            if tipo == "img":
+                await main.img.callback(CtxFalso(autor, canal), descricao=rng.choice(DESCRICOES))
+            else:
+                pesada = rng.random() < args.pesadas
+                pergunta = rng.choice(PERGUNTAS_PESADAS if pesada else PERGUNTAS_CURTAS)
+                if tipo == "mencao":
+                    mensagem = SimpleNamespace(
+                        author=autor, channel=canal, guild=canal.guild, _state=None,
+                        content=f"<@{ID_BOT}> {pergunta}", mentions=[main.bot.user],
+                    )
+                    await main.on_message(mensagem)
+                else:
+                    await main.ia.callback(CtxFalso(autor, canal), pergunta=pergunta)
+        except Exception as e:
+            falhas[f"{tipo}: {type(e).__name__}: {e}"] += 1
+        latencias[tipo].append(time.perf_counter() - inicio)
+
+    async def usuario(indice: int):
+        autor = AutorFalso(ID_BASE_USUARIO + indice)
+        canal = canais[indice % len(canais)]
+        await asyncio.sleep(rng.uniform(0, args.duracao))
+        for _ in range(args.pedidos):
+            sorteio = rng.random()
+            tipo = "img" if sorteio < args.img else ("mencao" if sorteio < args.img + args.mencao else "ia")
+            await pedido(tipo, autor, canal)
+            await asyncio.sleep(rng.expovariate(1 / args.pausa))
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(usuario(i) for i in range(args.usuarios)))
+    total = time.perf_counter() - inicio
+
+    resultados = defaultdict(Counter)
+    for registro in main.diario.recentes:
+        resultados[registro["tipo"]][registro["resultado"]] += 1
+    atraso = main.m_loop.percentis(qs=(0.5, 0.95, 0.99, 1.0)) or [0.0] * 4
+    return {
+        "pedidos": sum(len(v) for v in latencias.values()),
+        "segundos": total,
+        "pedidos_s": sum(len(v) for v in latencias.values()) / total,
+        "latencia": {tipo: percentis(v) for tipo, v in sorted(latencias.items())},
+        "resultados": {tipo: dict(c) for tipo, c in resultados.items()},
+        "niveis": dict(Counter(r.get("nivel") for r in main.diario.recentes if r["tipo"] == "ia")),
+        "falhas": dict(falhas),
+        "loop": {"p50": atraso[0], "p95": atraso[1], "p99": atraso[2], "max": atraso[3],
+                 "travamentos": main.vigia.travamentos if main.vigia else 0},
+        "discord": {"envios": sum(c.envios for c in canais), "edicoes": sum(c.edicoes for c in canais)},
+        "rss_pico_mb": rss_pico_mb(),
+    }
+
+
+def imprimir(r: dict):
+    print(f"\n{r['pedidos']} pedidos em {r['segundos']:.1f}s → {r['pedidos_s']:.1f} pedidos/s")
+    print(f"{'tipo':>7} {'n':>6} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8} {'máx s':>8}")
+    for tipo, p in r["latencia"].items():
+        if p["n"]:
+            print(f"{tipo:>7} {p['n']:>6} {p['p50']:>8.3f} {p['p95']:>8.3f} {p['p99']:>8.3f} {p['max']:>8.3f}")
+    for tipo, contagem in r["resultados"].items():
+        print(f"resultados {tipo}: " + " · ".join(f"{k} {v}" for k, v in sorted(contagem.items())))
+    print("níveis da IA: " + " · ".join(f"{k} {v}" for k, v in r["niveis"].items()))
+    loop = r["loop"]
+    print(
+        f"atraso do loop: p50 {loop['p50'] * 1000:.1f} ms · p95 {loop['p95'] * 1000:.1f} ms · "
+        f"p99 {loop['p99'] * 1000:.1f} ms · máx {loop['max'] * 1000:.0f} ms · travamentos {loop['travamentos']}"
+    )
+    print(f"discord: {r['discord']['envios']} envios · {r['discord']['edicoes']} edições")
+    print(f"RSS de pico: {r['rss_pico_mb']:.0f} MB")
+    print(f"stub gemini: {r['stub_gemini']} | stub hf: {r['stub_hf']}")
+    for falha, n in r["falhas"].items():
+        print(f"FALHA ({n}x): {falha}")
+
+
+async def rodar(args):
+    pasta = tempfile.mkdtemp(prefix="bench_carga_")
+    os.environ.update({
+        "DISCORD_TOKEN": "token-falso", "GEMINI_API_KEY": "chave-falsa", "HF_TOKEN": "token-falso",
+        "GEMINI_BASE_URL": f"http://127.0.0.1:{args.porta_gemini}",
+        "HF_MODEL_URL": f"http://127.0.0.1:{args.porta_hf}/models/sdxl",
+        "GEMINI_CACHE_PROMPT": str(args.cache_prompt), "IMG_CACHE_DIR": "", "IA_HISTORICO_DB": "", "METRICAS_PORTA": "0",
+        "LOGS_DIR": os.path.join(pasta, "logs"), "LOGS_MEMORIA": str(10 ** 7),
+        "IA_STREAM": "1" if args.stream else "0",
+        "GEMINI_MAX_CONCORRENCIA": str(args.concorrencia), "IA_MAX_FILA": str(args.fila),
+        "IMG_TRABALHADORES": str(args.img_trabalhadores), "IMG_MAX_FILA": str(args.img_fila),
+    })
+    for par in args.env:
+        chave, _, valor = par.partition("=")
+        os.environ[chave] = valor
+
+    stubs = [
+        await subir_stub("stub_gemini.py", args.porta_gemini, [
+            "--ttft", str(args.gemini_ttft), "--trechos", str(args.gemini_trechos),
+            "--tamanho", str(args.gemini_tamanho), "--intervalo", str(args.gemini_intervalo),
+        ]),
+        await subir_stub("stub_hf.py", args.porta_hf, ["--latencia", str(args.hf_latencia), "--variacao", "0.2"]),
+    ]
+    try:
+        import main  # constrói o bot sem conectar ao Discord
+
+        main.bot._connection.user = SimpleNamespace(id=ID_BOT, mention=f"<@{ID_BOT}>")
+        await main.iniciar_servicos()
+        try:
+            resultado = await simular(main, args)
+        finally:
+            await main.encerrar_servicos()
+        resultado["stub_gemini"] = await status_stub(args.porta_gemini)
+        resultado["stub_hf"] = await status_stub(args.porta_hf)
+    finally:
+        for processo in stubs:
+            processo.terminate()
+            processo.wait()
+
+    imprimir(resultado)
+    if args.json:
+        resultado["parametros"] = {k: v for k, v in vars(args).items() if k != "json"}
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", type=int, default=1000)
+    parser.add_argument("--duracao", type=float, default=30, help="janela em que os usuários começam (s)")
+    parser.add_argument("--pedidos", type=int, default=3, help="pedidos por usuário")
+    parser.add_argument("--pausa", type=float, default=2.0, help="pausa média entre pedidos de um usuário (s)")
+    parser.add_argument("--img", type=float, default=0.1, help="fração de !img")
+    parser.add_argument("--mencao", type=float, default=0.4, help="fração de menções (o resto é !ia)")
+    parser.add_argument("--pesadas", type=float, default=0.3, help="fração de perguntas de código/site")
+    parser.add_argument("--canais", type=int, default=50)
+    parser.add_argument("--stream", type=int, default=1, choices=(0, 1))
+    parser.add_argument("--cache-prompt", type=int, default=1, choices=(0, 1), help="GEMINI_CACHE_PROMPT")
+    parser.add_argument("--discord-latencia", type=float, default=0.05)
+    parser.add_argument("--concorrencia", type=int, default=32, help="GEMINI_MAX_CONCORRENCIA")
+    parser.add_argument("--fila", type=int, default=500, help="IA_MAX_FILA")
+    parser.add_argument("--img-trabalhadores", type=int, default=4)
+    parser.add_argument("--img-fila", type=int, default=100)
+    parser.add_argument("--gemini-ttft", type=float, default=0.5)
+    parser.add_argument("--gemini-trechos", type=int, default=20)
+    parser.add_argument("--gemini-intervalo", type=float, default=0.02)
+    parser.add_argument("--gemini-tamanho", type=int, default=3000)
+    parser.add_argument("--hf-latencia", type=float, default=2.0)
+    parser.add_argument("--porta-gemini", type=int, default=8091)
+    parser.add_argument("--porta-hf", type=int, default=8089)
+    parser.add_argument("--semente", type=int, default=None)
+    parser.add_argument("--env", action="append", default=[], metavar="CHAVE=VALOR",
+                        help="variável extra para o bot (repetível)")
+    parser.add_argument("--json", help="grava o resultado neste arquivo")
+    asyncio.run(rodar(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
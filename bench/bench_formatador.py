@@ -0,0 +1,119 @@
+"""Benchmark do formatador de respostas (antigo × FormatadorMarkdown).
+
+Gera respostas sintéticas de ~100 KB (prosa em parágrafos, listas e blocos
+de código) e mede o tempo de transformar cada uma em mensagens e anexos:
+
+- antigo: regex de cercas duas vezes + fatias fixas de 1900 caracteres
+  (a lógica de `enviar_resposta` antes do formatador);
+- novo (inteiro): FormatadorMarkdown recebendo a resposta de uma vez;
+- novo (stream): o mesmo, alimentado em trechos como no streaming.
+
+    python bench/bench_formatador.py --kb 100 --repeticoes 50
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from formatador import EXTENSOES, Anexo, FormatadorMarkdown, Texto  # noqa: E402
+
+
+def formatar_antigo(texto: str, limite: int = 1900) -> tuple[list[str], list[tuple[str, str]]]:
+    padrao = r"```(\w+)?\n([\s\S]*?)```"
+    blocos = [(lang.lower() if lang else "txt", code.strip()) for lang, code in re.findall(padrao, texto)]
+    texto_limpo = re.sub(r"```(\w+)?\n[\s\S]*?```", "", texto).strip()
+    arquivos = []
+    contagem = defaultdict(int)
+    for lang, codigo in blocos:
+        ext = EXTENSOES.get(lang, "txt")
+        contagem[ext] += 1
+        count = contagem[ext]
+        arquivos.append((f"codigo_{count}.{ext}" if count > 1 else f"codigo.{ext}", codigo))
+    partes = [texto_limpo[i:i + limite] for i in range(0, len(texto_limpo), limite)]
+    return partes, arquivos
+
+
+def formatar_novo(trechos: list[str], limite: int = 1900) -> list:
+    formatador = FormatadorMarkdown(limite)
+    eventos = []
+    for trecho in trechos:
+        eventos += formatador.alimentar(trecho)
+    return eventos + formatador.finalizar()
+
+
+def resposta_sintetica(kb: int, semente: int = 0) -> str:
+    rnd = random.Random(semente)
+    palavras = "o a de que para com uma função retorna valor lista código exemplo dados `cache` erro".split()
+    partes = []
+    tamanho = 0
+    while tamanho < kb * 1024:
+        tipo = rnd.random()
+        if tipo < 0.5:
+            bloco = " ".join(rnd.choice(palavras) for _ in range(rnd.randint(30, 120))) + ".\n\n"
+        elif tipo < 0.75:
+            bloco = "".join(f"- item {i}: {' '.join(rnd.choices(palavras, k=8))}\n" for i in range(rnd.randint(3, 10))) + "\n"
+        else:
+            lang = rnd.choice(["python", "js", "sql", ""])
+            linhas = "".join(f"    x_{i} = calcular({i}, {rnd.randint(0, 99)})\n" for i in range(rnd.randint(5, 40)))
+            bloco = f"```{lang}\n{linhas}```\n\n"
+        partes.append(bloco)
+        tamanho += len(bloco)
+    return "".join(partes)
+
+
+# Respostas que já estouraram o limite: o corte em fim de parágrafo deixava
+# o buffer cheio e a linha seguinte entrava mesmo assim
+CASOS_LIMITE = [
+    "intro curta\n\n" + ("x" * 99 + "\n") * 18 + "y" * 249 + "\n",
+    "".join(("palavra " * 56).strip() + "\n" for _ in range(8)),  # parágrafos de uma linha só
+]
+
+
+def medir(funcao, repeticoes: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) / repeticoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kb", type=int, default=100)
+    parser.add_argument("--repeticoes", type=int, default=50)
+    parser.add_argument("--trecho", type=int, default=80, help="tamanho dos trechos no modo stream")
+    args = parser.parse_args()
+
+    texto = resposta_sintetica(args.kb)
+    trechos = [texto[i:i + args.trecho] for i in range(0, len(texto), args.trecho)]
+
+    partes, arquivos = formatar_antigo(texto)
+    eventos = formatar_novo([texto])
+    assert eventos == formatar_novo(trechos), "stream e inteiro deveriam gerar os mesmos eventos"
+    textos = [e.conteudo for e in eventos if isinstance(e, Texto)]
+    for caso in [texto, *CASOS_LIMITE]:
+        maior = max(len(e.conteudo) for e in formatar_novo([caso]) if isinstance(e, Texto))
+        assert maior <= 1900, f"mensagem de {maior} chars passa do limite"
+    anexos = [e for e in eventos if isinstance(e, Anexo)]
+    # Mensagens que terminam no meio de uma palavra (corte fixo do antigo)
+    cortes_ruins = sum(1 for p, q in zip(partes, partes[1:]) if p[-1:].isalnum() and q[:1].isalnum())
+
+    print(f"resposta: {len(texto) / 1024:.0f} KB, {len(trechos)} trechos de {args.trecho}")
+    print(f"antigo: {len(partes)} mensagens, {len(arquivos)} anexos, {cortes_ruins} cortadas no meio da palavra")
+    print(f"novo:   {len(textos)} mensagens, {len(anexos)} anexos, maior mensagem {max(map(len, textos))} chars")
+    print(f"{'implementação':>16} {'ms':>8}")
+    casos = [
+        ("antigo", lambda: formatar_antigo(texto)),
+        ("novo (inteiro)", lambda: formatar_novo([texto])),
+        ("novo (stream)", lambda: formatar_novo(trechos)),
+    ]
+    for nome, funcao in casos:
+        print(f"{nome:>16} {medir(funcao, args.repeticoes) * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
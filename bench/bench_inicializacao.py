@@ -0,0 +1,122 @@
+"""Tempo de inicialização e memória do bot: modo completo × modo enxuto.
+
+Sobe o gateway falso (bench/stub_discord.py) e roda o bot num processo
+filho por modo, até o on_ready. Mede o import de main.py, o tempo até o
+bot ficar pronto (inclui o chunking de membros no modo completo), o RSS
+nesse momento e quantos membros ficaram em cache.
+
+    python bench/bench_inicializacao.py --guildas 20 --membros 5000
+
+O discord.py espera `guild_ready_timeout` (2 s) depois do último
+GUILD_CREATE antes do on_ready; esse piso aparece igual nos dois modos.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for linha in f:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def filho(porta: int):
+    """Processo do bot: aponta o discord.py para o gateway falso e roda main."""
+    inicio = time.perf_counter()
+    import discord
+    import yarl
+
+    discord.http.Route.BASE = f"http://127.0.0.1:{porta}/api/v10"
+    discord.gateway.DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(f"ws://127.0.0.1:{porta}/gateway")
+    import main
+    importado = time.perf_counter()
+
+    @main.bot.listen("on_ready")
+    async def pronto():
+        print(json.dumps({
+            "import_s": importado - inicio,
+            "pronto_s": time.perf_counter() - inicio,
+            "rss_mb": rss_mb(),
+            "membros": sum(len(g.members) for g in main.bot.guilds),
+            "genai_carregado": "google.genai" in sys.modules,
+        }), flush=True)
+        await main.bot.close()
+
+    main.bot.run(main.TOKEN, log_handler=None)
+
+
+async def rodar_modo(enxuto: bool, porta: int, pasta: str) -> dict:
+    env = dict(
+        os.environ,
+        DISCORD_TOKEN="token-falso", GEMINI_API_KEY="chave-falsa", GEMINI_CACHE_PROMPT="0",
+        BOT_MODO_ENXUTO="1" if enxuto else "0", PYTHONPATH=RAIZ,
+    )
+    inicio = time.perf_counter()
+    processo = await asyncio.create_subprocess_exec(
+        sys.executable, os.path.abspath(__file__), "--filho", "--porta", str(porta),
+        cwd=pasta, env=env, stdout=asyncio.subprocess.PIPE,
+    )
+    saida, _ = await asyncio.wait_for(processo.communicate(), timeout=300)
+    for linha in saida.decode().splitlines():
+        if linha.startswith("{"):
+            resultado = json.loads(linha)
+            resultado["total_s"] = time.perf_counter() - inicio
+            return resultado
+    raise RuntimeError(f"bot não ficou pronto (modo {'enxuto' if enxuto else 'completo'})")
+
+
+async def comparar(args):
+    from aiohttp import web
+
+    from bench.stub_discord import ConfigGateway, criar_app
+
+    app = criar_app(ConfigGateway(guildas=args.guildas, membros=args.membros))
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.porta).start()
+    print(f"gateway falso: {args.guildas} servidores × {args.membros} membros")
+    print(f"{'modo':>9} {'import s':>9} {'pronto s':>9} {'processo s':>11} {'RSS MB':>8} {'membros':>9} {'genai':>6}")
+    try:
+        with tempfile.TemporaryDirectory() as pasta:
+            for enxuto in (False, True):
+                for _ in range(args.repeticoes):
+                    r = await rodar_modo(enxuto, args.porta, pasta)
+                    print(
+                        f"{'enxuto' if enxuto else 'completo':>9} {r['import_s']:>9.2f} {r['pronto_s']:>9.2f} "
+                        f"{r['total_s']:>11.2f} {r['rss_mb']:>8.0f} {r['membros']:>9} "
+                        f"{'sim' if r['genai_carregado'] else 'não':>6}"
+                    )
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--porta", type=int, default=8090)
+    parser.add_argument("--guildas", type=int, default=20)
+    parser.add_argument("--membros", type=int, default=5000)
+    parser.add_argument("--repeticoes", type=int, default=1)
+    parser.add_argument("--filho", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.filho:
+        filho(args.porta)
+    else:
+        asyncio.run(comparar(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Microbenchmark do LimitadorJanela.
+
+Mede o custo de consumir() + espera() com 1K até 1M usuários rastreados,
+cada um com a janela parcialmente cheia, e o custo da varredura de usuários ociosos.
+
+    python bench/bench_limitador.py [--max 1000000] [--checks 200000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from limitador import LimitadorJanela  # noqa: E402
+
+LIMITE = 20
+JANELA = 2 * 3600
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+def preparar(usuarios: int, relogio: Relogio) -> LimitadorJanela:
+    limitador = LimitadorJanela(LIMITE, JANELA, relogio=relogio)
+    aleatorio = random.Random(usuarios)
+    for uid in range(usuarios):
+        relogio.agora = aleatorio.uniform(0, JANELA)
+        for _ in range(aleatorio.randint(1, LIMITE // 2)):
+            limitador.consumir(uid)
+    relogio.agora = JANELA
+    return limitador
+
+
+def medir(usuarios: int, checks: int) -> tuple[float, float]:
+    relogio = Relogio()
+    limitador = preparar(usuarios, relogio)
+    aleatorio = random.Random(0)
+    alvos = [aleatorio.randrange(usuarios) for _ in range(checks)]
+    passo = 1.0 / checks
+
+    inicio = time.perf_counter()
+    for uid in alvos:
+        relogio.agora += passo
+        limitador.consumir(uid)
+        limitador.espera(uid)
+    por_check = (time.perf_counter() - inicio) / checks
+
+    # Avança além da janela: todo mundo fica ocioso
+    relogio.agora += JANELA * 2
+    inicio = time.perf_counter()
+    limitador.varrer()
+    varredura = time.perf_counter() - inicio
+    assert not limitador.usuarios
+    return por_check, varredura
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max", type=int, default=1_000_000, help="maior número de usuários rastreados")
+    parser.add_argument("--checks", type=int, default=200_000, help="consumos medidos por rodada")
+    args = parser.parse_args()
+
+    tamanhos = [n for n in (1_000, 10_000, 100_000, 1_000_000) if n <= args.max]
+    print(f"{'usuários':>10} {'ns/check':>10} {'varredura (s)':>14}")
+    for usuarios in tamanhos:
+        por_check, varredura = medir(usuarios, args.checks)
+        print(f"{usuarios:>10} {por_check * 1e9:>10.0f} {varredura:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Verificação da PoliticaHF contra o stub do Hugging Face (sem rede).
+
+Sobe bench/stub_hf.py no próprio processo e confere, com a política real:
+
+1. 503 com `estimated_time`: espera o tempo informado e tenta de novo;
+2. hedging: a tentativa que passa do percentil dispara uma segunda, e a
+   mais rápida vence;
+3. prazo total: com o serviço lento, desiste no prazo com ErroHF;
+4. disjuntor: com o stub sempre em 500, o !img abre o disjuntor e o
+   !img seguinte falha na hora, sem chamar o serviço.
+
+    python bench/bench_politica_hf.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.stub_hf import ConfigStub, criar_app  # noqa: E402
+from politica_hf import ErroHF, PoliticaHF  # noqa: E402
+
+
+class MensagemFalsa:
+    def __init__(self, content):
+        self.content = content
+
+    async def edit(self, content=None, **kwargs):
+        self.content = content
+        return self
+
+    async def delete(self):
+        pass
+
+
+class CtxFalso:
+    """O mínimo que o !img usa; guarda o que foi enviado ou editado."""
+
+    def __init__(self):
+        self.author = SimpleNamespace(id=1, mention="<@1>", display_name="teste")
+        self.guild = None
+        self.mensagens: list[MensagemFalsa] = []
+
+    async def send(self, content=None, **kwargs):
+        mensagem = MensagemFalsa(content)
+        self.mensagens.append(mensagem)
+        return mensagem
+
+    def textos(self) -> list[str]:
+        return [m.content or "" for m in self.mensagens]
+
+
+def passo(descricao: str):
+    print(f"ok  {descricao}")
+
+
+async def verificar():
+    config = ConfigStub(latencia=0.05, variacao=0.0, lado=16)
+    app = criar_app(config)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    url = f"http://127.0.0.1:{runner.addresses[0][1]}/models/sdxl"
+    estado = app["estado"]
+
+    async with aiohttp.ClientSession() as sessao:
+        # 1. Modelo carregando: espera o estimated_time
+        politica = PoliticaHF(sessao, url, "token", hedge=False)
+        estado["chamadas"], config.carregando, config.estimated_time = 0, 1, 1.0
+        inicio = time.monotonic()
+        await politica.gerar("gato")
+        duracao = time.monotonic() - inicio
+        assert estado["chamadas"] == 2 and 1.0 <= duracao < 1.5, (estado, duracao)
+        config.carregando = 0
+        passo(f"503 com estimated_time=1.0: esperou e conseguiu em {duracao:.2f}s")
+
+        # 2. Hedging: depois de 5 amostras rápidas, uma tentativa lenta dispara a segunda
+        politica = PoliticaHF(sessao, url, "token", hedge=True, hedge_percentil=0.9, hedge_min_amostras=5)
+        for _ in range(5):
+            await politica.gerar("gato")
+        limiar = politica.limiar_hedge()
+        config.lentas, config.latencia_lenta = 1, 3.0
+        inicio = time.monotonic()
+        await politica.gerar("gato")
+        duracao = time.monotonic() - inicio
+        assert politica.hedges == 1 and politica.hedges_vencedores == 1, vars(politica)
+        assert duracao < 1.0, duracao
+        passo(f"hedge disparou após {limiar * 1000:.0f} ms e a segunda venceu ({duracao:.2f}s em vez de 3s)")
+
+        # 3. Prazo total
+        politica = PoliticaHF(sessao, url, "token", hedge=False, prazo=1.5)
+        config.latencia = 5.0
+        inicio = time.monotonic()
+        try:
+            await politica.gerar("gato")
+        except ErroHF as e:
+            duracao = time.monotonic() - inicio
+            assert duracao < 1.5 + 0.3, duracao
+            passo(f"prazo de 1.5s respeitado: ErroHF em {duracao:.2f}s ({e})")
+        else:
+            raise AssertionError("deveria desistir no prazo")
+        config.latencia = 0.05
+
+    # 4. Disjuntor, pelo !img do bot
+    os.environ.update({
+        "DISCORD_TOKEN": "token-falso", "HF_TOKEN": "token-falso", "HF_MODEL_URL": url,
+        "BOT_MODO_ENXUTO": "1", "METRICAS_PORTA": "0", "VIGIA_ATIVO": "0", "IMG_TRANSCODIFICAR": "0",
+        "LOGS_DIR": tempfile.mkdtemp(prefix="bench_hf_"), "IA_HISTORICO_DB": "", "IMG_CACHE_DIR": "",
+    })
+    import main  # constrói o bot sem conectar ao Discord
+
+    await main.iniciar_servicos()
+    try:
+        main.politica_hf.base = 0.01  # backoff curto: o disjuntor abre em poucos décimos
+        config.status_fixo = 500
+        ctx = CtxFalso()
+        await main.img.callback(ctx, descricao="gato")
+        assert main.politica_hf.disjuntor.estado == "aberto", main.politica_hf.disjuntor.estado
+        assert "fora do ar" in ctx.textos()[-1], ctx.textos()
+        chamadas = estado["chamadas"]
+        ctx = CtxFalso()
+        inicio = time.monotonic()
+        await main.img.callback(ctx, descricao="cachorro")
+        duracao = time.monotonic() - inicio
+        assert estado["chamadas"] == chamadas and duracao < 0.1, (estado, duracao)
+        assert len(ctx.mensagens) == 1 and "fora do ar" in ctx.textos()[0], ctx.textos()
+        passo(f"500 contínuo abriu o disjuntor; o !img seguinte recusou em {duracao * 1000:.1f} ms sem chamar o HF")
+    finally:
+        await main.encerrar_servicos()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(verificar())
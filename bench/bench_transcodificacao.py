@@ -0,0 +1,78 @@
+"""Benchmark da transcodificação de imagens (tempo de codificação × tamanho).
+
+Sem argumentos usa uma imagem sintética de 1024² com gradientes, ruído e
+formas — parecida em entropia com a saída do SDXL. Para medir com uma
+imagem real: `python bench/bench_transcodificacao.py --imagem saida.png`.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import transcodificar  # noqa: E402
+
+if not transcodificar.DISPONIVEL:
+    sys.exit("Pillow não está instalado (pip install pillow)")
+
+from PIL import Image, ImageDraw, ImageFilter  # noqa: E402
+
+
+def imagem_sintetica(lado: int = 1024) -> bytes:
+    base = Image.linear_gradient("L").resize((lado, lado))
+    r = base
+    g = base.rotate(90)
+    b = Image.radial_gradient("L").resize((lado, lado))
+    imagem = Image.merge("RGB", (r, g, b))
+    desenho = ImageDraw.Draw(imagem)
+    for i in range(40):
+        x, y = (i * 97) % lado, (i * 173) % lado
+        desenho.ellipse((x, y, x + 120, y + 80), fill=((i * 37) % 255, (i * 91) % 255, (i * 53) % 255))
+    ruido = Image.effect_noise((lado, lado), 40).convert("RGB")
+    imagem = Image.blend(imagem, ruido, 0.25).filter(ImageFilter.SMOOTH)
+    saida = io.BytesIO()
+    imagem.save(saida, "PNG")
+    return saida.getvalue()
+
+
+def medir(dados: bytes, formato: str, qualidade: int, lado_max: int, repeticoes: int) -> tuple[float, int]:
+    """Tempo médio de decodificar + (reduzir) + codificar, e o tamanho gerado."""
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        imagem = Image.open(io.BytesIO(dados))
+        imagem.load()
+        if lado_max:
+            imagem.thumbnail((lado_max, lado_max), Image.LANCZOS)
+        resultado = transcodificar.codificar(imagem, formato, qualidade)
+    return (time.perf_counter() - inicio) / repeticoes, len(resultado)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--imagem", help="PNG de entrada (padrão: sintética 1024²)")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--lado-max", type=int, default=0, help="também mede com redução (ex.: 768)")
+    args = parser.parse_args()
+
+    if args.imagem:
+        with open(args.imagem, "rb") as f:
+            dados = f.read()
+    else:
+        dados = imagem_sintetica()
+
+    print(f"original: {len(dados) / 1024:.0f} KB ({transcodificar.formato_de(dados)})")
+    print(f"{'formato':>8} {'qual.':>6} {'lado':>6} {'ms':>8} {'KB':>8} {'% orig.':>8}")
+    casos = [("png", 0)] + [(f, q) for f in ("webp", "jpeg") for q in (70, 85, 95)]
+    for lado_max in sorted({0, args.lado_max}):
+        for formato, qualidade in casos:
+            segundos, tamanho = medir(dados, formato, qualidade, lado_max, args.repeticoes)
+            print(
+                f"{formato:>8} {qualidade or '-':>6} {lado_max or 'orig':>6} {segundos * 1000:>8.1f} "
+                f"{tamanho / 1024:>8.0f} {tamanho / len(dados):>8.0%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""Gateway e API REST falsos do Discord, para medir o bot sem rede.
+
+Fala o suficiente do protocolo para o discord.py ficar pronto: HELLO,
+IDENTIFY → READY, um GUILD_CREATE por servidor e GUILD_MEMBERS_CHUNK para
+cada pedido de membros (op 8). Como o Discord de verdade, respeita os
+intents do IDENTIFY: sem GUILD_MEMBERS o servidor só manda o próprio bot,
+sem GUILD_PRESENCES não manda presenças.
+
+Para apontar o bot para cá (antes de importar main):
+
+    discord.http.Route.BASE = "http://127.0.0.1:8090/api/v10"
+    discord.gateway.DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL("ws://127.0.0.1:8090/gateway")
+"""
+import argparse
+import asyncio
+import json
+import zlib
+from dataclasses import dataclass
+
+from aiohttp import WSMsgType, web
+
+INTENT_MEMBROS = 1 << 1
+INTENT_PRESENCAS = 1 << 8
+LIMITE_GRANDE = 250  # large_threshold enviado pelo discord.py
+ID_BOT = 900000000000000001
+ID_APLICACAO = 900000000000000002
+ID_BASE_GUILDA = 100000000000000000
+ID_BASE_USUARIO = 200000000000000000
+JOINED_AT = "2024-01-01T00:00:00+00:00"
+
+
+@dataclass
+class ConfigGateway:
+    guildas: int = 20
+    membros: int = 5000        # por servidor
+    online: float = 0.3        # fração com presença
+    por_chunk: int = 1000      # membros por GUILD_MEMBERS_CHUNK
+    shards: int = 1            # recomendação do GET /gateway/bot
+
+
+def _usuario(uid: int, bot: bool = False) -> dict:
+    return {"id": str(uid), "username": f"usuario{uid % 100000}", "discriminator": "0",
+            "global_name": None, "avatar": None, "bot": bot}
+
+
+def _membro(uid: int, bot: bool = False) -> dict:
+    return {"user": _usuario(uid, bot), "roles": [], "joined_at": JOINED_AT,
+            "deaf": False, "mute": False, "nick": None, "flags": 0}
+
+
+def _presenca(uid: int) -> dict:
+    return {"user": {"id": str(uid)}, "status": "online",
+            "activities": [{"name": "Jogando algo", "type": 0}], "client_status": {"desktop": "online"}}
+
+
+def _json(dados) -> web.Response:
+    # O discord.py só decodifica se o Content-Type for exatamente application/json
+    return web.Response(body=json.dumps(dados).encode(), headers={"Content-Type": "application/json"})
+
+
+class _Sessao:
+    """Uma conexão de gateway (um shard)."""
+
+    def __init__(self, ws: web.WebSocketResponse, config: ConfigGateway, comprimir: bool, estado: dict):
+        self.ws = ws
+        self.config = config
+        self.compressor = zlib.compressobj() if comprimir else None
+        self.estado = estado
+        self.seq = 0
+        self.intents = 0
+
+    async def enviar(self, op: int, d=None, t: str | None = None):
+        if op == 0:
+            self.seq += 1
+        dados = json.dumps({"op": op, "d": d, "s": self.seq if op == 0 else None, "t": t})
+        self.estado["bytes_enviados"] += len(dados)
+        if self.compressor is None:
+            await self.ws.send_str(dados)
+        else:
+            await self.ws.send_bytes(self.compressor.compress(dados.encode()) + self.compressor.flush(zlib.Z_SYNC_FLUSH))
+
+    def ids_guildas(self, shard: list | None) -> list[int]:
+        ids = [ID_BASE_GUILDA + i for i in range(self.config.guildas)]
+        if shard:
+            shard_id, total = shard
+            ids = [g for g in ids if (g >> 22) % total == shard_id]
+        return ids
+
+    def ids_membros(self, guilda: int) -> range:
+        inicio = ID_BASE_USUARIO + (guilda - ID_BASE_GUILDA) * self.config.membros
+        return range(inicio, inicio + self.config.membros)
+
+    def online(self, uid: int) -> bool:
+        return (uid * 2654435761) % 1000 < self.config.online * 1000
+
+    def guild_create(self, guilda: int) -> dict:
+        grande = self.config.membros > LIMITE_GRANDE
+        membros = [_membro(ID_BOT, bot=True)]
+        presencas = []
+        if self.intents & INTENT_MEMBROS and not grande:
+            membros += [_membro(uid) for uid in self.ids_membros(guilda)]
+        if self.intents & INTENT_PRESENCAS and not grande:
+            presencas = [_presenca(uid) for uid in self.ids_membros(guilda) if self.online(uid)]
+        return {
+            "id": str(guilda), "name": f"Servidor {guilda % 1000}", "icon": None,
+            "owner_id": str(ID_BASE_USUARIO), "unavailable": False,
+            "member_count": self.config.membros + 1, "large": grande, "joined_at": JOINED_AT,
+            "features": [], "emojis": [], "stickers": [], "threads": [], "voice_states": [],
+            "stage_instances": [], "guild_scheduled_events": [], "soundboard_sounds": [],
+            "roles": [{"id": str(guilda), "name": "@everyone", "permissions": "104324673", "position": 0,
+                       "color": 0, "hoist": False, "managed": False, "mentionable": False, "flags": 0}],
+            "channels": [{"id": str(guilda + 1), "type": 0, "name": "geral", "position": 0,
+                          "permission_overwrites": [], "nsfw": False, "parent_id": None}],
+            "members": membros, "presences": presencas,
+        }
+
+    async def chunks(self, pedido: dict):
+        guilda = int(pedido["guild_id"])
+        ids = list(self.ids_membros(guilda)) + [ID_BOT]
+        por = self.config.por_chunk
+        total = (len(ids) + por - 1) // por
+        for indice in range(total):
+            parte = ids[indice * por:(indice + 1) * por]
+            d = {"guild_id": str(guilda), "members": [_membro(uid, uid == ID_BOT) for uid in parte],
+                 "chunk_index": indice, "chunk_count": total, "nonce": pedido.get("nonce")}
+            if pedido.get("presences"):
+                d["presences"] = [_presenca(uid) for uid in parte if self.online(uid)]
+            await self.enviar(0, d, "GUILD_MEMBERS_CHUNK")
+        self.estado["pedidos_membros"] += 1
+
+    async def identificar(self, d: dict):
+        self.intents = d.get("intents", 0)
+        guildas = self.ids_guildas(d.get("shard"))
+        await self.enviar(0, {
+            "v": 10, "user": _usuario(ID_BOT, bot=True) | {"verified": True, "mfa_enabled": False},
+            "guilds": [{"id": str(g), "unavailable": True} for g in guildas],
+            "session_id": "sessao-falsa", "resume_gateway_url": str(self.ws_url),
+            "application": {"id": str(ID_APLICACAO), "flags": 0}, "shard": d.get("shard"),
+        }, "READY")
+        for guilda in guildas:
+            await self.enviar(0, self.guild_create(guilda), "GUILD_CREATE")
+
+    async def rodar(self, ws_url: str):
+        self.ws_url = ws_url
+        await self.enviar(10, {"heartbeat_interval": 41250})
+        async for msg in self.ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            payload = json.loads(msg.data)
+            op, d = payload["op"], payload.get("d")
+            if op == 1:
+                await self.enviar(11)
+            elif op == 2:
+                self.estado["identificacoes"] += 1
+                await self.identificar(d)
+            elif op == 8:
+                await self.chunks(d)
+
+
+def criar_app(config: ConfigGateway) -> web.Application:
+    estado = {"identificacoes": 0, "pedidos_membros": 0, "bytes_enviados": 0}
+
+    async def gateway(request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(max_msg_size=0)
+        await ws.prepare(request)
+        comprimir = request.query.get("compress") == "zlib-stream"
+        url = str(request.url.with_query(None))
+        await _Sessao(ws, config, comprimir, estado).rodar(url)
+        return ws
+
+    async def eu(request: web.Request) -> web.Response:
+        return _json(_usuario(ID_BOT, bot=True))
+
+    async def aplicacao(request: web.Request) -> web.Response:
+        return _json({
+            "id": str(ID_APLICACAO), "name": "bot", "description": "", "icon": None,
+            "bot_public": True, "bot_require_code_grant": False, "verify_key": "0" * 64,
+            "owner": _usuario(ID_BASE_USUARIO), "flags": 0,
+        })
+
+    async def gateway_bot(request: web.Request) -> web.Response:
+        url = f"ws://{request.host}/gateway"
+        return _json({
+            "url": url, "shards": config.shards,
+            "session_start_limit": {"total": 1000, "remaining": 1000, "reset_after": 0, "max_concurrency": 16},
+        })
+
+    async def status(request: web.Request) -> web.Response:
+        return _json(estado)
+
+    async def generico(request: web.Request) -> web.Response:
+        # Qualquer outra rota REST: responde vazio, sem travar o bot
+        await request.read()
+        return _json({})
+
+    app = web.Application()
+    app["estado"] = estado
+    app.router.add_get("/gateway", gateway)
+    app.router.add_get("/api/v10/users/@me", eu)
+    app.router.add_get("/api/v10/oauth2/applications/@me", aplicacao)
+    app.router.add_get("/api/v10/gateway/bot", gateway_bot)
+    app.router.add_get("/status", status)
+    app.router.add_route("*", "/api/v10/{resto:.*}", generico)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--porta", type=int, default=8090)
+    parser.add_argument("--guildas", type=int, default=20)
+    parser.add_argument("--membros", type=int, default=5000)
+    parser.add_argument("--shards", type=int, default=1)
+    args = parser.parse_args()
+    web.run_app(criar_app(ConfigGateway(guildas=args.guildas, membros=args.membros, shards=args.shards)),
+                host="127.0.0.1", port=args.porta)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Servidor falso da API do Gemini, para testes locais e carga.
+
+Atende `generateContent` e `streamGenerateContent` (SSE, como o SDK pede
+com `alt=sse`) para qualquer modelo, com latência até o primeiro trecho,
+número e ritmo dos trechos e tamanho da resposta configuráveis. As
+respostas misturam prosa e um bloco de código, para exercitar o
+formatador. Também guarda `cachedContents` de verdade (criar, renovar,
+apagar, expirar): uma geração que cita um cache que não existe mais leva
+403, como na API. POST /admin/expirar some com todos os caches, como se o
+TTL tivesse vencido no servidor.
+
+    python bench/stub_gemini.py --porta 8091 --ttft 0.5 --trechos 20 --tamanho 3000
+    GEMINI_BASE_URL=http://127.0.0.1:8091 GEMINI_API_KEY=x python main.py
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass
+
+from aiohttp import web
+
+
+@dataclass
+class ConfigStub:
+    ttft: float = 0.5          # segundos até o primeiro trecho
+    variacao: float = 0.2      # jitter uniforme do ttft (± segundos)
+    trechos: int = 20          # trechos por resposta no streaming
+    intervalo: float = 0.02    # segundos entre trechos
+    tamanho: int = 3000        # caracteres por resposta
+    codigo: float = 0.3        # fração das respostas com bloco de código
+    taxa_erro: float = 0.0     # fração de 429 aleatórios
+    cache_min: int = 0         # caracteres mínimos do system_instruction para criar cache (senão 400)
+    max_entrada: int = 0       # caracteres máximos de contents (senão 400); 0 = sem limite
+
+
+def texto_resposta(tamanho: int, com_codigo: bool) -> str:
+    prosa = "Claro! Aqui vai uma explicação detalhada sobre o assunto pedido. "
+    partes = []
+    if com_codigo:
+        linhas = "\n".join(f"    print('linha {i}')" for i in range(tamanho // 60))
+        partes.append(f"Segue o código:\n\n```python\ndef exemplo():\n{linhas}\n```\n\n")
+    while sum(map(len, partes)) < tamanho:
+        partes.append(prosa * 4 + "\n\n")
+    return "".join(partes)[:max(tamanho, 1)]
+
+
+def _candidato(texto: str, final: bool) -> dict:
+    candidato = {"content": {"role": "model", "parts": [{"text": texto}]}, "index": 0}
+    if final:
+        candidato["finishReason"] = "STOP"
+    return candidato
+
+
+def _erro(codigo: int, status: str, mensagem: str) -> web.Response:
+    return web.json_response({"error": {"code": codigo, "message": mensagem, "status": status}}, status=codigo)
+
+
+def _uso(pedido: dict, texto: str) -> dict:
+    entrada = len(json.dumps(pedido.get("contents", ""))) // 4
+    saida = len(texto) // 4
+    return {"promptTokenCount": entrada, "candidatesTokenCount": saida, "totalTokenCount": entrada + saida}
+
+
+def criar_app(config: ConfigStub) -> web.Application:
+    estado = {
+        "chamadas": 0, "streams": 0, "em_andamento": 0, "max_em_andamento": 0, "erros": 0,
+        "com_cache": 0, "caches": 0, "caches_ativos": 0, "renovacoes": 0,
+    }
+    caches: dict[str, float] = {}  # nome → instante em que expira
+
+    def cache_valido(nome: str) -> bool:
+        if caches.get(nome, 0.0) <= time.monotonic():
+            caches.pop(nome, None)
+            return False
+        return True
+
+    def ttl(corpo: dict) -> float:
+        return float(str(corpo.get("ttl", "3600s")).rstrip("s"))
+
+    async def esperar_ttft():
+        await asyncio.sleep(max(0.0, config.ttft + random.uniform(-config.variacao, config.variacao)))
+
+    async def modelos(request: web.Request) -> web.StreamResponse:
+        modelo, _, acao = request.match_info["acao"].partition(":")
+        pedido = await request.json()
+        estado["chamadas"] += 1
+        if random.random() < config.taxa_erro:
+            estado["erros"] += 1
+            return _erro(429, "RESOURCE_EXHAUSTED", "Resource exhausted (stub)")
+        if config.max_entrada and len(json.dumps(pedido.get("contents", ""))) > config.max_entrada:
+            estado["erros"] += 1
+            return _erro(400, "INVALID_ARGUMENT", "The input token count exceeds the maximum number of tokens allowed")
+        if pedido.get("cachedContent"):
+            if not cache_valido(pedido["cachedContent"]):
+                estado["erros"] += 1
+                return _erro(403, "PERMISSION_DENIED", "CachedContent not found (or permission denied)")
+            estado["com_cache"] += 1
+        texto = texto_resposta(config.tamanho, random.random() < config.codigo)
+        estado["em_andamento"] += 1
+        estado["max_em_andamento"] = max(estado["max_em_andamento"], estado["em_andamento"])
+        try:
+            await esperar_ttft()
+            if acao == "generateContent":
+                return web.json_response({
+                    "candidates": [_candidato(texto, True)], "usageMetadata": _uso(pedido, texto),
+                    "modelVersion": modelo,
+                })
+            estado["streams"] += 1
+            resposta = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await resposta.prepare(request)
+            passo = max(1, -(-len(texto) // config.trechos))
+            for inicio in range(0, len(texto), passo):
+                final = inicio + passo >= len(texto)
+                evento = {"candidates": [_candidato(texto[inicio:inicio + passo], final)], "modelVersion": modelo}
+                if final:
+                    evento["usageMetadata"] = _uso(pedido, texto)
+                await resposta.write(f"data: {json.dumps(evento)}\r\n\r\n".encode())
+                if not final and config.intervalo:
+                    await asyncio.sleep(config.intervalo)
+            await resposta.write_eof()
+            return resposta
+        finally:
+            estado["em_andamento"] -= 1
+
+    def descrever(nome: str) -> dict:
+        restante = caches[nome] - time.monotonic()
+        return {
+            "name": nome,
+            "expireTime": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + restante)),
+        }
+
+    async def criar_cache(request: web.Request) -> web.Response:
+        corpo = await request.json()
+        instrucao = json.dumps(corpo.get("systemInstruction", ""))
+        if len(instrucao) < config.cache_min:
+            return _erro(400, "INVALID_ARGUMENT", "Cached content is too small (stub)")
+        estado["caches"] += 1
+        nome = f"cachedContents/stub{estado['caches']}"
+        caches[nome] = time.monotonic() + ttl(corpo)
+        return web.json_response(descrever(nome))
+
+    async def cache(request: web.Request) -> web.Response:
+        nome = f"cachedContents/{request.match_info['id']}"
+        corpo = await request.json() if request.can_read_body else {}
+        if not cache_valido(nome):
+            return _erro(404, "NOT_FOUND", f"{nome} not found")
+        if request.method == "DELETE":
+            del caches[nome]
+            return web.json_response({})
+        if request.method == "PATCH":
+            estado["renovacoes"] += 1
+            caches[nome] = time.monotonic() + ttl(corpo)
+        return web.json_response(descrever(nome))
+
+    async def expirar(request: web.Request) -> web.Response:
+        caches.clear()
+        return web.json_response({})
+
+    async def status(request: web.Request) -> web.Response:
+        estado["caches_ativos"] = sum(1 for nome in list(caches) if cache_valido(nome))
+        return web.json_response(estado)
+
+    app = web.Application()
+    app["estado"] = estado
+    app["config"] = config
+    app.router.add_post("/{versao}/models/{acao}", modelos)
+    app.router.add_post("/{versao}/cachedContents", criar_cache)
+    app.router.add_route("*", "/{versao}/cachedContents/{id}", cache)
+    app.router.add_post("/admin/expirar", expirar)
+    app.router.add_get("/status", status)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--porta", type=int, default=8091)
+    parser.add_argument("--ttft", type=float, default=0.5)
+    parser.add_argument("--variacao", type=float, default=0.2)
+    parser.add_argument("--trechos", type=int, default=20)
+    parser.add_argument("--intervalo", type=float, default=0.02)
+    parser.add_argument("--tamanho", type=int, default=3000)
+    parser.add_argument("--codigo", type=float, default=0.3)
+    parser.add_argument("--taxa-erro", type=float, default=0.0)
+    parser.add_argument("--cache-min", type=int, default=0)
+    parser.add_argument("--max-entrada", type=int, default=0)
+    args = parser.parse_args()
+    config = ConfigStub(
+        ttft=args.ttft, variacao=args.variacao, trechos=args.trechos, intervalo=args.intervalo,
+        tamanho=args.tamanho, codigo=args.codigo, taxa_erro=args.taxa_erro,
+        cache_min=args.cache_min, max_entrada=args.max_entrada,
+    )
+    web.run_app(criar_app(config), host="127.0.0.1", port=args.porta)
+
+
+if __name__ == "__main__":
+    main()
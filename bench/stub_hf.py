@@ -0,0 +1,108 @@
+"""Servidor falso do router do Hugging Face, para testes locais e carga.
+
+Responde como o endpoint de inferência do SDXL: PNG com status 200, ou
+503 com `estimated_time` enquanto o "modelo carrega", com latência e taxa
+de erro configuráveis. `lentas` faz as próximas N chamadas demorarem
+`latencia_lenta` (para exercitar o hedging).
+
+    python bench/stub_hf.py --porta 8089 --carregando 2 --latencia 3
+    HF_MODEL_URL=http://127.0.0.1:8089/models/sdxl HF_TOKEN=x python main.py
+"""
+import argparse
+import asyncio
+import random
+import struct
+import zlib
+from dataclasses import dataclass
+
+from aiohttp import web
+
+
+def png_minimo(lado: int = 64) -> bytes:
+    """PNG RGB válido de `lado`² (sem depender de Pillow)."""
+    def bloco(tipo: bytes, dados: bytes) -> bytes:
+        return struct.pack(">I", len(dados)) + tipo + dados + struct.pack(">I", zlib.crc32(tipo + dados))
+
+    linha = b"\x00" + bytes(range(256)) * (lado * 3 // 256) + bytes(lado * 3 % 256)
+    cabecalho = struct.pack(">IIBBBBB", lado, lado, 8, 2, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + bloco(b"IHDR", cabecalho)
+        + bloco(b"IDAT", zlib.compress(linha * lado))
+        + bloco(b"IEND", b"")
+    )
+
+
+@dataclass
+class ConfigStub:
+    latencia: float = 2.0       # segundos por imagem
+    variacao: float = 0.5       # jitter uniforme (± segundos)
+    carregando: int = 0         # primeiras N chamadas respondem 503 "loading"
+    estimated_time: float = 5.0
+    taxa_erro: float = 0.0      # fração de 500 aleatórios
+    status_fixo: int = 0        # se != 0, sempre responde esse status (simula queda)
+    lentas: int = 0             # as próximas N chamadas levam `latencia_lenta`
+    latencia_lenta: float = 10.0
+    lado: int = 64
+
+
+def criar_app(config: ConfigStub) -> web.Application:
+    imagem = png_minimo(config.lado)
+    estado = {"chamadas": 0, "em_andamento": 0, "max_em_andamento": 0}
+
+    async def inferencia(request: web.Request) -> web.Response:
+        estado["chamadas"] += 1
+        await request.read()
+        if config.status_fixo:
+            return web.json_response({"error": "stub fora do ar"}, status=config.status_fixo)
+        if estado["chamadas"] <= config.carregando:
+            return web.json_response(
+                {"error": "Model is currently loading", "estimated_time": config.estimated_time}, status=503
+            )
+        estado["em_andamento"] += 1
+        estado["max_em_andamento"] = max(estado["max_em_andamento"], estado["em_andamento"])
+        latencia = config.latencia + random.uniform(-config.variacao, config.variacao)
+        if config.lentas > 0:
+            config.lentas -= 1
+            latencia = config.latencia_lenta
+        try:
+            await asyncio.sleep(max(0.0, latencia))
+        finally:
+            estado["em_andamento"] -= 1
+        if random.random() < config.taxa_erro:
+            return web.json_response({"error": "erro simulado"}, status=500)
+        return web.Response(body=imagem, content_type="image/png")
+
+    async def status(request: web.Request) -> web.Response:
+        return web.json_response(estado)
+
+    app = web.Application()
+    app["estado"] = estado
+    app["config"] = config
+    app.router.add_post("/models/{modelo:.*}", inferencia)
+    app.router.add_get("/status", status)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--porta", type=int, default=8089)
+    parser.add_argument("--latencia", type=float, default=2.0)
+    parser.add_argument("--variacao", type=float, default=0.5)
+    parser.add_argument("--carregando", type=int, default=0)
+    parser.add_argument("--estimated-time", type=float, default=5.0)
+    parser.add_argument("--taxa-erro", type=float, default=0.0)
+    parser.add_argument("--status-fixo", type=int, default=0)
+    parser.add_argument("--lentas", type=int, default=0)
+    parser.add_argument("--latencia-lenta", type=float, default=10.0)
+    args = parser.parse_args()
+    config = ConfigStub(
+        latencia=args.latencia, variacao=args.variacao, carregando=args.carregando,
+        estimated_time=args.estimated_time, taxa_erro=args.taxa_erro, status_fixo=args.status_fixo,
+        lentas=args.lentas, latencia_lenta=args.latencia_lenta,
+    )
+    web.run_app(criar_app(config), host="127.0.0.1", port=args.porta)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Cache em disco das imagens geradas, endereçado por conteúdo.
+
+A chave é o hash do prompt normalizado + URL do modelo; os bytes ficam em
+`pasta/ab/<hash>`. Um índice LRU em memória controla o teto de bytes, e o
+despejo é preguiçoso: só acontece quando uma gravação passa do limite.
+Toda E/S de disco roda fora do loop de eventos, e é de melhor esforço:
+falha de disco vira falta no cache, nunca erro para quem pediu a imagem.
+"""
+import asyncio
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+
+from cache_respostas import normalizar
+
+
+def chave_imagem(prompt: str, modelo: str) -> str:
+    return hashlib.sha256(f"{modelo}\0{normalizar(prompt)}".encode("utf-8")).hexdigest()
+
+
+class CacheImagens:
+    def __init__(self, pasta: str, max_bytes: int = 512 * 1024 * 1024):
+        self.pasta = pasta
+        self.max_bytes = max_bytes
+        self.indice: OrderedDict[str, int] = OrderedDict()  # chave → tamanho, do menos recente ao mais
+        self.bytes = 0
+        self.acertos = 0
+        self.faltas = 0
+
+    async def abrir(self):
+        """Reconstrói o índice a partir dos arquivos, ordenado pelo último acesso."""
+        arquivos = await asyncio.to_thread(self._varrer_pasta)
+        for chave, tamanho, _ in sorted(arquivos, key=lambda a: a[2]):
+            self.indice[chave] = tamanho
+            self.bytes += tamanho
+
+    async def obter(self, chave: str) -> bytes | None:
+        if chave not in self.indice:
+            self.faltas += 1
+            return None
+        dados = await asyncio.to_thread(self._ler, chave)
+        if dados is None:
+            # Arquivo sumiu por fora: limpa o índice
+            self.bytes -= self.indice.pop(chave, 0)
+            self.faltas += 1
+            return None
+        self.indice.move_to_end(chave)
+        self.acertos += 1
+        return dados
+
+    async def guardar(self, chave: str, dados: bytes):
+        if len(dados) > self.max_bytes:
+            return
+        self.bytes -= self.indice.pop(chave, 0)
+        self.indice[chave] = len(dados)
+        self.bytes += len(dados)
+        despejar = []
+        while self.bytes > self.max_bytes:
+            antiga, tamanho = self.indice.popitem(last=False)
+            self.bytes -= tamanho
+            despejar.append(antiga)
+        try:
+            await asyncio.to_thread(self._gravar, chave, dados, despejar)
+        except OSError as e:
+            print(f"[IMG] Falha ao gravar no cache: {e}")
+            if self.indice.get(chave) == len(dados):
+                self.bytes -= self.indice.pop(chave)
+
+    def estatisticas(self) -> dict:
+        consultas = self.acertos + self.faltas
+        return {
+            "imagens": len(self.indice),
+            "bytes": self.bytes,
+            "acertos": self.acertos,
+            "taxa": self.acertos / consultas if consultas else 0.0,
+        }
+
+    # ------------------------------
+    # Disco (roda em thread)
+    # ------------------------------
+    def _caminho(self, chave: str) -> str:
+        return os.path.join(self.pasta, chave[:2], chave)
+
+    def _varrer_pasta(self):
+        os.makedirs(self.pasta, exist_ok=True)
+        arquivos = []
+        for sub in os.scandir(self.pasta):
+            if not sub.is_dir():
+                continue
+            for arquivo in os.scandir(sub.path):
+                if arquivo.name.endswith(".tmp"):
+                    os.remove(arquivo.path)
+                    continue
+                info = arquivo.stat()
+                arquivos.append((arquivo.name, info.st_size, info.st_mtime))
+        return arquivos
+
+    def _ler(self, chave: str) -> bytes | None:
+        caminho = self._caminho(chave)
+        try:
+            with open(caminho, "rb") as f:
+                dados = f.read()
+            os.utime(caminho)  # mantém a ordem LRU entre reinícios
+            return dados
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            print(f"[IMG] Falha ao ler do cache: {e}")
+            return None
+
+    def _gravar(self, chave: str, dados: bytes, despejar: list[str]):
+        caminho = self._caminho(chave)
+        # As despejadas já saíram do índice: apaga antes, mesmo que a gravação falhe
+        for antiga in despejar:
+            try:
+                os.remove(self._caminho(antiga))
+            except FileNotFoundError:
+                pass
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        # Temporário exclusivo: gravações simultâneas da mesma chave não se cruzam
+        descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho), prefix=chave[:16], suffix=".tmp")
+        try:
+            with os.fdopen(descritor, "wb") as f:
+                f.write(dados)
+            os.replace(temporario, caminho)
+        except BaseException:
+            try:
+                os.remove(temporario)
+            except OSError:
+                pass
+            raise
@@ -0,0 +1,107 @@
+"""Cache de contexto do Gemini para o SYSTEM_PROMPT.
+
+O prompt de sistema tem milhares de tokens e seria reenviado em toda
+chamada. Aqui ele vira um "cached content" no servidor, referenciado pelo
+nome em `GenerateContentConfig.cached_content`, renovado antes de o TTL
+vencer. Se a criação falhar (modelo sem suporte, prompt abaixo do mínimo,
+cota), as chamadas seguem com `system_instruction` inline.
+
+`caches` é qualquer objeto com `create`, `update` e `delete` assíncronos no
+formato de `client.aio.caches` — em produção o do SDK, em teste um falso.
+"""
+import time
+
+from resiliencia import status_do_erro
+
+
+def cache_recusado(erro: Exception) -> bool:
+    """O erro de uma geração é do cache citado (expirado, apagado, de outro projeto)?
+
+    Outros 400 (entrada longa demais, parâmetro inválido) não são: tratá-los
+    como recusa desligaria um cache bom e repetiria a chamada à toa.
+    """
+    status = status_do_erro(erro)
+    if status in (403, 404):
+        return True
+    return status == 400 and "cachedcontent" in str(erro).lower().replace(" ", "").replace("_", "")
+
+
+class CacheSystemPrompt:
+    def __init__(self, caches, modelo: str, system_prompt: str, ttl: int = 3600,
+                 margem: int = 300, espera_recriar: int = 300, relogio=time.monotonic):
+        self.caches = caches
+        self.modelo = modelo
+        self.system_prompt = system_prompt
+        self.ttl = ttl
+        self.margem = margem  # renova quando faltar menos que isso
+        self.espera_recriar = espera_recriar  # depois de falhar, espera antes de tentar de novo
+        self.relogio = relogio
+        self.nome = None
+        self.expira = 0.0
+        self.proxima_tentativa = 0.0
+        self.falhas = 0
+
+    @property
+    def ativo(self) -> bool:
+        return self.nome is not None and self.relogio() < self.expira
+
+    def config(self) -> dict:
+        """Campos de GenerateContentConfig para o prompt de sistema."""
+        if self.ativo:
+            return {"cached_content": self.nome}
+        return {"system_instruction": self.system_prompt}
+
+    async def iniciar(self) -> bool:
+        try:
+            criado = await self.caches.create(
+                model=self.modelo,
+                config={
+                    "system_instruction": self.system_prompt,
+                    "display_name": "system-prompt",
+                    "ttl": f"{self.ttl}s",
+                },
+            )
+        except Exception as e:
+            self._falhou(f"criar: {e}")
+            return False
+        self.nome = criado.name
+        self.expira = self.relogio() + self.ttl
+        self.falhas = 0
+        return True
+
+    async def renovar_se_preciso(self):
+        agora = self.relogio()
+        if self.nome is None:
+            if agora >= self.proxima_tentativa:
+                await self.iniciar()
+            return
+        if self.expira - agora > self.margem:
+            return
+        try:
+            await self.caches.update(name=self.nome, config={"ttl": f"{self.ttl}s"})
+        except Exception as e:
+            # Sumiu ou não dá para estender: tenta criar um novo
+            print(f"[CACHE] Falha ao renovar {self.nome}: {e}")
+            self.nome = None
+            await self.iniciar()
+            return
+        self.expira = self.relogio() + self.ttl
+
+    def invalidar(self):
+        """O servidor recusou o cache numa geração: volta para o prompt inline."""
+        self._falhou(f"{self.nome} recusado pelo servidor")
+        self.nome = None
+
+    async def encerrar(self):
+        if self.nome is None:
+            return
+        try:
+            await self.caches.delete(name=self.nome)
+        except Exception as e:
+            print(f"[CACHE] Falha ao apagar {self.nome}: {e}")
+        self.nome = None
+
+    def _falhou(self, motivo: str):
+        self.falhas += 1
+        self.proxima_tentativa = self.relogio() + self.espera_recriar
+        print(f"[CACHE] Usando system_instruction inline ({motivo})")
@@ -0,0 +1,115 @@
+"""Cache de respostas da IA para perguntas repetidas, com coalescência.
+
+Só vale para perguntas sem histórico (a resposta depende apenas do texto,
+do modelo e do prompt de sistema). Entradas saem por LRU, TTL ou teto de
+bytes. Pedidos idênticos simultâneos compartilham uma única geração em
+andamento ("singleflight") em vez de disparar N chamadas ao modelo.
+"""
+import asyncio
+import hashlib
+import re
+import time
+from collections import OrderedDict
+
+
+def normalizar(texto: str) -> str:
+    texto = re.sub(r"\s+", " ", texto.casefold()).strip()
+    return texto.rstrip("?!. ")
+
+
+def chave_resposta(pergunta: str, modelo: str, hash_sistema: str) -> str:
+    bruto = f"{modelo}\0{hash_sistema}\0{normalizar(pergunta)}"
+    return hashlib.sha256(bruto.encode("utf-8")).hexdigest()
+
+
+class Entrada:
+    __slots__ = ("texto", "tamanho", "expira")
+
+    def __init__(self, texto: str, expira: float):
+        self.texto = texto
+        self.tamanho = len(texto.encode("utf-8"))
+        self.expira = expira
+
+
+class CacheRespostas:
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, ttl: float = 3600, max_itens: int = 5000):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self.itens: OrderedDict[str, Entrada] = OrderedDict()
+        self.bytes = 0
+        self.acertos = 0
+        self.coalescidos = 0
+        self.faltas = 0
+        self._em_andamento: dict[str, asyncio.Future] = {}
+
+    def obter(self, chave: str) -> str | None:
+        entrada = self.itens.get(chave)
+        if entrada is None:
+            return None
+        if time.monotonic() >= entrada.expira:
+            self._remover(chave)
+            return None
+        self.itens.move_to_end(chave)
+        return entrada.texto
+
+    def disponivel(self, chave: str) -> bool:
+        """Já tem resposta guardada ou sendo gerada para essa chave."""
+        return chave in self._em_andamento or self.obter(chave) is not None
+
+    def guardar(self, chave: str, texto: str):
+        if chave in self.itens:
+            self._remover(chave)
+        entrada = Entrada(texto, time.monotonic() + self.ttl)
+        if entrada.tamanho > self.max_bytes:
+            return
+        self.itens[chave] = entrada
+        self.bytes += entrada.tamanho
+        while self.bytes > self.max_bytes or len(self.itens) > self.max_itens:
+            self._remover(next(iter(self.itens)))
+
+    async def obter_ou_gerar(self, chave: str, gerar) -> tuple[str, str]:
+        """Retorna (texto, origem), origem em "cache", "coalescido" ou "gerado"."""
+        texto = self.obter(chave)
+        if texto is not None:
+            self.acertos += 1
+            return texto, "cache"
+
+        andamento = self._em_andamento.get(chave)
+        if andamento is not None:
+            self.coalescidos += 1
+            return await asyncio.shield(andamento), "coalescido"
+
+        self.faltas += 1
+        andamento = self._em_andamento[chave] = asyncio.get_running_loop().create_future()
+        try:
+            texto = await gerar()
+        except asyncio.CancelledError:
+            andamento.cancel()
+            raise
+        except Exception as e:
+            andamento.set_exception(e)
+            # Ninguém esperando: evita o aviso de exceção nunca lida
+            andamento.exception()
+            raise
+        else:
+            self.guardar(chave, texto)
+            andamento.set_result(texto)
+            return texto, "gerado"
+        finally:
+            del self._em_andamento[chave]
+
+    def estatisticas(self) -> dict:
+        pedidos = self.acertos + self.coalescidos + self.faltas
+        return {
+            "itens": len(self.itens),
+            "bytes": self.bytes,
+            "acertos": self.acertos,
+            "coalescidos": self.coalescidos,
+            "faltas": self.faltas,
+            "taxa": (self.acertos + self.coalescidos) / pedidos if pedidos else 0.0,
+        }
+
+    def _remover(self, chave: str):
+        entrada = self.itens.pop(chave)
+        self.bytes -= entrada.tamanho
@@ -0,0 +1,62 @@
+"""Compactação do histórico de conversa para caber num orçamento de tokens.
+
+- `estimar_tokens`: contagem aproximada, feita uma vez por turno (o valor
+  real da resposta do modelo vem depois, do usage_metadata);
+- `omitir_codigo`: troca blocos de código grandes de respostas antigas por
+  uma linha curta — o usuário já recebeu o arquivo;
+- `truncar`: corta o meio de um turno longo, mantendo começo e fim.
+
+As cercas seguem as mesmas regras do FormatadorMarkdown: ``` no início da
+linha abre, uma linha só de crases fecha.
+"""
+BYTES_POR_TOKEN = 4  # média do tokenizador do Gemini para português e código
+
+
+def estimar_tokens(texto: str) -> int:
+    return max(1, -(-len(texto.encode("utf-8")) // BYTES_POR_TOKEN))
+
+
+def omitir_codigo(texto: str, min_linhas: int = 12) -> str:
+    linhas = texto.split("\n")
+    saida = []
+    i = 0
+    while i < len(linhas):
+        limpa = linhas[i].strip()
+        if not (limpa.startswith("```") and "```" not in limpa[3:]):
+            saida.append(linhas[i])
+            i += 1
+            continue
+        fim = i + 1
+        while fim < len(linhas) and not (linhas[fim].strip().startswith("```") and not linhas[fim].strip().strip("`")):
+            fim += 1
+        corpo = fim - i - 1
+        if fim < len(linhas) and corpo >= min_linhas:
+            info = limpa[3:].split()
+            linguagem = info[0].lower() if info else "de código"
+            saida.append(f"[bloco {linguagem} de {corpo} linhas omitido; já foi enviado ao usuário]")
+        else:
+            saida.extend(linhas[i:fim + 1])  # pequeno ou sem fechamento: fica como está
+        i = fim + 1
+    return "\n".join(saida)
+
+
+def truncar(texto: str, max_tokens: int) -> str:
+    """Mantém ~2/3 do orçamento no começo e o resto no fim.
+
+    O corte é em bytes (a mesma conta de `estimar_tokens`), com a marca
+    incluída: o resultado sempre cabe em `max_tokens`, mesmo com acentos.
+    """
+    limite = max_tokens * BYTES_POR_TOKEN
+    dados = texto.encode("utf-8")
+    if len(dados) <= limite:
+        return texto
+    marca = "\n[... trecho antigo cortado ...]\n"
+    livre = limite - len(marca.encode("utf-8"))
+    if livre <= 0:
+        return dados[:limite].decode("utf-8", errors="ignore")
+    inicio = livre * 2 // 3
+    fim = livre - inicio
+    return (
+        dados[:inicio].decode("utf-8", errors="ignore") + marca
+        + dados[len(dados) - fim:].decode("utf-8", errors="ignore")
+    )
@@ -0,0 +1,166 @@
+"""Estado compartilhado entre os processos do bot (modo multiprocesso).
+
+Cada processo roda uma fatia dos shards, mas o mesmo usuário pode falar
+com o bot por shards diferentes (servidores distintos, DM). O que precisa
+ser igual em todos os processos fica num SQLite local em modo WAL:
+
+- as janelas do limite de uso (`LimitadorCompartilhado`);
+- flags globais, como a IA ligada/desligada;
+- a vez de cada processo mandar IDENTIFY ao gateway.
+
+Cada operação é uma transação curta num índice (WAL, `synchronous=NORMAL`,
+sem fsync no commit), mas outro processo pode estar com o banco travado:
+por isso as classes mantêm a interface síncrona do `LimitadorJanela` e o
+bot as chama por `EstadoCompartilhado.executar`, numa thread dedicada,
+sem travar o loop. O histórico de conversa fica no `HistoricoSQLite`, de
+preferência em outro arquivo (os lotes dele seguram a trava do banco).
+"""
+import asyncio
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS usos (
+    user_id INTEGER NOT NULL,
+    instante REAL   NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_usos_usuario ON usos (user_id, instante);
+CREATE TABLE IF NOT EXISTS flags (
+    nome  TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS identificacoes (
+    bucket  INTEGER PRIMARY KEY,
+    proximo REAL    NOT NULL
+);
+"""
+
+
+class EstadoCompartilhado:
+    def __init__(self, caminho: str, relogio=time.time):
+        self.caminho = caminho
+        self.relogio = relogio  # relógio de parede: é comparado entre processos
+        self.conn = sqlite3.connect(caminho, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.conn.executescript(ESQUEMA)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="estado")
+
+    async def executar(self, funcao, *args):
+        """Roda uma operação no banco (desta classe ou do limitador) fora do loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, funcao, *args)
+
+    def fechar(self):
+        self._executor.shutdown(wait=True)
+        self.conn.close()
+
+    @contextmanager
+    def transacao(self):
+        """Transação de escrita: trava o banco já no início (sem upgrade de lock)."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    # ------------------------------
+    # Flags
+    # ------------------------------
+    def flag(self, nome: str, padrao: bool) -> bool:
+        linha = self.conn.execute("SELECT valor FROM flags WHERE nome = ?", (nome,)).fetchone()
+        return padrao if linha is None else linha[0] == "1"
+
+    def definir_flag(self, nome: str, valor: bool):
+        self.conn.execute(
+            "INSERT INTO flags (nome, valor) VALUES (?, ?) "
+            "ON CONFLICT (nome) DO UPDATE SET valor = excluded.valor",
+            (nome, "1" if valor else "0"),
+        )
+
+    # ------------------------------
+    # Gateway
+    # ------------------------------
+    def reservar_identificacao(self, bucket: int, intervalo: float = 5.0) -> float:
+        """Reserva a próxima vaga de IDENTIFY do bucket; retorna quanto esperar.
+
+        O Discord aceita um IDENTIFY a cada 5 s por bucket
+        (shard_id % max_concurrency), somando todos os processos.
+        """
+        agora = self.relogio()
+        with self.transacao() as conn:
+            linha = conn.execute("SELECT proximo FROM identificacoes WHERE bucket = ?", (bucket,)).fetchone()
+            inicio = max(agora, linha[0] if linha else 0.0)
+            conn.execute(
+                "INSERT INTO identificacoes (bucket, proximo) VALUES (?, ?) "
+                "ON CONFLICT (bucket) DO UPDATE SET proximo = excluded.proximo",
+                (bucket, inicio + intervalo),
+            )
+        return inicio - agora
+
+
+class LimitadorCompartilhado:
+    """Mesma interface do `LimitadorJanela`, com os usos no banco compartilhado."""
+
+    def __init__(self, estado: EstadoCompartilhado, limite: int, janela: float):
+        self.estado = estado
+        self.limite = limite
+        self.janela = janela
+
+    def __len__(self) -> int:
+        corte = self.estado.relogio() - self.janela
+        return self.estado.conn.execute(
+            "SELECT COUNT(DISTINCT user_id) FROM usos WHERE instante > ?", (corte,)
+        ).fetchone()[0]
+
+    def consumir(self, user_id: int) -> tuple[bool, int]:
+        """Registra um uso se houver vaga. Retorna (pode, usos restantes)."""
+        agora = self.estado.relogio()
+        with self.estado.transacao() as conn:
+            conn.execute("DELETE FROM usos WHERE user_id = ? AND instante <= ?", (user_id, agora - self.janela))
+            usados = conn.execute("SELECT COUNT(*) FROM usos WHERE user_id = ?", (user_id,)).fetchone()[0]
+            if usados >= self.limite:
+                return False, 0
+            conn.execute("INSERT INTO usos (user_id, instante) VALUES (?, ?)", (user_id, agora))
+        return True, self.limite - usados - 1
+
+    def usos(self, user_id: int) -> int:
+        corte = self.estado.relogio() - self.janela
+        return self.estado.conn.execute(
+            "SELECT COUNT(*) FROM usos WHERE user_id = ? AND instante > ?", (user_id, corte)
+        ).fetchone()[0]
+
+    def renova_em(self, user_id: int) -> float:
+        """Segundos até o uso mais antigo sair da janela (0 se não há usos)."""
+        agora = self.estado.relogio()
+        mais_antigo = self.estado.conn.execute(
+            "SELECT MIN(instante) FROM usos WHERE user_id = ? AND instante > ?", (user_id, agora - self.janela)
+        ).fetchone()[0]
+        return mais_antigo + self.janela - agora if mais_antigo is not None else 0.0
+
+    def espera(self, user_id: int) -> float:
+        """Segundos até haver uma vaga livre (0 se já pode usar)."""
+        if self.usos(user_id) < self.limite:
+            return 0.0
+        return self.renova_em(user_id)
+
+    def devolver(self, user_id: int):
+        """Desfaz o último consumo (pedido recusado antes de ser atendido)."""
+        self.estado.conn.execute(
+            "DELETE FROM usos WHERE rowid = ("
+            " SELECT rowid FROM usos WHERE user_id = ? ORDER BY instante DESC LIMIT 1)",
+            (user_id,),
+        )
+
+    def resetar(self, user_id: int):
+        self.estado.conn.execute("DELETE FROM usos WHERE user_id = ?", (user_id,))
+
+    def varrer(self) -> int:
+        """Apaga usos fora da janela (de todos os processos). Retorna quantos saíram."""
+        corte = self.estado.relogio() - self.janela
+        return self.estado.conn.execute("DELETE FROM usos WHERE instante <= ?", (corte,)).rowcount
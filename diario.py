@@ -0,0 +1,218 @@
+"""Diário estruturado dos pedidos à IA: memória limitada + JSONL rotacionado.
+
+Cada pedido vira um registro (usuário, servidor, hash e começo da
+pergunta, latência, tokens, resultado). Os mais recentes ficam num buffer
+circular em memória; todos vão para o disco em lote pela EscritaEmLote
+(escrita.py), que também faz as leituras na sua thread dedicada.
+
+O arquivo atual (`<nome>.jsonl`) é rotacionado ao passar de `max_bytes`
+para `<nome>.<n>.jsonl`, mantendo os `max_arquivos` mais novos. O índice
+(`<nome>.indice.json`) guarda, por arquivo, o intervalo de tempo, os
+usuários e quantos erros há nele; as consultas do !logs só abrem os
+arquivos que podem ter algo que passe nos filtros.
+"""
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from escrita import EscritaEmLote
+
+
+def hash_pergunta(texto: str) -> str:
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()[:12]
+
+
+@dataclass
+class Filtro:
+    usuario: int | None = None
+    desde: float | None = None  # epoch
+    ate: float | None = None
+    erros: bool = False
+
+    def aceita(self, registro: dict) -> bool:
+        if self.usuario is not None and registro["usuario"] != self.usuario:
+            return False
+        if self.desde is not None and registro["ts"] < self.desde:
+            return False
+        if self.ate is not None and registro["ts"] > self.ate:
+            return False
+        return not self.erros or registro["resultado"] != "ok"
+
+    def pode_ter(self, resumo: dict) -> bool:
+        """Se o arquivo descrito por `resumo` (entrada do índice) pode ter registros aceitos."""
+        if not resumo["registros"]:
+            return False
+        if self.usuario is not None and self.usuario not in resumo["usuarios"]:
+            return False
+        if self.desde is not None and resumo["fim"] < self.desde:
+            return False
+        if self.ate is not None and resumo["inicio"] > self.ate:
+            return False
+        return not self.erros or resumo["erros"] > 0
+
+
+def _resumo_vazio(arquivo: str) -> dict:
+    return {"arquivo": arquivo, "inicio": 0.0, "fim": 0.0, "registros": 0, "erros": 0, "usuarios": set()}
+
+
+class DiarioIA:
+    def __init__(self, pasta: str | None, nome: str = "ia", max_bytes: int = 5 * 1024 * 1024,
+                 max_arquivos: int = 10, memoria: int = 1000, intervalo: float = 2.0, lote: int = 200):
+        self.pasta = pasta  # None: só o buffer em memória
+        self.nome = nome
+        self.max_bytes = max_bytes
+        self.max_arquivos = max_arquivos
+        self.recentes: deque[dict] = deque(maxlen=memoria)
+        # Estado do disco: só a thread da escrita mexe
+        self._rotacionados: list[dict] = []  # resumos, do mais antigo ao mais novo
+        self._atual = _resumo_vazio(f"{nome}.jsonl")
+        self._tamanho = 0
+        self._sequencia = 0
+        self._escrita = EscritaEmLote(self._gravar_sync, "diario", intervalo=intervalo, lote=lote)
+
+    # ------------------------------
+    # Ciclo de vida
+    # ------------------------------
+    async def abrir(self):
+        if self.pasta:
+            await self._escrita.executar(self._abrir_sync)
+            self._escrita.iniciar()
+
+    async def fechar(self):
+        await self._escrita.encerrar()
+
+    # ------------------------------
+    # API usada pelo bot
+    # ------------------------------
+    def registrar(self, registro: dict):
+        """Guarda um registro (precisa de "ts", "usuario" e "resultado"); não toca no disco."""
+        self.recentes.append(registro)
+        if self.pasta:
+            self._escrita.adicionar(registro)
+
+    async def consultar(self, filtro: Filtro, limite: int = 50) -> list[dict]:
+        """Registros aceitos pelo filtro, do mais novo ao mais antigo."""
+        achados = [r for r in reversed(self.recentes) if filtro.aceita(r)][:limite]
+        if len(achados) >= limite or not self.pasta:
+            return achados
+        # O que saiu da memória está nos arquivos: procura só antes do mais antigo em memória
+        corte = self.recentes[0]["ts"] if self.recentes else float("inf")
+        if filtro.desde is not None and filtro.desde >= corte:
+            return achados
+        await self.descarregar()
+        return achados + await self._escrita.executar(self._consultar_sync, filtro, corte, limite - len(achados))
+
+    async def descarregar(self):
+        await self._escrita.descarregar()
+
+    # ------------------------------
+    # Interno
+    # ------------------------------
+    def _caminho(self, arquivo: str) -> str:
+        return os.path.join(self.pasta, arquivo)
+
+    def _abrir_sync(self):
+        os.makedirs(self.pasta, exist_ok=True)
+        try:
+            with open(self._caminho(f"{self.nome}.indice.json"), encoding="utf-8") as f:
+                indice = json.load(f)
+        except (OSError, ValueError):
+            indice = {}
+        self._sequencia = indice.get("sequencia", 0)
+        for resumo in indice.get("rotacionados", []) + [indice.get("atual")]:
+            if resumo:
+                resumo["usuarios"] = set(resumo["usuarios"])
+        self._rotacionados = [r for r in indice.get("rotacionados", []) if os.path.exists(self._caminho(r["arquivo"]))]
+        try:
+            self._tamanho = os.path.getsize(self._caminho(self._atual["arquivo"]))
+        except OSError:
+            self._tamanho = 0
+        if self._tamanho:
+            # Sem resumo confiável do arquivo atual (índice perdido): refaz lendo o arquivo
+            self._atual = indice.get("atual") or self._resumir(self._atual["arquivo"])
+
+    def _resumir(self, arquivo: str) -> dict:
+        resumo = _resumo_vazio(arquivo)
+        for registro in self._ler(arquivo):
+            self._somar(resumo, registro)
+        return resumo
+
+    @staticmethod
+    def _somar(resumo: dict, registro: dict):
+        if not resumo["registros"]:
+            resumo["inicio"] = registro["ts"]
+        resumo["fim"] = registro["ts"]
+        resumo["registros"] += 1
+        resumo["erros"] += registro["resultado"] != "ok"
+        resumo["usuarios"].add(registro["usuario"])
+
+    def _gravar_sync(self, lote: list[dict]):
+        linhas = [json.dumps(r, ensure_ascii=False) + "\n" for r in lote]
+        f = open(self._caminho(self._atual["arquivo"]), "a", encoding="utf-8")
+        try:
+            for registro, linha in zip(lote, linhas):
+                tamanho = len(linha.encode("utf-8"))
+                if self._tamanho and self._tamanho + tamanho > self.max_bytes:
+                    f.close()
+                    self._rotacionar()
+                    f = open(self._caminho(self._atual["arquivo"]), "a", encoding="utf-8")
+                f.write(linha)
+                self._tamanho += tamanho
+                self._somar(self._atual, registro)
+        finally:
+            f.close()
+        self._salvar_indice()
+
+    def _rotacionar(self):
+        self._sequencia += 1
+        destino = f"{self.nome}.{self._sequencia}.jsonl"
+        os.replace(self._caminho(self._atual["arquivo"]), self._caminho(destino))
+        self._atual["arquivo"] = destino
+        self._rotacionados.append(self._atual)
+        self._atual = _resumo_vazio(f"{self.nome}.jsonl")
+        self._tamanho = 0
+        while len(self._rotacionados) >= self.max_arquivos:
+            antigo = self._rotacionados.pop(0)
+            try:
+                os.remove(self._caminho(antigo["arquivo"]))
+            except OSError:
+                pass
+
+    def _salvar_indice(self):
+        def serializar(resumo):
+            return dict(resumo, usuarios=sorted(resumo["usuarios"]))
+
+        indice = {
+            "sequencia": self._sequencia,
+            "rotacionados": [serializar(r) for r in self._rotacionados],
+            "atual": serializar(self._atual),
+        }
+        caminho = self._caminho(f"{self.nome}.indice.json")
+        with open(caminho + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(indice, f)
+        os.replace(caminho + ".tmp", caminho)
+
+    def _ler(self, arquivo: str):
+        try:
+            with open(self._caminho(arquivo), encoding="utf-8") as f:
+                for linha in f:
+                    try:
+                        yield json.loads(linha)
+                    except ValueError:
+                        continue  # linha cortada por uma queda no meio da gravação
+        except OSError:
+            return
+
+    def _consultar_sync(self, filtro: Filtro, corte: float, limite: int) -> list[dict]:
+        achados = []
+        for resumo in reversed(self._rotacionados + [self._atual]):
+            if resumo["inicio"] >= corte or not filtro.pode_ter(resumo):
+                continue
+            do_arquivo = [r for r in self._ler(resumo["arquivo"]) if r["ts"] < corte and filtro.aceita(r)]
+            achados.extend(reversed(do_arquivo[-(limite - len(achados)):]))
+            if len(achados) >= limite:
+                break
+        return achados
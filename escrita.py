@@ -0,0 +1,87 @@
+"""Escrita em lote fora do loop de eventos (write-behind).
+
+Os itens entram numa fila em memória e uma tarefa de fundo os descarrega
+em lote — a cada `intervalo` segundos, ou antes, quando a fila chega a
+`lote` — chamando `gravar(lote)` numa thread dedicada. As leituras passam
+pela mesma thread (`executar`), então o arquivo ou banco só é tocado por
+ela e o loop nunca espera pelo disco.
+
+Se a gravação falhar com um dos `erros` (disco cheio, banco travado), o
+lote volta para o começo da fila e é tentado de novo na descarga seguinte
+(um lote gravado pela metade pode sair repetido). Acima de `max_pendentes`
+os itens mais antigos são descartados e contados em `perdidos`.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+class EscritaEmLote:
+    def __init__(self, gravar, nome: str, intervalo: float = 2.0, lote: int = 500,
+                 max_pendentes: int = 50000, erros: tuple = (OSError,)):
+        self.gravar = gravar  # gravar(lote), roda na thread
+        self.nome = nome      # nome da thread e prefixo dos avisos
+        self.intervalo = intervalo
+        self.lote = lote
+        self.max_pendentes = max_pendentes
+        self.erros = erros
+        self.pendentes: list = []
+        self.perdidos = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=nome)
+        self._acordar = asyncio.Event()
+        self._descarga = asyncio.Lock()
+        self._tarefa = None
+
+    def iniciar(self):
+        self._tarefa = asyncio.create_task(self._escritor())
+
+    async def encerrar(self, finalizar=None):
+        """Para a tarefa, grava o que falta e roda `finalizar()` na thread antes de desligá-la."""
+        if self._tarefa:
+            self._tarefa.cancel()
+            self._tarefa = None
+        try:
+            await self.descarregar()
+        except self.erros as e:
+            print(f"[{self.nome.upper()}] {len(self.pendentes)} registro(s) não gravado(s) ao encerrar: {e}")
+        if finalizar is not None:
+            await self.executar(finalizar)
+        self._executor.shutdown(wait=True)
+
+    def adicionar(self, item):
+        """Enfileira um item; não toca no disco."""
+        self.pendentes.append(item)
+        if len(self.pendentes) >= self.lote:
+            self._acordar.set()
+
+    async def descarregar(self):
+        async with self._descarga:
+            if not self.pendentes:
+                return
+            lote, self.pendentes = self.pendentes, []
+            try:
+                await self.executar(self.gravar, lote)
+            except self.erros:
+                # Devolve o lote à frente do que chegou enquanto ele era gravado
+                self.pendentes[:0] = lote
+                excesso = len(self.pendentes) - self.max_pendentes
+                if excesso > 0:
+                    del self.pendentes[:excesso]
+                    self.perdidos += excesso
+                    print(f"[{self.nome.upper()}] {excesso} registro(s) descartado(s): fila de gravação cheia")
+                raise
+
+    async def executar(self, funcao, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, funcao, *args)
+
+    async def _escritor(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._acordar.wait(), self.intervalo)
+            except asyncio.TimeoutError:
+                pass
+            self._acordar.clear()
+            try:
+                await self.descarregar()
+            except self.erros as e:
+                print(f"[{self.nome.upper()}] Erro ao gravar lote ({len(self.pendentes)} pendente(s)): {e}")
@@ -0,0 +1,118 @@
+"""Fila de geração de imagens com número fixo de trabalhadores.
+
+Rajadas de `!img` viram fila em vez de dezenas de chamadas paralelas ao
+SDXL. Quem espera recebe a posição na fila e, durante a geração, o tempo
+decorrido.
+"""
+import asyncio
+import time
+from collections import deque
+
+from agendador import FilaCheia
+
+
+class TrabalhoImagem:
+    __slots__ = ("prompt", "posicao", "inicio", "resultado", "evento")
+
+    def __init__(self, prompt: str):
+        self.prompt = prompt
+        self.posicao = 0
+        self.inicio = None  # quando um trabalhador pegou
+        self.resultado = asyncio.get_running_loop().create_future()
+        self.evento = asyncio.Event()
+
+
+class FilaImagens:
+    def __init__(self, gerar, trabalhadores: int = 2, max_fila: int = 30, tempo_inicial: float = 20.0):
+        self.gerar = gerar  # async (prompt) -> bytes | None
+        self.trabalhadores = trabalhadores
+        self.max_fila = max_fila
+        self.tempo_medio = tempo_inicial
+        self._pendentes: deque[TrabalhoImagem] = deque()
+        self._tem_trabalho = asyncio.Event()
+        self._tarefas: list[asyncio.Task] = []
+
+    def __len__(self) -> int:
+        return len(self._pendentes)
+
+    def eta(self, posicao: int) -> float:
+        return (posicao + self.trabalhadores - 1) // self.trabalhadores * self.tempo_medio
+
+    def iniciar(self):
+        self._tarefas = [asyncio.create_task(self._trabalhador()) for _ in range(self.trabalhadores)]
+
+    async def encerrar(self):
+        for tarefa in self._tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*self._tarefas, return_exceptions=True)
+        self._tarefas = []
+        while self._pendentes:
+            self._pendentes.popleft().resultado.cancel()
+
+    async def executar(self, prompt: str, ao_atualizar=None, intervalo: float = 5.0) -> bytes | None:
+        """Enfileira e espera o resultado.
+
+        `ao_atualizar(posicao, decorrido)` é chamado quando a posição muda
+        e, durante a geração (posicao 0), a cada `intervalo` segundos.
+        """
+        if len(self._pendentes) >= self.max_fila:
+            raise FilaCheia(self.eta(len(self._pendentes) + 1))
+
+        trabalho = TrabalhoImagem(prompt)
+        self._pendentes.append(trabalho)
+        trabalho.posicao = len(self._pendentes)
+        self._tem_trabalho.set()
+
+        try:
+            while not trabalho.resultado.done():
+                trabalho.evento.clear()
+                if ao_atualizar:
+                    decorrido = time.monotonic() - trabalho.inicio if trabalho.inicio else 0.0
+                    await ao_atualizar(trabalho.posicao, decorrido)
+                espera = asyncio.ensure_future(trabalho.evento.wait())
+                await asyncio.wait(
+                    {espera, trabalho.resultado},
+                    timeout=intervalo if trabalho.inicio else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                espera.cancel()
+        except asyncio.CancelledError:
+            if trabalho.inicio is None:
+                self._pendentes.remove(trabalho)
+                self._atualizar_posicoes()
+            else:
+                # Já está gerando: o resultado é descartado quando sair
+                trabalho.resultado.add_done_callback(lambda f: f.cancelled() or f.exception())
+            raise
+        return trabalho.resultado.result()
+
+    async def _trabalhador(self):
+        while True:
+            while not self._pendentes:
+                self._tem_trabalho.clear()
+                await self._tem_trabalho.wait()
+
+            trabalho = self._pendentes.popleft()
+            trabalho.inicio = time.monotonic()
+            trabalho.posicao = 0
+            trabalho.evento.set()
+            self._atualizar_posicoes()
+            try:
+                imagem = await self.gerar(trabalho.prompt)
+            except asyncio.CancelledError:
+                trabalho.resultado.cancel()
+                raise
+            except Exception as e:
+                if not trabalho.resultado.done():
+                    trabalho.resultado.set_exception(e)
+            else:
+                if not trabalho.resultado.done():
+                    trabalho.resultado.set_result(imagem)
+            finally:
+                self.tempo_medio = 0.8 * self.tempo_medio + 0.2 * (time.monotonic() - trabalho.inicio)
+
+    def _atualizar_posicoes(self):
+        for posicao, trabalho in enumerate(self._pendentes, start=1):
+            if trabalho.posicao != posicao:
+                trabalho.posicao = posicao
+                trabalho.evento.set()
@@ -0,0 +1,153 @@
+"""Formatador incremental das respostas da IA para o Discord.
+
+Recebe o texto em pedaços (resposta inteira ou trechos de streaming) e faz
+uma única passada, linha a linha:
+
+- prosa vira mensagens de até `limite` caracteres, cortadas só em fim de
+  parágrafo ou de linha (palavra só em último caso, linha gigante);
+- cada bloco ``` vira um anexo, emitido assim que a cerca fecha, na
+  posição em que aparecia entre a prosa.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+
+EXTENSOES = {
+    "python": "py", "py": "py",
+    "html": "html", "css": "css",
+    "javascript": "js", "js": "js",
+    "typescript": "ts", "ts": "ts",
+    "sql": "sql", "bash": "sh",
+    "shell": "sh", "sh": "sh",
+    "java": "java", "c": "c",
+    "cpp": "cpp", "c++": "cpp",
+    "php": "php", "json": "json",
+    "yaml": "yml", "xml": "xml",
+    "rust": "rs", "go": "go",
+    "kotlin": "kt", "swift": "swift",
+    "r": "r", "ruby": "rb",
+    "vue": "vue", "react": "jsx",
+    "jsx": "jsx", "tsx": "tsx",
+}
+
+
+@dataclass
+class Texto:
+    conteudo: str
+
+
+@dataclass
+class Anexo:
+    nome: str
+    conteudo: str
+
+
+class FormatadorMarkdown:
+    def __init__(self, limite: int = 1900):
+        self.limite = limite
+        self._resto = ""             # linha ainda incompleta
+        self._prosa: list[str] = []  # linhas da mensagem em formação
+        self._tamanho = 0
+        self._codigo: list[str] | None = None  # linhas do bloco aberto
+        self._lang = "txt"
+        self._contagem = defaultdict(int)
+
+    @property
+    def em_codigo(self) -> bool:
+        return self._codigo is not None
+
+    @property
+    def pendente(self) -> str:
+        """Prosa recebida que ainda não saiu como evento (para prévia ao vivo)."""
+        texto = "".join(self._prosa)
+        if not self.em_codigo and not self._resto.lstrip().startswith("`"):
+            texto += self._resto
+        return texto
+
+    def alimentar(self, trecho: str) -> list:
+        eventos = []
+        self._resto += trecho
+        inicio = 0
+        while True:
+            fim = self._resto.find("\n", inicio)
+            if fim == -1:
+                break
+            self._linha(self._resto[inicio:fim + 1], eventos)
+            inicio = fim + 1
+        self._resto = self._resto[inicio:]
+        return eventos
+
+    def finalizar(self) -> list:
+        eventos = []
+        if self._resto:
+            self._linha(self._resto, eventos)
+            self._resto = ""
+        if self._codigo is not None:
+            # Resposta cortada com bloco aberto: o que veio vira anexo
+            self._fechar_codigo(eventos)
+        self._emitir_prosa(eventos, tudo=True)
+        return eventos
+
+    # ------------------------------
+    # Interno
+    # ------------------------------
+    def _linha(self, linha: str, eventos: list):
+        limpa = linha.strip()
+        if self._codigo is not None:
+            if limpa.startswith("```") and not limpa.strip("`"):
+                self._fechar_codigo(eventos)
+            else:
+                self._codigo.append(linha)
+            return
+
+        if limpa.startswith("```") and "```" not in limpa[3:]:
+            # Abre bloco: a prosa anterior sai antes, para manter a ordem
+            self._emitir_prosa(eventos, tudo=True)
+            info = limpa[3:].split()
+            self._lang = info[0].lower() if info else "txt"
+            self._codigo = []
+            return
+
+        if self._tamanho + len(linha) > self.limite:
+            self._emitir_prosa(eventos, tudo=False)
+            if self._tamanho + len(linha) > self.limite:
+                # O fim de parágrafo deixou demais no buffer: corta no fim da última linha
+                self._emitir_prosa(eventos, tudo=True)
+        if len(linha) > self.limite:
+            self._quebrar_linha(linha, eventos)
+            return
+        self._prosa.append(linha)
+        self._tamanho += len(linha)
+
+    def _emitir_prosa(self, eventos: list, tudo: bool):
+        if not self._prosa:
+            return
+        corte = len(self._prosa)
+        if not tudo:
+            # Prefere terminar a mensagem num fim de parágrafo
+            for i in range(len(self._prosa) - 1, 0, -1):
+                if not self._prosa[i].strip():
+                    corte = i + 1
+                    break
+        texto = "".join(self._prosa[:corte]).strip()
+        self._prosa = self._prosa[corte:]
+        self._tamanho = sum(len(l) for l in self._prosa)
+        if texto:
+            eventos.append(Texto(texto))
+
+    def _quebrar_linha(self, linha: str, eventos: list):
+        while len(linha) > self.limite:
+            corte = linha.rfind(" ", 0, self.limite)
+            if corte <= 0:
+                corte = self.limite
+            eventos.append(Texto(linha[:corte].strip()))
+            linha = linha[corte:]
+        self._prosa.append(linha)
+        self._tamanho += len(linha)
+
+    def _fechar_codigo(self, eventos: list):
+        ext = EXTENSOES.get(self._lang, "txt")
+        self._contagem[ext] += 1
+        count = self._contagem[ext]
+        nome = f"codigo_{count}.{ext}" if count > 1 else f"codigo.{ext}"
+        eventos.append(Anexo(nome, "".join(self._codigo).strip()))
+        self._codigo = None
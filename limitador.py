@@ -0,0 +1,78 @@
+"""Limite de usos por usuário numa janela deslizante.
+
+Cada usuário tem uma deque com os horários dos usos dentro da janela.
+Os vencidos saem pela esquerda, então checar-e-consumir é O(1) amortizado
+e nunca reconstrói a lista inteira. Usuários sem usos na janela são
+removidos pela varredura periódica.
+"""
+import time
+from collections import deque
+
+
+class LimitadorJanela:
+    def __init__(self, limite: int, janela: float, relogio=time.monotonic):
+        self.limite = limite
+        self.janela = janela
+        self.relogio = relogio
+        self.usuarios: dict[int, deque] = {}
+
+    def __len__(self) -> int:
+        return len(self.usuarios)
+
+    def consumir(self, user_id: int) -> tuple[bool, int]:
+        """Registra um uso se houver vaga. Retorna (pode, usos restantes)."""
+        agora = self.relogio()
+        usos = self.usuarios.get(user_id)
+        if usos is None:
+            usos = self.usuarios[user_id] = deque()
+        else:
+            self._expirar(usos, agora)
+        if len(usos) >= self.limite:
+            return False, 0
+        usos.append(agora)
+        return True, self.limite - len(usos)
+
+    def usos(self, user_id: int) -> int:
+        """Usos dentro da janela, sem criar entrada para o usuário."""
+        usos = self.usuarios.get(user_id)
+        if usos is None:
+            return 0
+        self._expirar(usos, self.relogio())
+        return len(usos)
+
+    def renova_em(self, user_id: int) -> float:
+        """Segundos até o uso mais antigo sair da janela (0 se não há usos)."""
+        usos = self.usuarios.get(user_id)
+        if not usos:
+            return 0.0
+        agora = self.relogio()
+        self._expirar(usos, agora)
+        return usos[0] + self.janela - agora if usos else 0.0
+
+    def espera(self, user_id: int) -> float:
+        """Segundos até haver uma vaga livre (0 se já pode usar)."""
+        if self.usos(user_id) < self.limite:
+            return 0.0
+        return self.renova_em(user_id)
+
+    def devolver(self, user_id: int):
+        """Desfaz o último consumo (pedido recusado antes de ser atendido)."""
+        usos = self.usuarios.get(user_id)
+        if usos:
+            usos.pop()
+
+    def resetar(self, user_id: int):
+        self.usuarios.pop(user_id, None)
+
+    def varrer(self) -> int:
+        """Remove usuários sem usos na janela. Retorna quantos saíram."""
+        corte = self.relogio() - self.janela
+        vazios = [uid for uid, usos in self.usuarios.items() if not usos or usos[-1] <= corte]
+        for uid in vazios:
+            del self.usuarios[uid]
+        return len(vazios)
+
+    def _expirar(self, usos: deque, agora: float):
+        corte = agora - self.janela
+        while usos and usos[0] <= corte:
+            usos.popleft()
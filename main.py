@@ -1,37 +1,220 @@
 import os
 import io
-import re
+import importlib
+import signal
+import threading
+import hashlib
+import multiprocessing
+import contextvars
+import time
 import asyncio
 import aiohttp
 import discord
-from google import genai
-from google.genai import types
 from discord.ext import commands
-from datetime import datetime, timedelta
-from collections import defaultdict
+from datetime import datetime
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from discord.ext import tasks
+from sessoes import SessaoStore
+from compactacao import omitir_codigo, truncar
+from persistencia import HistoricoSQLite
+from limitador import LimitadorJanela
+from compartilhado import EstadoCompartilhado, LimitadorCompartilhado
+from agendador import AgendadorIA, FilaCheia
+from fila_imagens import FilaImagens
+from cache_imagens import CacheImagens, chave_imagem
+from politica_hf import ErroHF, PoliticaHF
+import transcodificar
+from cache_prompt import CacheSystemPrompt, cache_recusado
+from cache_respostas import CacheRespostas, chave_resposta
+from formatador import Anexo, FormatadorMarkdown, Texto
+from metricas import RAPIDO, Registro, servir
+from vigia import Vigia, amostrar, collapsed, mais_vistas
+from diario import DiarioIA, Filtro, hash_pergunta
+from roteador import Nivel, Roteador
+from resiliencia import Chave, CircuitBreaker, CircuitoAberto, PoolChaves, Resiliente, REPETIVEIS, status_do_erro
 
 # ==============================
 # CONFIG
 # ==============================
 TOKEN = os.getenv("DISCORD_TOKEN")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+# Várias chaves separadas por vírgula somam as cotas de cada uma
+GEMINI_API_KEYS = [k.strip() for k in (GEMINI_API_KEY or "").split(",") if k.strip()]
 HF_TOKEN = os.getenv("HF_TOKEN")
 OWNER_ID = 1370869648819617803
 
-intents = discord.Intents.all()
-bot = commands.Bot(command_prefix="!", intents=intents)
+# Modo enxuto: só os intents que os comandos usam, sem cache nem chunking de
+# membros e com o SDK do Gemini importado no primeiro pedido
+MODO_ENXUTO = os.getenv("BOT_MODO_ENXUTO", "1") != "0"
+# !iaclean/!resetusos por nome ou ID; por menção funcionam sem o intent
+INTENT_MEMBROS = os.getenv("BOT_INTENT_MEMBROS", "0") == "1"
+
+# Sharding: com BOT_PROCESSOS > 1, `python main.py` vira o supervisor e sobe
+# um processo por fatia dos BOT_SHARDS shards (0 = quantos o Discord recomendar)
+BOT_PROCESSOS = int(os.getenv("BOT_PROCESSOS", "1"))
+BOT_SHARDS = int(os.getenv("BOT_SHARDS", "0"))
+BOT_PROCESSO = os.getenv("BOT_PROCESSO")  # índice deste processo (definido pelo supervisor)
+MULTIPROCESSO = BOT_PROCESSO is not None
+IDENTIFY_CONCORRENCIA = int(os.getenv("BOT_IDENTIFY_CONCORRENCIA", "1") or "1")
+# Limites, histórico e IA ligada/desligada iguais em todos os processos
+ESTADO_DB = os.getenv("BOT_ESTADO_DB", "estado.db")
+
+def opcoes_bot() -> dict:
+    if MODO_ENXUTO:
+        intents = discord.Intents.none()
+        intents.guilds = True
+        intents.guild_messages = True
+        intents.dm_messages = True
+        intents.message_content = True
+        intents.members = INTENT_MEMBROS
+        opcoes = {
+            "intents": intents,
+            "member_cache_flags": discord.MemberCacheFlags.none(),
+            "chunk_guilds_at_startup": False,
+            "max_messages": None,  # o bot nunca lê o cache de mensagens
+        }
+    else:
+        opcoes = {"intents": discord.Intents.all()}
+    if MULTIPROCESSO:
+        opcoes["shard_count"] = BOT_SHARDS
+        opcoes["shard_ids"] = list(range(int(BOT_PROCESSO), BOT_SHARDS, BOT_PROCESSOS))
+    elif BOT_SHARDS:
+        opcoes["shard_count"] = BOT_SHARDS
+    return opcoes
+
+class Bot(commands.AutoShardedBot if MULTIPROCESSO or BOT_SHARDS else commands.Bot):
+    async def setup_hook(self):
+        await iniciar_servicos()
+
+    async def before_identify_hook(self, shard_id, *, initial=False):
+        if estado is None:
+            return await super().before_identify_hook(shard_id, initial=initial)
+        # O limite de IDENTIFY do Discord vale para a soma dos processos
+        espera = await estado.executar(estado.reservar_identificacao, (shard_id or 0) % IDENTIFY_CONCORRENCIA)
+        await asyncio.sleep(espera)
+
+    async def close(self):
+        await encerrar_servicos()
+        await super().close()
+
+bot = Bot(command_prefix="!", **opcoes_bot())
 
 # ==============================
 # SISTEMAS
 # ==============================
 gpt_ativo = True
-memoria = {}
-logs_ia = []
-uso_por_usuario = defaultdict(list)
 
 LIMITE_USOS = 20
 JANELA_HORAS = 2
+estado = EstadoCompartilhado(ESTADO_DB) if MULTIPROCESSO else None
+if estado is not None:
+    limitador = LimitadorCompartilhado(estado, LIMITE_USOS, JANELA_HORAS * 3600)
+else:
+    limitador = LimitadorJanela(LIMITE_USOS, JANELA_HORAS * 3600)
+
+async def usar_limitador(metodo: str, *args):
+    """Chama o limitador; o compartilhado vai ao banco na thread do estado, fora do loop."""
+    funcao = getattr(limitador, metodo)
+    if estado is None:
+        return funcao(*args)
+    return await estado.executar(funcao, *args)
+
+async def ia_ativa() -> bool:
+    if estado is None:
+        return gpt_ativo
+    return await estado.executar(estado.flag, "gpt_ativo", True)
+
+async def definir_ia_ativa(valor: bool):
+    global gpt_ativo
+    gpt_ativo = valor
+    if estado is not None:
+        await estado.executar(estado.definir_flag, "gpt_ativo", valor)
 MODEL = "gemini-2.0-flash"
+# Níveis de modelo: conversa curta no leve, código/sites/conversas longas no
+# pesado. Se o p95 do pesado (até o 1º trecho) passar do limite, cede ao leve;
+# com IA_STREAM=0 não há 1º trecho medido e o desvio fica desligado na prática
+IA_ROTEAMENTO = os.getenv("IA_ROTEAMENTO", "1") != "0"
+IA_MODELO_LEVE = os.getenv("IA_MODELO_LEVE", "gemini-2.0-flash-lite")
+IA_MODELO_PESADO = os.getenv("IA_MODELO_PESADO", MODEL)
+IA_MAX_SAIDA_LEVE = int(os.getenv("IA_MAX_SAIDA_LEVE", "2048"))
+IA_MAX_SAIDA_PESADO = int(os.getenv("IA_MAX_SAIDA_PESADO", "8192"))
+IA_P95_LEVE = float(os.getenv("IA_P95_LEVE", "8"))  # segundos
+IA_P95_PESADO = float(os.getenv("IA_P95_PESADO", "15"))
+IA_JANELA_LATENCIA = float(os.getenv("IA_JANELA_LATENCIA", "300"))  # segundos
+GEMINI_MAX_CONCORRENCIA = int(os.getenv("GEMINI_MAX_CONCORRENCIA", "8"))  # gerações simultâneas
+IA_MAX_FILA = int(os.getenv("IA_MAX_FILA", "50"))  # pedidos esperando; acima disso recusa na hora
+GEMINI_TIMEOUT = int(os.getenv("GEMINI_TIMEOUT", "120"))  # segundos
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")  # outro endpoint da API (proxy, servidor falso do bench)
+GEMINI_TENTATIVAS = int(os.getenv("GEMINI_TENTATIVAS", "4"))
+DISJUNTOR_FALHAS = int(os.getenv("DISJUNTOR_FALHAS", "5"))  # falhas seguidas até abrir
+DISJUNTOR_TEMPO = float(os.getenv("DISJUNTOR_TEMPO", "30"))  # segundos aberto
+CACHE_PROMPT_ATIVO = os.getenv("GEMINI_CACHE_PROMPT", "1") != "0"  # SYSTEM_PROMPT em cache no servidor
+CACHE_PROMPT_TTL = int(os.getenv("GEMINI_CACHE_TTL", "3600"))  # segundos
+CACHE_RESPOSTAS_ATIVO = os.getenv("IA_CACHE_RESPOSTAS", "0") == "1"  # perguntas repetidas sem histórico
+CACHE_RESPOSTAS_MB = int(os.getenv("IA_CACHE_RESPOSTAS_MB", "32"))
+CACHE_RESPOSTAS_TTL = int(os.getenv("IA_CACHE_RESPOSTAS_TTL", "3600"))  # segundos
+
+# Memória de conversa
+MEMORIA_TURNOS = int(os.getenv("MEMORIA_TURNOS", "40"))  # teto de mensagens por usuário
+MEMORIA_TOKENS = int(os.getenv("MEMORIA_TOKENS", "6000"))  # orçamento do histórico enviado (0 desliga)
+MEMORIA_RESUMO = os.getenv("MEMORIA_RESUMO", "1") != "0"  # o que sai do orçamento vira resumo
+MEMORIA_CODIGO_LINHAS = int(os.getenv("MEMORIA_CODIGO_LINHAS", "12"))  # blocos antigos maiores viram aviso (0 desliga)
+MEMORIA_MAX_SESSOES = int(os.getenv("MEMORIA_MAX_SESSOES", "10000"))
+MEMORIA_MAX_MB = int(os.getenv("MEMORIA_MAX_MB", "64"))
+MEMORIA_TTL_HORAS = float(os.getenv("MEMORIA_TTL_HORAS", "12"))
+# Imagens
+HF_MODEL_URL = os.getenv(
+    "HF_MODEL_URL",
+    "https://router.huggingface.co/hf-inference/models/stabilityai/stable-diffusion-xl-base-1.0"
+)
+IMG_TRABALHADORES = int(os.getenv("IMG_TRABALHADORES", "2"))  # gerações SDXL simultâneas
+IMG_MAX_FILA = int(os.getenv("IMG_MAX_FILA", "30"))
+IMG_CONEXOES = int(os.getenv("IMG_CONEXOES", "10"))  # conexões no pool HTTP
+HF_PRAZO = float(os.getenv("HF_PRAZO", "110"))  # segundos no total por imagem
+HF_HEDGE = os.getenv("HF_HEDGE", "1") != "0"  # segunda tentativa se a primeira demorar
+HF_HEDGE_PERCENTIL = float(os.getenv("HF_HEDGE_PERCENTIL", "0.9"))
+IMG_CACHE_DIR = os.getenv("IMG_CACHE_DIR", "cache_imagens")  # vazio desativa o cache em disco
+IMG_CACHE_MB = int(os.getenv("IMG_CACHE_MB", "512"))
+# Transcodificação antes do upload (precisa de Pillow)
+IMG_TRANSCODIFICAR = os.getenv("IMG_TRANSCODIFICAR", "1") != "0"
+IMG_FORMATOS = tuple(f.strip() for f in os.getenv("IMG_FORMATOS", "webp,jpeg").split(",") if f.strip())
+IMG_QUALIDADE = int(os.getenv("IMG_QUALIDADE", "85"))
+IMG_LADO_MAX = int(os.getenv("IMG_LADO_MAX", "0"))  # 0 mantém o tamanho original
+IMG_PROCESSOS = int(os.getenv("IMG_PROCESSOS", "1"))
+
+HISTORICO_DB = os.getenv("IA_HISTORICO_DB")  # ex.: historico.db — vazio desativa
+if MULTIPROCESSO and not HISTORICO_DB:
+    # O contexto precisa valer em qualquer shard; em arquivo próprio, os lotes
+    # do histórico não disputam a trava do banco com o limite de uso
+    HISTORICO_DB = f"{os.path.splitext(ESTADO_DB)[0]}_historico.db"
+HISTORICO_RETENCAO = int(os.getenv("IA_HISTORICO_RETENCAO", "50"))  # mensagens por usuário no disco
+
+# Streaming — publica a resposta enquanto o Gemini gera
+STREAM_ATIVO = os.getenv("IA_STREAM", "1") != "0"
+STREAM_INTERVALO = float(os.getenv("IA_STREAM_INTERVALO", "1.2"))  # segundos entre prévias num mesmo canal
+LIMITE_MENSAGEM = 1900
+
+# Métricas no formato Prometheus em http://METRICAS_HOST:METRICAS_PORTA/metrics
+# (0 desativa); no modo multiprocesso cada processo usa a porta + BOT_PROCESSO
+METRICAS_PORTA = int(os.getenv("METRICAS_PORTA", "9108"))
+if METRICAS_PORTA and MULTIPROCESSO:
+    METRICAS_PORTA += int(BOT_PROCESSO)
+METRICAS_HOST = os.getenv("METRICAS_HOST", "127.0.0.1")
+
+# Vigia do loop: mede o atraso a cada VIGIA_INTERVALO s e, se o loop ficar
+# preso por mais de VIGIA_LIMITE_MS, mostra no console a pilha onde parou
+VIGIA_ATIVO = os.getenv("VIGIA_ATIVO", "1") != "0"
+VIGIA_INTERVALO = float(os.getenv("VIGIA_INTERVALO", "0.05"))
+VIGIA_LIMITE_MS = float(os.getenv("VIGIA_LIMITE_MS", "100"))
+PERFIL_MAX_SEGUNDOS = 60  # teto do !perfil
+
+# Diário dos pedidos: últimos LOGS_MEMORIA em memória e tudo em JSONL na
+# pasta LOGS_DIR (vazio desativa o disco), rotacionado a cada LOGS_ARQUIVO_MB
+LOGS_DIR = os.getenv("LOGS_DIR", "logs")
+LOGS_ARQUIVO_MB = float(os.getenv("LOGS_ARQUIVO_MB", "5"))
+LOGS_ARQUIVOS = int(os.getenv("LOGS_ARQUIVOS", "10"))
+LOGS_MEMORIA = int(os.getenv("LOGS_MEMORIA", "1000"))
 
 # ==============================
 # SYSTEM PROMPT ULTRA-PROFISSIONAL
@@ -134,89 +317,418 @@ COMPORTAMENTO E PERSONALIDADE
 • Sempre entregue MAIS do que foi pedido — surpreenda positivamente.
 • Seu objetivo final: fazer o usuário sentir que tem o melhor assistente de programação do mundo."""
 
+HASH_SYSTEM_PROMPT = hashlib.sha256(SYSTEM_PROMPT.encode("utf-8")).hexdigest()[:16]
+
 # ==============================
-# MAPEAMENTO — extensão por linguagem
+# MÉTRICAS
 # ==============================
-EXTENSOES = {
-    "python": "py", "py": "py",
-    "html": "html", "css": "css",
-    "javascript": "js", "js": "js",
-    "typescript": "ts", "ts": "ts",
-    "sql": "sql", "bash": "sh",
-    "shell": "sh", "sh": "sh",
-    "java": "java", "c": "c",
-    "cpp": "cpp", "c++": "cpp",
-    "php": "php", "json": "json",
-    "yaml": "yml", "xml": "xml",
-    "rust": "rs", "go": "go",
-    "kotlin": "kt", "swift": "swift",
-    "r": "r", "ruby": "rb",
-    "vue": "vue", "react": "jsx",
-    "jsx": "jsx", "tsx": "tsx",
-}
+metricas = Registro()
+m_fila_ia = metricas.histograma("bot_ia_fila_segundos", "Espera na fila do Gemini até o pedido começar")
+m_gemini_ttft = metricas.histograma(
+    "bot_gemini_primeiro_trecho_segundos", "Tempo até o primeiro trecho do Gemini", rotulos=("nivel",)
+)
+m_gemini = metricas.histograma(
+    "bot_gemini_segundos", "Geração completa no Gemini, com novas tentativas", rotulos=("nivel",)
+)
+m_hf = metricas.histograma("bot_hf_segundos", "Geração de imagem no Hugging Face")
+m_transcodificacao = metricas.histograma(
+    "bot_img_transcodificacao_segundos", "Transcodificação da imagem antes do upload", RAPIDO
+)
+m_discord = metricas.histograma(
+    "bot_discord_envio_segundos", "Envio ou edição de uma mensagem de resposta no Discord", RAPIDO, ("operacao",)
+)
+m_tokens = metricas.contador("bot_gemini_tokens_total", "Tokens do Gemini segundo o usage_metadata", ("tipo",))
+m_pedidos = metricas.contador("bot_pedidos_total", "Pedidos aceitos (já dentro do limite de uso)", ("comando",))
+m_erros = metricas.contador("bot_erros_total", "Pedidos que terminaram em erro", ("comando", "tipo"))
+m_em_andamento = metricas.medidor("bot_em_andamento", "Pedidos sendo atendidos agora", ("comando",))
+m_loop = metricas.histograma("bot_loop_atraso_segundos", "Atraso do loop de eventos a cada tique do vigia", RAPIDO)
+m_resumos = metricas.contador("bot_resumos_total", "Resumos de conversa por resultado", ("resultado",))
+
+def _filas() -> dict:
+    return {
+        ("ia",): agendador.na_fila,
+        ("img",): len(fila_imagens) if fila_imagens is not None else 0,
+    }
+
+def _consultas_cache() -> dict:
+    valores = {}
+    if cache_respostas is not None:
+        valores[("respostas", "acerto")] = cache_respostas.acertos
+        valores[("respostas", "coalescido")] = cache_respostas.coalescidos
+        valores[("respostas", "falta")] = cache_respostas.faltas
+    if cache_imagens is not None:
+        valores[("imagens", "acerto")] = cache_imagens.acertos
+        valores[("imagens", "falta")] = cache_imagens.faltas
+    return valores
+
+metricas.medidor("bot_fila", "Pedidos esperando vez", ("fila",), funcao=_filas)
+metricas.medidor("bot_gemini_ativos", "Gerações em andamento no Gemini", funcao=lambda: agendador.ativos)
+metricas.contador("bot_cache_consultas_total", "Consultas aos caches por resultado", ("cache", "resultado"),
+                  funcao=_consultas_cache)
+metricas.medidor("bot_memoria_sessoes", "Conversas na memória", funcao=lambda: memoria.estatisticas()["sessoes"])
+metricas.medidor("bot_resumos_em_andamento", "Resumos de conversa na fila ou rodando",
+                 funcao=lambda: len(resumos_em_andamento))
+metricas.contador("bot_loop_travamentos_total", f"Vezes que o loop ficou preso por mais de {VIGIA_LIMITE_MS:.0f} ms",
+                  funcao=lambda: vigia.travamentos if vigia is not None else 0)
+
+roteador = Roteador(
+    Nivel("leve", IA_MODELO_LEVE, IA_MAX_SAIDA_LEVE, IA_P95_LEVE),
+    Nivel("pesado", IA_MODELO_PESADO, IA_MAX_SAIDA_PESADO, IA_P95_PESADO),
+    ativo=IA_ROTEAMENTO,
+    janela=IA_JANELA_LATENCIA,
+)
+metricas.contador("bot_ia_desvios_total", "Pedidos desviados para o nível rápido por latência",
+                  funcao=lambda: roteador.desvios)
+
+# Estágios mostrados no !perf: (nome, histograma, rótulos)
+ESTAGIOS = (
+    ("Fila IA", m_fila_ia, ()),
+    ("Gemini 1º trecho (leve)", m_gemini_ttft, ("leve",)),
+    ("Gemini 1º trecho (pesado)", m_gemini_ttft, ("pesado",)),
+    ("Gemini total (leve)", m_gemini, ("leve",)),
+    ("Gemini total (pesado)", m_gemini, ("pesado",)),
+    ("Hugging Face", m_hf, ()),
+    ("Transcodificação", m_transcodificacao, ()),
+    ("Discord envio", m_discord, ("envio",)),
+    ("Discord edição", m_discord, ("edicao",)),
+    ("Atraso do loop", m_loop, ()),
+)
+
+# Dados do pedido em andamento para o diário ({"tokens": {...}, "nivel": ...});
+# cada comando roda na sua task
+pedido_atual = contextvars.ContextVar("pedido_atual", default=None)
+
+def registrar_uso(uso):
+    """Soma os tokens do usage_metadata de uma resposta do Gemini."""
+    if uso is None:
+        return
+    pedido = pedido_atual.get()
+    for tipo, campo in (
+        ("entrada", "prompt_token_count"),
+        ("saida", "candidates_token_count"),
+        ("cache", "cached_content_token_count"),
+        ("raciocinio", "thoughts_token_count"),
+    ):
+        valor = getattr(uso, campo, None)
+        if valor:
+            m_tokens.inc(tipo, valor=valor)
+            if pedido is not None:
+                pedido["tokens"][tipo] = pedido["tokens"].get(tipo, 0) + valor
 
 # ==============================
-# HELPER — verifica limite de uso
+# HELPER — diário de pedidos
 # ==============================
-def verificar_limite(user_id: int) -> tuple[bool, int]:
-    agora = datetime.now()
-    corte = agora - timedelta(hours=JANELA_HORAS)
-    uso_por_usuario[user_id] = [t for t in uso_por_usuario[user_id] if t > corte]
-    usos = len(uso_por_usuario[user_id])
-    if usos >= LIMITE_USOS:
-        return False, 0
-    uso_por_usuario[user_id].append(agora)
-    return True, LIMITE_USOS - usos - 1
+def registrar_pedido(tipo: str, autor, guild, texto: str, inicio: float, resultado: str, pedido: dict = None):
+    pedido = pedido or {}
+    diario.registrar({
+        "ts": time.time(),
+        "tipo": tipo,
+        "usuario": autor.id,
+        "nome": str(autor),
+        "guilda": guild.id if guild else None,
+        "hash": hash_pergunta(texto),
+        "prefixo": texto[:80],
+        "latencia": round(time.monotonic() - inicio, 3),
+        "tokens": pedido.get("tokens", {}),
+        "nivel": pedido.get("nivel"),
+        "modelo": pedido.get("modelo"),
+        "motivo": pedido.get("motivo"),
+        "resultado": resultado,
+    })
 
 # ==============================
-# HELPER — extrai blocos de código
+# HELPER — verifica limite de uso
 # ==============================
-def extrair_blocos_codigo(texto: str):
-    padrao = r"```(\w+)?\n([\s\S]*?)```"
-    matches = re.findall(padrao, texto)
-    return [(lang.lower() if lang else "txt", code.strip()) for lang, code in matches]
+async def verificar_limite(user_id: int) -> tuple[bool, int]:
+    return await usar_limitador("consumir", user_id)
 
 # ==============================
 # HELPER — envia resposta inteligente
 # ==============================
+def _arquivo(anexo: Anexo) -> discord.File:
+    return discord.File(fp=io.BytesIO(anexo.conteudo.encode("utf-8")), filename=anexo.nome)
+
 async def enviar_resposta(destino, autor, texto: str):
-    blocos = extrair_blocos_codigo(texto)
-    mencao = autor.mention
-    texto_limpo = re.sub(r"```(\w+)?\n[\s\S]*?```", "", texto).strip()
-    arquivos = []
-
-    if blocos:
-        contagem = defaultdict(int)
-        for lang, codigo in blocos:
-            ext = EXTENSOES.get(lang, "txt")
-            contagem[ext] += 1
-            count = contagem[ext]
-            nome = f"codigo_{count}.{ext}" if count > 1 else f"codigo.{ext}"
-            arquivos.append(discord.File(
-                fp=io.BytesIO(codigo.encode("utf-8")),
-                filename=nome
-            ))
-
-        if texto_limpo:
-            partes = [texto_limpo[i:i+1900] for i in range(0, len(texto_limpo), 1900)]
-            for i, parte in enumerate(partes):
-                prefix = f"{mencao} " if i == 0 else ""
-                if i == len(partes) - 1 and arquivos:
-                    await destino.send(f"{prefix}{parte}", files=arquivos)
-                else:
-                    await destino.send(f"{prefix}{parte}")
+    """Envia a resposta completa mantendo a ordem: cada mensagem de texto
+    leva os anexos dos blocos de código que vinham logo depois dela."""
+    formatador = FormatadorMarkdown(LIMITE_MENSAGEM)
+    mensagens = []  # [(texto, [Anexo])]
+    for evento in formatador.alimentar(texto) + formatador.finalizar():
+        if isinstance(evento, Texto):
+            mensagens.append((evento.conteudo, []))
+        elif mensagens and len(mensagens[-1][1]) < 10:  # máximo de anexos por mensagem
+            mensagens[-1][1].append(evento)
         else:
-            await destino.send(f"{mencao} Aqui está o código:", files=arquivos)
+            mensagens.append(("", [evento]))
+
+    if not mensagens:
+        await destino.send(f"{autor.mention} (a IA não retornou texto)")
+        return
+    for i, (conteudo, anexos) in enumerate(mensagens):
+        if i == 0:
+            conteudo = f"{autor.mention} {conteudo or 'Aqui está o código:'}"
+        with m_discord.medir("envio"):
+            await destino.send(conteudo or None, files=[_arquivo(a) for a in anexos])
+
+# ==============================
+# HELPER — resposta em streaming
+# ==============================
+publicacoes_canal = {}  # channel_id → última publicação de qualquer resposta em streaming
+
+class RespostaStream:
+    """Publica a resposta no canal conforme os trechos chegam do Gemini.
+
+    O FormatadorMarkdown decide os cortes; aqui só se publica. As prévias
+    da mensagem em formação saem no máximo a cada STREAM_INTERVALO segundos
+    por canal, somando todas as respostas em andamento nele (o limite do
+    Discord é por canal). A mensagem é fechada quando o formatador emite o
+    texto definitivo dela, e cada bloco de código vira anexo assim que o
+    ``` de fechamento chega; esses não esperam, mas contam para o ritmo.
+    """
+
+    INDICADOR_CODIGO = "⌛ *gerando código...*"
+
+    def __init__(self, destino, autor):
+        self.destino = destino
+        self.autor = autor
+        self.formatador = FormatadorMarkdown(LIMITE_MENSAGEM)
+        self.mensagem = None
+        self.prefixo = f"{autor.mention} "  # só a primeira mensagem menciona
+        self.canal = getattr(destino, "id", None)
+        self.enviou_algo = False
+
+    async def alimentar(self, trecho: str):
+        for evento in self.formatador.alimentar(trecho):
+            await self._tratar(evento)
+        if time.monotonic() - publicacoes_canal.get(self.canal, 0.0) >= STREAM_INTERVALO:
+            await self._publicar(self._previa())
+
+    def _previa(self) -> str:
+        """Prosa pendente que cabe numa mensagem (a linha em curso pode ser enorme)."""
+        conteudo = self.formatador.pendente.strip()
+        sufixo = f"\n{self.INDICADOR_CODIGO}" if self.formatador.em_codigo else ""
+        limite = LIMITE_MENSAGEM - len(self.prefixo) - len(sufixo)
+        if len(conteudo) > limite:
+            # O formatador ainda vai cortar esse texto; a prévia mostra o começo,
+            # até a última linha inteira, que é o que fica nesta mensagem
+            corte = conteudo.rfind("\n", 0, limite)
+            conteudo = conteudo[:corte if corte > 0 else limite].rstrip()
+        return f"{conteudo}{sufixo}".strip()
+
+    async def finalizar(self):
+        for evento in self.formatador.finalizar():
+            await self._tratar(evento)
+        if not self.enviou_algo:
+            await self.destino.send(f"{self.autor.mention} (a IA não retornou texto)")
+
+    async def _tratar(self, evento):
+        if isinstance(evento, Texto):
+            # Texto definitivo da mensagem atual: publica e passa para a próxima
+            await self._publicar(evento.conteudo)
+        else:
+            arquivo = _arquivo(evento)
+            conteudo = f"{self.prefixo}Aqui está o código:" if self.prefixo else None
+            if self.mensagem is not None:
+                # Mensagem só com o indicador de código: vira o próprio anexo
+                with m_discord.medir("edicao"):
+                    await self.mensagem.edit(content=conteudo, attachments=[arquivo])
+            else:
+                with m_discord.medir("envio"):
+                    await self.destino.send(conteudo, file=arquivo)
+            self.enviou_algo = True
+            publicacoes_canal[self.canal] = time.monotonic()
+        self.mensagem = None
+        self.prefixo = ""
+
+    async def _publicar(self, texto: str):
+        if not texto:
+            return
+        conteudo = f"{self.prefixo}{texto}"
+        if self.mensagem is None:
+            with m_discord.medir("envio"):
+                self.mensagem = await self.destino.send(conteudo)
+        elif self.mensagem.content != conteudo:
+            with m_discord.medir("edicao"):
+                self.mensagem = await self.mensagem.edit(content=conteudo)
+        self.enviou_algo = True
+        publicacoes_canal[self.canal] = time.monotonic()
+
+# ==============================
+# SERVIÇOS — cliente Gemini compartilhado
+# ==============================
+genai = None  # google.genai, importado por carregar_genai()
+types = None
+gemini = None
+trava_gemini = asyncio.Lock()
+agendador = AgendadorIA(GEMINI_MAX_CONCORRENCIA, IA_MAX_FILA)
+
+def _content(papel: str, texto: str):
+    return types.Content(role=papel, parts=[types.Part(text=texto)])
+
+memoria = SessaoStore(
+    _content,
+    max_turnos=MEMORIA_TURNOS,
+    max_sessoes=MEMORIA_MAX_SESSOES,
+    max_bytes=MEMORIA_MAX_MB * 1024 * 1024,
+    ttl_ocioso=MEMORIA_TTL_HORAS * 3600,
+    orcamento_tokens=MEMORIA_TOKENS,
+    compactar=partial(omitir_codigo, min_linhas=MEMORIA_CODIGO_LINHAS) if MEMORIA_CODIGO_LINHAS else None,
+    resumir=MEMORIA_RESUMO,
+)
+resumos_em_andamento = {}  # user_id → task do resumo da conversa
+
+historico = None  # HistoricoSQLite quando IA_HISTORICO_DB está configurado
+sessao_http = None  # aiohttp.ClientSession compartilhada (Hugging Face)
+politica_hf = None
+fila_imagens = None
+processos_img = None  # ProcessPoolExecutor da transcodificação
+cache_imagens = CacheImagens(IMG_CACHE_DIR, IMG_CACHE_MB * 1024 * 1024) if IMG_CACHE_DIR else None
+caches_prompt = {}  # (cliente, modelo) → CacheSystemPrompt (o cache pertence ao projeto da chave e ao modelo)
+
+cache_respostas = (
+    CacheRespostas(max_bytes=CACHE_RESPOSTAS_MB * 1024 * 1024, ttl=CACHE_RESPOSTAS_TTL)
+    if CACHE_RESPOSTAS_ATIVO else None
+)
+servidor_metricas = None  # web.AppRunner do /metrics
+diario = DiarioIA(
+    LOGS_DIR or None,
+    nome=f"ia-p{BOT_PROCESSO}" if MULTIPROCESSO else "ia",  # um arquivo por processo
+    max_bytes=int(LOGS_ARQUIVO_MB * 1024 * 1024),
+    max_arquivos=LOGS_ARQUIVOS,
+    memoria=LOGS_MEMORIA,
+)
+vigia = Vigia(VIGIA_LIMITE_MS / 1000, VIGIA_INTERVALO, ao_medir=m_loop.observar) if VIGIA_ATIVO else None
+perfil_rodando = False
+
+def config_prompt(cliente, modelo: str) -> dict:
+    cache = caches_prompt.get((cliente, modelo))
+    return cache.config() if cache else {"system_instruction": SYSTEM_PROMPT}
+
+@tasks.loop(minutes=1)
+async def renovar_caches():
+    for cache in caches_prompt.values():
+        await cache.renovar_se_preciso()
+
+@tasks.loop(minutes=10)
+async def manutencao():
+    memoria.varrer()
+    await usar_limitador("varrer")
+    corte = time.monotonic() - STREAM_INTERVALO
+    for canal in [c for c, instante in publicacoes_canal.items() if instante < corte]:
+        del publicacoes_canal[canal]
+
+async def carregar_genai():
+    global genai, types
+    if genai is None:
+        # O import leva ~1 s de CPU: numa thread, sem travar o loop
+        genai = await asyncio.to_thread(importlib.import_module, "google.genai")
+        types = genai.types
 
-    elif len(texto) > 1900:
-        arquivo = discord.File(
-            fp=io.BytesIO(texto.encode("utf-8")),
-            filename="resposta.txt"
+async def iniciar_gemini():
+    global gemini
+    await carregar_genai()
+    # Um cliente assíncrono por chave: reaproveita a conexão HTTP entre pedidos
+    chaves = [
+        Chave(f"chave {i + 1}", genai.Client(
+            api_key=chave,
+            http_options=types.HttpOptions(timeout=GEMINI_TIMEOUT * 1000, base_url=GEMINI_BASE_URL),
+        ))
+        for i, chave in enumerate(GEMINI_API_KEYS)
+    ]
+    gemini = Resiliente(
+        PoolChaves(chaves),
+        CircuitBreaker(DISJUNTOR_FALHAS, DISJUNTOR_TEMPO),
+        tentativas=GEMINI_TENTATIVAS,
+    )
+    if CACHE_PROMPT_ATIVO:
+        modelos = {nivel.modelo for nivel in roteador.niveis.values()}
+        for chave in chaves:
+            for modelo in modelos:
+                caches_prompt[(chave.cliente, modelo)] = CacheSystemPrompt(
+                    chave.cliente.aio.caches, modelo, SYSTEM_PROMPT, ttl=CACHE_PROMPT_TTL
+                )
+        await asyncio.gather(*(cache.iniciar() for cache in caches_prompt.values()))
+        renovar_caches.start()
+
+async def preparar_gemini():
+    """Garante o Gemini pronto; no modo enxuto ele nasce no primeiro pedido."""
+    if gemini is not None:
+        return
+    async with trava_gemini:
+        if gemini is None:
+            await iniciar_gemini()
+
+async def iniciar_servicos():
+    """Cria os clientes de longa duração usados por todos os comandos."""
+    global historico, sessao_http, politica_hf, fila_imagens, processos_img, servidor_metricas
+    if METRICAS_PORTA:
+        try:
+            servidor_metricas = await servir(metricas, METRICAS_HOST, METRICAS_PORTA)
+            print(f"[METRICAS] http://{METRICAS_HOST}:{METRICAS_PORTA}/metrics")
+        except OSError as e:
+            print(f"[METRICAS] Não foi possível abrir a porta {METRICAS_PORTA}: {e}")
+    if vigia is not None:
+        vigia.iniciar()
+    await diario.abrir()
+    if not MODO_ENXUTO and GEMINI_API_KEYS:
+        await iniciar_gemini()
+    # Sessão HTTP de longa duração: conexões TLS reaproveitadas entre imagens
+    sessao_http = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=IMG_CONEXOES, ttl_dns_cache=300, keepalive_timeout=60)
+    )
+    politica_hf = PoliticaHF(
+        sessao_http, HF_MODEL_URL, HF_TOKEN,
+        prazo=HF_PRAZO, hedge=HF_HEDGE, hedge_percentil=HF_HEDGE_PERCENTIL,
+    )
+    fila_imagens = FilaImagens(gerar_imagem, trabalhadores=IMG_TRABALHADORES, max_fila=IMG_MAX_FILA)
+    fila_imagens.iniciar()
+    if cache_imagens is not None:
+        await cache_imagens.abrir()
+    if IMG_TRANSCODIFICAR and transcodificar.DISPONIVEL:
+        # fork a partir deste processo (vigia, executores, to_thread) pode herdar
+        # uma trava presa; o forkserver é um processo limpo, sem threads, que já
+        # importou este módulo (guardado por __main__) e faz fork dos trabalhadores
+        metodo = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        processos_img = ProcessPoolExecutor(
+            max_workers=IMG_PROCESSOS, mp_context=multiprocessing.get_context(metodo)
         )
-        await destino.send(f"{mencao} A resposta foi longa, veja o arquivo:", file=arquivo)
+    if HISTORICO_DB:
+        historico = HistoricoSQLite(HISTORICO_DB, retencao=HISTORICO_RETENCAO)
+        await historico.abrir()
+    manutencao.start()
 
-    else:
-        await destino.send(f"{mencao} {texto}")
+async def encerrar_servicos():
+    global gemini, historico, sessao_http, fila_imagens, processos_img, servidor_metricas
+    manutencao.cancel()
+    if servidor_metricas is not None:
+        await servidor_metricas.cleanup()
+        servidor_metricas = None
+    if vigia is not None:
+        await vigia.encerrar()
+    await diario.fechar()
+    if processos_img is not None:
+        processos_img.shutdown(wait=False, cancel_futures=True)
+        processos_img = None
+    if fila_imagens is not None:
+        await fila_imagens.encerrar()
+        fila_imagens = None
+    if sessao_http is not None:
+        await sessao_http.close()
+        sessao_http = None
+    if historico is not None:
+        await historico.fechar()
+        historico = None
+    for tarefa in list(resumos_em_andamento.values()):
+        tarefa.cancel()
+    renovar_caches.cancel()
+    for cache in caches_prompt.values():
+        await cache.encerrar()
+    caches_prompt.clear()
+    if gemini is not None:
+        for chave in gemini.pool.chaves:
+            await chave.cliente.aio.aclose()
+            chave.cliente.close()
+        gemini = None
 
 # ==============================
 # EVENTO READY
@@ -224,8 +736,11 @@ async def enviar_resposta(destino, autor, texto: str):
 @bot.event
 async def on_ready():
     print(f"🔥 Bot online como {bot.user}")
-    print(f"📡 Modelo: {MODEL}")
-    print(f"🔑 Gemini Key: {GEMINI_API_KEY[:10] if GEMINI_API_KEY else '❌ NÃO ENCONTRADA'}...")
+    if bot.shard_count:
+        print(f"🧩 Shards {list(bot.shard_ids or range(bot.shard_count))} de {bot.shard_count}")
+    print(f"📡 Modelos: leve {roteador.leve.modelo} • pesado {roteador.pesado.modelo}"
+          f"{'' if roteador.ativo else ' (roteamento desligado)'}")
+    print(f"🔑 Gemini Keys: {len(GEMINI_API_KEYS) if GEMINI_API_KEYS else '❌ NÃO ENCONTRADA'}")
     print(f"🎨 HF Token: {'✅ configurado' if HF_TOKEN else '❌ não configurado'}")
     await bot.change_presence(
         activity=discord.Activity(
@@ -237,130 +752,348 @@ async def on_ready():
 # ==============================
 # IA PRINCIPAL — Google Gemini (novo SDK)
 # ==============================
-async def responder_ia(autor, pergunta: str) -> str:
-    user_id = autor.id
+async def carregar_historico(user_id: int):
+    if historico is None:
+        return
+    versao = None
+    if MULTIPROCESSO:
+        # Outro processo pode ter conversado com o usuário desde a última vez
+        versao = await historico.ultimo_id(user_id)
+        if user_id in memoria and memoria.versao(user_id) == versao:
+            return
+        memoria.apagar(user_id)
+    elif user_id in memoria:
+        return
+    # Primeira conversa desde o boot (ou após despejo): recupera do disco
+    for papel, texto in await historico.carregar(user_id, MEMORIA_TURNOS):
+        memoria.adicionar(user_id, papel, texto)
+    memoria.marcar(user_id, versao)
 
-    if user_id not in memoria:
-        memoria[user_id] = []
+def chave_cache(user_id: int, pergunta: str, nivel: Nivel) -> str | None:
+    """Chave do cache de respostas; None se o cache está desligado ou há histórico.
 
-    if len(memoria[user_id]) > 20:
-        memoria[user_id] = memoria[user_id][-20:]
+    Usa o nível que vai de fato gerar: com o pesado degradado o pedido cai
+    no leve, e essa resposta não pode servir depois como se fosse do pesado.
+    """
+    if cache_respostas is None or memoria.tamanho(user_id):
+        return None
+    return chave_resposta(pergunta, nivel.modelo, HASH_SYSTEM_PROMPT)
 
-    memoria[user_id].append({"role": "user", "content": pergunta})
+async def gerar_resposta(contents: list, nivel: Nivel, ao_receber=None) -> str:
+    trechos = []
+    inicio = time.monotonic()
 
-    # Monta histórico no formato do novo SDK
-    historico = []
-    for msg in memoria[user_id][:-1]:
-        role = "user" if msg["role"] == "user" else "model"
-        historico.append(types.Content(
-            role=role,
-            parts=[types.Part(text=msg["content"])]
-        ))
+    def primeiro_trecho():
+        duracao = time.monotonic() - inicio
+        m_gemini_ttft.observar(duracao, nivel.nome)
+        roteador.registrar(nivel, duracao)
 
-    # Adiciona a pergunta atual
-    historico.append(types.Content(
-        role="user",
-        parts=[types.Part(text=pergunta)]
-    ))
-
-    client = genai.Client(api_key=GEMINI_API_KEY)
-
-    response = await asyncio.to_thread(
-        client.models.generate_content,
-        model=MODEL,
-        contents=historico,
-        config=types.GenerateContentConfig(
-            system_instruction=SYSTEM_PROMPT,
-            max_output_tokens=8192,
-            temperature=0.7,
+    async def gerar_com(cliente):
+        parametros = dict(
+            model=nivel.modelo,
+            contents=contents,
+            config=types.GenerateContentConfig(
+                **config_prompt(cliente, nivel.modelo),
+                max_output_tokens=nivel.max_saida,
+                temperature=0.7,
+            )
         )
-    )
+        if ao_receber:
+            # Streaming: repassa cada trecho assim que chega
+            uso = None
+            async for chunk in await cliente.aio.models.generate_content_stream(**parametros):
+                uso = chunk.usage_metadata or uso  # o último trecho traz o total
+                if chunk.text:
+                    if not trechos:
+                        primeiro_trecho()
+                    trechos.append(chunk.text)
+                    await ao_receber(chunk.text)
+            registrar_uso(uso)
+            return "".join(trechos)
+        response = await cliente.aio.models.generate_content(**parametros)
+        # Sem streaming não há 1º trecho: o tempo é o da geração inteira, que
+        # cresce com a resposta e não serve para o TTFT nem para o roteador
+        registrar_uso(response.usage_metadata)
+        return response.text
 
-    resposta = response.text
-    memoria[user_id].append({"role": "assistant", "content": resposta})
-    logs_ia.append(
-        f"[{datetime.now().strftime('%d/%m %H:%M:%S')}] {autor} ({autor.id}): {pergunta[:80]}"
-    )
+    async def gerar(cliente):
+        cache = caches_prompt.get((cliente, nivel.modelo))
+        try:
+            return await gerar_com(cliente)
+        except Exception as e:
+            if not (cache and cache.ativo) or trechos or not cache_recusado(e):
+                raise
+            # Cache expirado/apagado no servidor: repete com o prompt inline
+            cache.invalidar()
+            return await gerar_com(cliente)
+
+    # Só repete enquanto nada foi mostrado ao usuário
+    resposta = await gemini.executar(gerar, repetivel=lambda: not trechos)
+    m_gemini.observar(time.monotonic() - inicio, nivel.nome)
+    return resposta
+
+async def responder_ia(autor, pergunta: str, ao_receber=None) -> str:
+    user_id = autor.id
+    await carregar_historico(user_id)
+    nivel, motivo = roteador.escolher(pergunta, memoria.tokens(user_id))
+    chave = chave_cache(user_id, pergunta, nivel)
+    pedido = pedido_atual.get()
+    if pedido is not None:
+        pedido.update(nivel=nivel.nome, modelo=nivel.modelo, motivo=motivo)
+
+    # Só a pergunta nova vira Content; o resto do histórico já está montado
+    memoria.adicionar(user_id, "user", pergunta)
+    contents = memoria.conteudos(user_id)
+
+    if chave is None:
+        resposta = await gerar_resposta(contents, nivel, ao_receber)
+    else:
+        resposta, origem = await cache_respostas.obter_ou_gerar(
+            chave, lambda: gerar_resposta(contents, nivel, ao_receber)
+        )
+        if origem != "gerado" and ao_receber:
+            # Veio pronta do cache ou de outro pedido igual: entrega de uma vez
+            await ao_receber(resposta)
+
+    # Contagem real da resposta (usage_metadata), quando ela foi gerada agora
+    memoria.adicionar(user_id, "model", resposta, tokens=(pedido or {}).get("tokens", {}).get("saida"))
+    if historico is not None:
+        historico.registrar(user_id, "user", pergunta)
+        historico.registrar(user_id, "model", resposta)
+        if MULTIPROCESSO:
+            # Grava já: a próxima mensagem pode cair em outro processo
+            memoria.marcar(user_id, await historico.ultimo_id(user_id))
 
     return resposta
 
+# ==============================
+# RESUMO DA CONVERSA — roda depois da resposta entregue
+# ==============================
+PROMPT_RESUMO = (
+    "Você resume conversas entre um usuário e um assistente de programação. Escreva em português, "
+    "em até 150 palavras, só o que ajuda a continuar a conversa: objetivo do usuário, decisões, "
+    "nomes de arquivos e tecnologias, pendências. Não inclua código."
+)
+GRUPO_RESUMOS = -1  # grupo próprio no rodízio do agendador, como se fosse mais um servidor
+
+def agendar_resumo(user_id: int):
+    if not MEMORIA_RESUMO or user_id in resumos_em_andamento or not memoria.pendentes_resumo(user_id)[1]:
+        return
+    tarefa = asyncio.create_task(resumir_conversa(user_id))
+    resumos_em_andamento[user_id] = tarefa
+    tarefa.add_done_callback(lambda _: resumos_em_andamento.pop(user_id, None))
+
+async def resumir_conversa(user_id: int):
+    pedido_atual.set(None)  # tokens do resumo não entram no registro do pedido
+    anterior, fora = memoria.pendentes_resumo(user_id)
+    mensagens = "\n\n".join(
+        f"{'Usuário' if papel == 'user' else 'Assistente'}: {truncar(omitir_codigo(texto, min_linhas=1), 1500)}"
+        for papel, texto in fora
+    )
+    pedido = f"Resumo anterior:\n{anterior or '(nenhum)'}\n\nMensagens a incluir:\n{mensagens}"
+
+    async def gerar(cliente):
+        response = await cliente.aio.models.generate_content(
+            model=roteador.leve.modelo,
+            contents=pedido,
+            config=types.GenerateContentConfig(
+                system_instruction=PROMPT_RESUMO, max_output_tokens=400, temperature=0.2
+            ),
+        )
+        registrar_uso(response.usage_metadata)
+        return response.text
+
+    try:
+        # Pelo agendador: o resumo ocupa uma das vagas de GEMINI_MAX_CONCORRENCIA.
+        # Com id negativo não segura a próxima pergunta do usuário (definir_resumo
+        # já descarta o resultado se a conversa mudou no meio)
+        resumo = await agendador.executar(-user_id, GRUPO_RESUMOS, lambda: gemini.executar(gerar))
+    except FilaCheia:
+        m_resumos.inc("adiado")  # os turnos continuam pendentes; tenta após a próxima resposta
+        return
+    except Exception as e:
+        m_resumos.inc("erro")
+        print(f"[RESUMO] Falha ao resumir a conversa de {user_id}: {e}")
+        return
+    m_resumos.inc("ok" if resumo and memoria.definir_resumo(user_id, resumo.strip(), fora) else "descartado")
+
 # ==============================
 # GERAÇÃO DE IMAGEM — Hugging Face Router
 # ==============================
-async def gerar_imagem(prompt: str) -> bytes | None:
-    url = "https://router.huggingface.co/hf-inference/models/stabilityai/stable-diffusion-xl-base-1.0"
-    headers = {"Authorization": f"Bearer {HF_TOKEN}"}
-    payload = {"inputs": prompt}
+async def gerar_imagem(prompt: str) -> bytes:
+    inicio = time.monotonic()
+    imagem = await politica_hf.gerar(prompt)
+    m_hf.observar(time.monotonic() - inicio)
+    return imagem
 
-    tentativas = 3
-    for i in range(tentativas):
-        try:
-            print(f"[IMG] Tentativa {i+1}/3")
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    url,
-                    headers=headers,
-                    json=payload,
-                    timeout=aiohttp.ClientTimeout(total=120)
-                ) as resp:
-                    print(f"[IMG] Status: {resp.status}")
-                    if resp.status == 200:
-                        content_type = resp.headers.get("Content-Type", "")
-                        if "image" in content_type:
-                            return await resp.read()
-                        else:
-                            dados = await resp.json()
-                            print(f"[IMG] Resposta inesperada: {dados}")
-                    elif resp.status == 503:
-                        print("[IMG] Modelo carregando, aguardando 20s...")
-                        await asyncio.sleep(20)
-                        continue
-                    elif resp.status == 401:
-                        print("[IMG] ❌ HF_TOKEN inválido ou sem permissão!")
-                        return None
-                    else:
-                        texto = await resp.text()
-                        print(f"[IMG] Erro {resp.status}: {texto[:200]}")
-        except asyncio.TimeoutError:
-            print(f"[IMG] Timeout na tentativa {i+1}")
-        except Exception as e:
-            print(f"[IMG] Exceção: {e}")
+# ==============================
+# PÓS-PROCESSAMENTO — transcodifica fora do loop
+# ==============================
+async def otimizar_imagem(imagem: bytes) -> bytes:
+    if processos_img is None:
+        return imagem
+    loop = asyncio.get_running_loop()
+    try:
+        with m_transcodificacao.medir():
+            final, formato = await loop.run_in_executor(
+                processos_img,
+                partial(transcodificar.transcodificar, imagem, IMG_FORMATOS, IMG_QUALIDADE, IMG_LADO_MAX),
+            )
+    except Exception as e:
+        print(f"[IMG] Falha ao transcodificar, enviando original: {e}")
+        return imagem
+    print(f"[IMG] {len(imagem)} → {len(final)} bytes ({formato})")
+    return final
 
-        if i < tentativas - 1:
-            await asyncio.sleep(5)
+def formatar_bytes(n: int) -> str:
+    return f"{n / 1024 / 1024:.1f} MB" if n >= 1024 * 1024 else f"{n / 1024:.0f} KB"
 
-    return None
+# ==============================
+# HELPER — gera e entrega a resposta no canal
+# ==============================
+async def responder_e_enviar(destino, autor, pergunta: str):
+    if STREAM_ATIVO:
+        await destino.typing()
+        stream = RespostaStream(destino, autor)
+        await responder_ia(autor, pergunta, ao_receber=stream.alimentar)
+        await stream.finalizar()
+    else:
+        async with destino.typing():
+            resposta = await responder_ia(autor, pergunta)
+        await enviar_resposta(destino, autor, resposta)
+    agendar_resumo(autor.id)
 
 # ==============================
-# COMANDO !ia
+# HELPER — aviso de posição na fila
 # ==============================
-@bot.command()
-@commands.cooldown(1, 10, commands.BucketType.user)
-async def ia(ctx, *, pergunta: str):
-    if not gpt_ativo:
-        return await ctx.send("❌ IA está desativada pelo dono.")
+class AvisoFila:
+    """Mensagem "na fila" editada no lugar enquanto o pedido espera a vez."""
+
+    INTERVALO = 3.0  # segundos entre edições
+
+    def __init__(self, destino, autor):
+        self.destino = destino
+        self.autor = autor
+        self.mensagem = None
+        self.ultima_edicao = 0.0
+
+    async def atualizar(self, posicao: int):
+        agora = time.monotonic()
+        if self.mensagem is not None and agora - self.ultima_edicao < self.INTERVALO:
+            return
+        texto = (
+            f"⏳ {self.autor.mention} você está na fila: posição **{posicao}** "
+            f"(~{agendador.eta(posicao):.0f}s)"
+        )
+        try:
+            if self.mensagem is None:
+                self.mensagem = await self.destino.send(texto)
+            else:
+                await self.mensagem.edit(content=texto)
+        except discord.HTTPException:
+            pass
+        self.ultima_edicao = agora
+
+    async def remover(self):
+        if self.mensagem is not None:
+            try:
+                await self.mensagem.delete()
+            except discord.HTTPException:
+                pass
+            self.mensagem = None
 
-    pode, restantes = verificar_limite(ctx.author.id)
+# ==============================
+# HELPER — fluxo completo de uma pergunta (limite → resposta → aviso)
+# ==============================
+async def atender_pergunta(destino, autor, pergunta: str):
+    if not GEMINI_API_KEYS:
+        # Sem chave o !img continua funcionando; só a IA fica de fora
+        return await destino.send(f"❌ {autor.mention} IA sem chave configurada (GEMINI_API_KEY).")
+    await preparar_gemini()
+    if gemini.disjuntor.estado == "aberto":
+        return await destino.send(
+            f"🔌 {autor.mention} a IA está instável no momento. "
+            f"Tente de novo em ~**{gemini.disjuntor.reabre_em():.0f}s**."
+        )
+
+    pode, restantes = await verificar_limite(autor.id)
     if not pode:
-        mais_antigo = uso_por_usuario[ctx.author.id][0]
-        libera_em = mais_antigo + timedelta(hours=JANELA_HORAS)
-        minutos = int((libera_em - datetime.now()).total_seconds() / 60)
-        return await ctx.send(
-            f"⛔ {ctx.author.mention} você atingiu o limite de **{LIMITE_USOS} usos** "
+        minutos = int(await usar_limitador("espera", autor.id) / 60)
+        return await destino.send(
+            f"⛔ {autor.mention} você atingiu o limite de **{LIMITE_USOS} usos** "
             f"nas últimas {JANELA_HORAS}h. Tente novamente em ~**{minutos} min**."
         )
 
+    guild = getattr(destino, "guild", None)
+    aviso = AvisoFila(destino, autor)
+    enfileirado = None  # só conta a espera de quem passou pelo agendador
+
+    async def gerar():
+        if enfileirado is not None:
+            m_fila_ia.observar(time.monotonic() - enfileirado)
+        await aviso.remover()
+        await responder_e_enviar(destino, autor, pergunta)
+
+    m_pedidos.inc("ia")
+    m_em_andamento.inc("ia")
+    inicio = time.monotonic()
+    pedido = {"tokens": {}}
+    contexto_pedido = pedido_atual.set(pedido)
+    resultado = "ok"
     try:
-        async with ctx.typing():
-            resposta = await responder_ia(ctx.author, pergunta)
-        await enviar_resposta(ctx.channel, ctx.author, resposta)
+        await carregar_historico(autor.id)
+        nivel, _ = roteador.prever(pergunta, memoria.tokens(autor.id))
+        chave = chave_cache(autor.id, pergunta, nivel)
+        if chave is not None and cache_respostas.disponivel(chave):
+            # Resposta pronta (ou já sendo gerada): não ocupa vaga do Gemini
+            await gerar()
+        else:
+            enfileirado = time.monotonic()
+            await agendador.executar(
+                autor.id, guild.id if guild else 0, gerar, ao_mudar_posicao=aviso.atualizar
+            )
 
         if restantes <= 3:
-            await ctx.send(
-                f"⚠️ {ctx.author.mention} você tem apenas **{restantes}** uso(s) restante(s) nas próximas {JANELA_HORAS}h."
+            await destino.send(
+                f"⚠️ {autor.mention} você tem apenas **{restantes}** uso(s) restante(s) nas próximas {JANELA_HORAS}h."
             )
+    except FilaCheia as e:
+        m_erros.inc("ia", type(e).__name__)
+        resultado = type(e).__name__
+        await usar_limitador("devolver", autor.id)
+        await destino.send(
+            f"🚦 {autor.mention} muita gente usando a IA agora. Tente de novo em ~**{e.eta:.0f}s**."
+        )
+    except CircuitoAberto as e:
+        m_erros.inc("ia", type(e).__name__)
+        resultado = type(e).__name__
+        await usar_limitador("devolver", autor.id)
+        await destino.send(
+            f"🔌 {autor.mention} a IA está instável no momento. Tente de novo em ~**{e.reabre_em:.0f}s**."
+        )
     except Exception as e:
-        await ctx.send(f"❌ Erro: {e}")
+        m_erros.inc("ia", type(e).__name__)
+        resultado = type(e).__name__
+        if status_do_erro(e) in REPETIVEIS:
+            await destino.send(f"⚠️ {autor.mention} a IA está sobrecarregada agora. Tente de novo em instantes.")
+        else:
+            await destino.send(f"❌ Erro: {e}")
+    finally:
+        m_em_andamento.dec("ia")
+        pedido_atual.reset(contexto_pedido)
+        registrar_pedido("ia", autor, guild, pergunta, inicio, resultado, pedido)
+        await aviso.remover()
+
+# ==============================
+# COMANDO !ia
+# ==============================
+@bot.command()
+@commands.cooldown(1, 10, commands.BucketType.user)
+async def ia(ctx, *, pergunta: str):
+    if not await ia_ativa():
+        return await ctx.send("❌ IA está desativada pelo dono.")
+
+    await atender_pergunta(ctx.channel, ctx.author, pergunta)
 
 @ia.error
 async def ia_error(ctx, error):
@@ -372,40 +1105,134 @@ async def ia_error(ctx, error):
 # ==============================
 # COMANDO !img
 # ==============================
+class ProgressoImagem:
+    """Edita a mensagem "Gerando imagem" com a posição na fila e o tempo decorrido."""
+
+    INTERVALO = 3.0  # segundos entre edições
+
+    def __init__(self, mensagem, autor):
+        self.mensagem = mensagem
+        self.autor = autor
+        self.ultima_edicao = time.monotonic()  # a mensagem acabou de ser enviada
+        self.ultimo_texto = mensagem.content
+
+    async def atualizar(self, posicao: int, decorrido: float):
+        if posicao:
+            texto = (
+                f"🎨 {self.autor.mention} Na fila de imagens: posição **{posicao}** "
+                f"(~{fila_imagens.eta(posicao):.0f}s)"
+            )
+        elif decorrido:
+            texto = f"🎨 {self.autor.mention} Gerando imagem... **{decorrido:.0f}s**"
+        else:
+            texto = f"🎨 {self.autor.mention} Gerando imagem, aguarde... (pode levar até 30s)"
+        agora = time.monotonic()
+        if texto == self.ultimo_texto or agora - self.ultima_edicao < self.INTERVALO:
+            return
+        try:
+            await self.mensagem.edit(content=texto)
+        except discord.HTTPException:
+            pass
+        self.ultima_edicao = agora
+        self.ultimo_texto = texto
+
+async def enviar_imagem(ctx, descricao: str, imagem: bytes, do_cache: bool = False, tamanho_original: int = 0):
+    formato = transcodificar.formato_de(imagem)
+    nome = f"imagem.{transcodificar.EXTENSOES_IMAGEM.get(formato, 'png')}"
+    arquivo = discord.File(fp=io.BytesIO(imagem), filename=nome)
+    embed = discord.Embed(
+        title="🎨 Imagem Gerada",
+        description=f"**Prompt:** {descricao}",
+        color=discord.Color.purple()
+    )
+    embed.set_image(url=f"attachment://{nome}")
+    rodape = f"Gerado por {ctx.author.display_name} • Stable Diffusion XL"
+    if tamanho_original:
+        rodape += f" • {formatar_bytes(tamanho_original)} → {formatar_bytes(len(imagem))} {formato.upper()}"
+    if do_cache:
+        rodape += " • do cache (use --novo para outra variação)"
+    embed.set_footer(text=rodape)
+    with m_discord.medir("envio"):
+        await ctx.send(embed=embed, file=arquivo)
+
 @bot.command()
 @commands.cooldown(1, 30, commands.BucketType.user)
 async def img(ctx, *, descricao: str):
     if not HF_TOKEN:
         return await ctx.send("❌ HF_TOKEN não configurado. Adicione a variável no Railway.")
 
+    # "--novo" pede uma variação nova em vez da imagem guardada
+    partes = descricao.split()
+    novo = "--novo" in partes
+    if novo:
+        descricao = " ".join(p for p in partes if p != "--novo")
+        if not descricao:
+            return await ctx.send("❓ Uso: `!img [--novo] <descrição da imagem>`")
+
+    chave = chave_imagem(descricao, HF_MODEL_URL)
+    if cache_imagens is not None and not novo:
+        imagem = await cache_imagens.obter(chave)
+        if imagem:
+            return await enviar_imagem(ctx, descricao, imagem, do_cache=True)
+
+    if politica_hf.disjuntor.estado == "aberto":
+        return await ctx.send(
+            f"🔌 {ctx.author.mention} o serviço de imagens está fora do ar. "
+            f"Tente de novo em ~**{politica_hf.disjuntor.reabre_em():.0f}s**."
+        )
+
     msg = await ctx.send(f"🎨 {ctx.author.mention} Gerando imagem, aguarde... (pode levar até 30s)")
+    progresso = ProgressoImagem(msg, ctx.author)
+    m_pedidos.inc("img")
+    m_em_andamento.inc("img")
+    inicio = time.monotonic()
+    resultado = "ok"
     try:
-        imagem = await gerar_imagem(descricao)
+        imagem = await fila_imagens.executar(descricao, ao_atualizar=progresso.atualizar)
 
         if imagem:
-            arquivo = discord.File(fp=io.BytesIO(imagem), filename="imagem.png")
-            embed = discord.Embed(
-                title="🎨 Imagem Gerada",
-                description=f"**Prompt:** {descricao}",
-                color=discord.Color.purple()
-            )
-            embed.set_image(url="attachment://imagem.png")
-            embed.set_footer(text=f"Gerado por {ctx.author.display_name} • Stable Diffusion XL")
+            final = await otimizar_imagem(imagem)
             await msg.delete()
-            await ctx.send(embed=embed, file=arquivo)
+            await enviar_imagem(ctx, descricao, final, tamanho_original=len(imagem))
+            if cache_imagens is not None:
+                await cache_imagens.guardar(chave, final)  # depois da entrega; falha só é registrada
         else:
+            m_erros.inc("img", "SemImagem")
+            resultado = "SemImagem"
             await msg.edit(
                 content=f"❌ {ctx.author.mention} Não foi possível gerar a imagem. Verifique o console."
             )
+    except FilaCheia as e:
+        m_erros.inc("img", type(e).__name__)
+        resultado = type(e).__name__
+        await msg.edit(
+            content=f"🚦 {ctx.author.mention} fila de imagens cheia. Tente de novo em ~**{e.eta:.0f}s**."
+        )
+    except CircuitoAberto as e:
+        m_erros.inc("img", type(e).__name__)
+        resultado = type(e).__name__
+        await msg.edit(
+            content=f"🔌 {ctx.author.mention} o serviço de imagens está fora do ar. "
+                    f"Tente de novo em ~**{e.reabre_em:.0f}s**."
+        )
+    except ErroHF as e:
+        m_erros.inc("img", type(e).__name__)
+        resultado = type(e).__name__
+        await msg.edit(content=f"❌ {ctx.author.mention} {e}")
     except Exception as e:
+        m_erros.inc("img", type(e).__name__)
+        resultado = type(e).__name__
         await msg.edit(content=f"❌ Erro ao gerar imagem: {e}")
+    finally:
+        m_em_andamento.dec("img")
+        registrar_pedido("img", ctx.author, ctx.guild, descricao, inicio, resultado)
 
 @img.error
 async def img_error(ctx, error):
     if isinstance(error, commands.CommandOnCooldown):
         await ctx.send(f"⏳ {ctx.author.mention} aguarde **{error.retry_after:.0f}s** para gerar outra imagem.")
     elif isinstance(error, commands.MissingRequiredArgument):
-        await ctx.send("❓ Uso: `!img <descrição da imagem>`")
+        await ctx.send("❓ Uso: `!img [--novo] <descrição da imagem>`")
 
 # ==============================
 # COMANDO !iaclean
@@ -415,8 +1242,10 @@ async def iaclean(ctx, membro: discord.Member = None):
     if membro and ctx.author.id != OWNER_ID:
         return await ctx.send("❌ Apenas o dono pode limpar a memória de outros usuários.")
     alvo = membro or ctx.author
-    if alvo.id in memoria:
-        del memoria[alvo.id]
+    apagou = memoria.apagar(alvo.id)
+    if historico is not None:
+        apagou = await historico.apagar(alvo.id) > 0 or apagou
+    if apagou:
         await ctx.send(f"🗑️ Memória de **{alvo.display_name}** apagada com sucesso!")
     else:
         await ctx.send(f"ℹ️ **{alvo.display_name}** ainda não tem memória salva.")
@@ -427,16 +1256,12 @@ async def iaclean(ctx, membro: discord.Member = None):
 @bot.command()
 async def iastatus(ctx):
     user_id = ctx.author.id
-    agora = datetime.now()
-    corte = agora - timedelta(hours=JANELA_HORAS)
-    usos_recentes = [t for t in uso_por_usuario[user_id] if t > corte]
-    usos_feitos = len(usos_recentes)
+    usos_feitos = await usar_limitador("usos", user_id)
     restantes = LIMITE_USOS - usos_feitos
-    mem_tamanho = len(memoria.get(user_id, []))
+    mem_tamanho = memoria.tamanho(user_id)
 
-    if usos_recentes:
-        libera_em = usos_recentes[0] + timedelta(hours=JANELA_HORAS)
-        minutos = int((libera_em - agora).total_seconds() / 60)
+    if usos_feitos:
+        minutos = int(await usar_limitador("renova_em", user_id) / 60)
         renovacao = f"**{minutos} min**"
     else:
         renovacao = "**disponível agora**"
@@ -445,8 +1270,21 @@ async def iastatus(ctx):
     embed.add_field(name="Usos nas últimas 2h", value=f"{usos_feitos}/{LIMITE_USOS}", inline=True)
     embed.add_field(name="Usos restantes", value=str(restantes), inline=True)
     embed.add_field(name="Renova em", value=renovacao, inline=True)
-    embed.add_field(name="Memória", value=f"{mem_tamanho} mensagens", inline=True)
-    embed.set_footer(text=f"IA {'✅ Ativa' if gpt_ativo else '❌ Desativada'} • Modelo: {MODEL}")
+    embed.add_field(name="Memória", value=f"{mem_tamanho} mensagens (~{memoria.tokens(user_id)} tokens)", inline=True)
+    ultima = next(
+        (r for r in reversed(diario.recentes) if r["usuario"] == user_id and r["tipo"] == "ia" and r.get("nivel")),
+        None
+    )
+    if ultima:
+        embed.add_field(
+            name="Última resposta",
+            value=f"nível **{ultima['nivel']}** (`{ultima['modelo']}`) • {ultima['motivo']}",
+            inline=False
+        )
+    embed.set_footer(
+        text=f"IA {'✅ Ativa' if await ia_ativa() else '❌ Desativada'} • "
+             f"Modelos: {roteador.leve.modelo} / {roteador.pesado.modelo}"
+    )
     await ctx.send(embed=embed)
 
 # ==============================
@@ -460,30 +1298,192 @@ def is_owner():
 @bot.command()
 @is_owner()
 async def ligar(ctx):
-    global gpt_ativo
-    gpt_ativo = True
+    await definir_ia_ativa(True)
     await ctx.send("✅ IA ativada.")
 
 @bot.command()
 @is_owner()
 async def desligar(ctx):
-    global gpt_ativo
-    gpt_ativo = False
+    await definir_ia_ativa(False)
     await ctx.send("❌ IA desativada.")
 
+UNIDADES = {"m": 60, "h": 3600, "d": 86400}
+USO_LOGS = "❓ Uso: `!logs [@user | ID] [erros] [2h | 3d-1d] [quantidade]`"
+
+def _duracao(texto: str) -> float | None:
+    if len(texto) > 1 and texto[-1] in UNIDADES and texto[:-1].isdigit():
+        return int(texto[:-1]) * UNIDADES[texto[-1]]
+    return None
+
+def interpretar_filtros(argumentos) -> tuple[Filtro, int] | None:
+    """`@user`/ID, `erros`, `2h` (últimas 2h), `3d-1d` (de 3 a 1 dia atrás) e
+    um número (quantos registros). None se algum argumento não faz sentido."""
+    filtro, limite = Filtro(), 50
+    agora = time.time()
+    for arg in argumentos:
+        arg = arg.lower()
+        usuario = arg.removeprefix("<@").removeprefix("!").removesuffix(">")
+        if arg in ("erro", "erros"):
+            filtro.erros = True
+        elif usuario.isdigit() and len(usuario) >= 15:
+            filtro.usuario = int(usuario)
+        elif arg.isdigit():
+            limite = min(max(int(arg), 1), 500)
+        elif _duracao(arg) is not None:
+            filtro.desde = agora - _duracao(arg)
+        elif "-" in arg and all(_duracao(p) is not None for p in arg.split("-", 1)):
+            inicio, fim = (_duracao(p) for p in arg.split("-", 1))
+            filtro.desde, filtro.ate = agora - max(inicio, fim), agora - min(inicio, fim)
+        else:
+            return None
+    return filtro, limite
+
+def formatar_registro(r: dict) -> str:
+    quando = datetime.fromtimestamp(r["ts"]).strftime("%d/%m %H:%M:%S")
+    tokens = r.get("tokens") or {}
+    uso = f" · {tokens.get('entrada', 0)}→{tokens.get('saida', 0)} tok" if tokens else ""
+    return (
+        f"[{quando}] {r['nome']} ({r['usuario']}) · {r['tipo']} · {r['resultado']} · "
+        f"{r['latencia']:.2f}s{uso} · {r['prefixo']}"
+    )
+
 @bot.command()
 @is_owner()
-async def logs(ctx):
-    if not logs_ia:
-        return await ctx.send("ℹ️ Nenhum log ainda.")
-    texto = "\n".join(logs_ia[-15:])
+async def logs(ctx, *filtros: str):
+    interpretado = interpretar_filtros(filtros)
+    if interpretado is None:
+        return await ctx.send(USO_LOGS)
+    filtro, limite = interpretado
+    registros = await diario.consultar(filtro, limite)
+    if not registros:
+        return await ctx.send("ℹ️ Nenhum log encontrado.")
+    texto = "\n".join(formatar_registro(r) for r in reversed(registros))
     arquivo = discord.File(fp=io.BytesIO(texto.encode("utf-8")), filename="logs.txt")
-    await ctx.send("📋 Últimos logs:", file=arquivo)
+    await ctx.send(f"📋 {len(registros)} registro(s):", file=arquivo)
+
+@bot.command()
+@is_owner()
+async def iamem(ctx):
+    info = memoria.estatisticas()
+    embed = discord.Embed(title="🧠 Memória da IA", color=discord.Color.dark_teal())
+    embed.add_field(name="Sessões", value=f"{info['sessoes']}/{info['max_sessoes']}", inline=True)
+    embed.add_field(name="Mensagens", value=str(info["turnos"]), inline=True)
+    embed.add_field(
+        name="Texto guardado",
+        value=f"{info['bytes'] / 1024 / 1024:.2f}/{info['max_bytes'] / 1024 / 1024:.0f} MB",
+        inline=True
+    )
+    embed.add_field(name="Tokens no contexto", value=f"~{info['tokens']}", inline=True)
+    embed.add_field(name="Conversas com resumo", value=str(info["resumos"]), inline=True)
+    embed.add_field(name="Sessões despejadas", value=str(info["despejos"]), inline=True)
+    await ctx.send(embed=embed)
+
+@bot.command()
+@is_owner()
+async def iacache(ctx):
+    if cache_respostas is None:
+        return await ctx.send("ℹ️ Cache de respostas desativado (`IA_CACHE_RESPOSTAS=1` para ligar).")
+    info = cache_respostas.estatisticas()
+    embed = discord.Embed(title="🗃️ Cache de Respostas", color=discord.Color.dark_gold())
+    embed.add_field(name="Taxa de acerto", value=f"{info['taxa']:.1%}", inline=True)
+    embed.add_field(name="Acertos", value=str(info["acertos"]), inline=True)
+    embed.add_field(name="Coalescidos", value=str(info["coalescidos"]), inline=True)
+    embed.add_field(name="Gerados", value=str(info["faltas"]), inline=True)
+    embed.add_field(name="Entradas", value=str(info["itens"]), inline=True)
+    embed.add_field(name="Tamanho", value=f"{info['bytes'] / 1024 / 1024:.2f}/{CACHE_RESPOSTAS_MB} MB", inline=True)
+    await ctx.send(embed=embed)
+
+def formatar_segundos(s: float) -> str:
+    return f"{s * 1000:.0f} ms" if s < 1 else f"{s:.1f} s"
+
+@bot.command()
+@is_owner()
+async def perf(ctx):
+    embed = discord.Embed(
+        title="⏱️ Desempenho",
+        description="p50 / p95 / p99 das últimas amostras de cada estágio",
+        color=discord.Color.dark_orange()
+    )
+    latencias = []
+    for nome, histograma, rotulos in ESTAGIOS:
+        p = histograma.percentis(*rotulos)
+        if p:
+            latencias.append(
+                f"**{nome}:** {' / '.join(formatar_segundos(v) for v in p)} · n={histograma.total(*rotulos)}"
+            )
+    embed.add_field(name="Latência", value="\n".join(latencias) or "Sem amostras ainda.", inline=False)
+    rotas = []
+    for nivel in roteador.niveis.values():
+        p95 = roteador.p95(nivel)
+        alerta = " ⚠️" if roteador.degradado(nivel) else ""
+        rotas.append(f"{nivel.nome} `{nivel.modelo}` p95 {formatar_segundos(p95) if p95 is not None else '—'}{alerta}")
+    embed.add_field(
+        name="Roteamento (1º trecho)",
+        value="\n".join(rotas) + f"\nDesvios para o leve: {roteador.desvios}",
+        inline=False
+    )
+
+    tokens = m_tokens.coletar()
+    embed.add_field(
+        name="Tokens",
+        value=" · ".join(f"{tipo} {int(v)}" for (tipo,), v in sorted(tokens.items())) or "—",
+        inline=False
+    )
+    erros = sorted(m_erros.coletar().items(), key=lambda item: -item[1])[:10]
+    embed.add_field(
+        name="Erros",
+        value="\n".join(f"`{comando}` {tipo}: {int(v)}" for (comando, tipo), v in erros) or "Nenhum.",
+        inline=False
+    )
+    caches = []
+    if cache_respostas is not None:
+        caches.append(f"respostas {cache_respostas.estatisticas()['taxa']:.0%}")
+    if cache_imagens is not None:
+        caches.append(f"imagens {cache_imagens.estatisticas()['taxa']:.0%}")
+    embed.add_field(name="Acerto dos caches", value=" · ".join(caches) or "desativados", inline=True)
+    filas = _filas()
+    embed.add_field(
+        name="Agora",
+        value=(
+            f"IA {int(m_em_andamento.valor('ia'))} (fila {filas[('ia',)]}) · "
+            f"img {int(m_em_andamento.valor('img'))} (fila {filas[('img',)]})"
+        ),
+        inline=True
+    )
+    if servidor_metricas is not None:
+        embed.set_footer(text=f"Prometheus: http://{METRICAS_HOST}:{METRICAS_PORTA}/metrics")
+    await ctx.send(embed=embed)
+
+@bot.command()
+@is_owner()
+async def perfil(ctx, segundos: float = 10.0):
+    global perfil_rodando
+    if perfil_rodando:
+        return await ctx.send("ℹ️ Já há um perfil sendo gravado.")
+    segundos = min(max(segundos, 1.0), PERFIL_MAX_SEGUNDOS)
+    perfil_rodando = True
+    try:
+        await ctx.send(f"🔬 Amostrando o processo por **{segundos:.0f}s**...")
+        # O amostrador roda numa thread: o loop segue atendendo (e aparece no perfil)
+        pilhas, amostras = await asyncio.to_thread(amostrar, segundos)
+    finally:
+        perfil_rodando = False
+    topo = mais_vistas(pilhas, threading.current_thread().name)
+    resumo = "\n".join(f"`{funcao}` {contagem / amostras:.0%}" for funcao, contagem in topo)
+    arquivo = discord.File(
+        fp=io.BytesIO(collapsed(pilhas).encode("utf-8")),
+        filename=f"perfil-{datetime.now().strftime('%Y%m%d-%H%M%S')}.txt"
+    )
+    await ctx.send(
+        f"📈 {amostras} amostras (pilhas colapsadas, abra no speedscope ou flamegraph.pl).\n"
+        f"Mais vistas no loop:\n{resumo or 'loop ocioso'}",
+        file=arquivo
+    )
 
 @bot.command()
 @is_owner()
 async def resetusos(ctx, membro: discord.Member):
-    uso_por_usuario[membro.id] = []
+    await usar_limitador("resetar", membro.id)
     await ctx.send(f"✅ Usos de **{membro.display_name}** resetados.")
 
 # ==============================
@@ -508,14 +1508,21 @@ async def ajuda(ctx):
     )
     embed.add_field(
         name="🎨 Imagens",
-        value="`!img <descrição>` — Gera uma imagem com IA (cooldown: 30s)",
+        value=(
+            "`!img <descrição>` — Gera uma imagem com IA (cooldown: 30s)\n"
+            "`!img --novo <descrição>` — Ignora o cache e gera outra variação"
+        ),
         inline=False
     )
     embed.add_field(
         name="⚙️ Admin (só dono)",
         value=(
             "`!ligar` / `!desligar` — Liga ou desliga a IA\n"
-            "`!logs` — Vê os logs de perguntas\n"
+            "`!logs [@user] [erros] [2h]` — Vê os logs de pedidos, com filtros\n"
+            "`!iamem` — Uso de memória das conversas\n"
+            "`!iacache` — Taxa de acerto do cache de respostas\n"
+            "`!perf` — Latências (p50/p95/p99), tokens e erros\n"
+            "`!perfil [segundos]` — Perfil por amostragem do processo\n"
             "`!resetusos @user` — Reseta os usos de um usuário\n"
             "`!iaclean @user` — Limpa memória de outro usuário"
         ),
@@ -526,7 +1533,7 @@ async def ajuda(ctx):
         value=f"**{LIMITE_USOS} usos** a cada **{JANELA_HORAS}h** • Cooldown de **10s** entre mensagens • **30s** entre imagens",
         inline=False
     )
-    embed.set_footer(text=f"Modelo: {MODEL} • Imagens: Stable Diffusion XL")
+    embed.set_footer(text=f"Modelos: {roteador.leve.modelo} / {roteador.pesado.modelo} • Imagens: Stable Diffusion XL")
     await ctx.send(embed=embed)
 
 # ==============================
@@ -537,36 +1544,26 @@ async def on_message(message):
     if message.author.bot:
         return
 
-    if bot.user in message.mentions and gpt_ativo:
+    if bot.user in message.mentions and await ia_ativa():
         pergunta = message.content.replace(f"<@{bot.user.id}>", "").strip()
         if not pergunta:
             return await message.channel.send(f"{message.author.mention} Me faz uma pergunta! 😄")
 
-        pode, restantes = verificar_limite(message.author.id)
-        if not pode:
-            mais_antigo = uso_por_usuario[message.author.id][0]
-            libera_em = mais_antigo + timedelta(hours=JANELA_HORAS)
-            minutos = int((libera_em - datetime.now()).total_seconds() / 60)
-            return await message.channel.send(
-                f"⛔ {message.author.mention} você atingiu o limite de **{LIMITE_USOS} usos** "
-                f"nas últimas {JANELA_HORAS}h. Tente novamente em ~**{minutos} min**."
-            )
-
-        try:
-            async with message.channel.typing():
-                resposta = await responder_ia(message.author, pergunta)
-            await enviar_resposta(message.channel, message.author, resposta)
-
-            if restantes <= 3:
-                await message.channel.send(
-                    f"⚠️ {message.author.mention} você tem apenas **{restantes}** uso(s) restante(s) nas próximas {JANELA_HORAS}h."
-                )
-        except Exception as e:
-            await message.channel.send(f"❌ Erro: {e}")
+        await atender_pergunta(message.channel, message.author, pergunta)
 
     await bot.process_commands(message)
 
 # ==============================
 # START
 # ==============================
-bot.run(TOKEN)
+def main():
+    if BOT_PROCESSOS > 1 and not MULTIPROCESSO:
+        import supervisor
+        supervisor.rodar(os.path.abspath(__file__), TOKEN, BOT_PROCESSOS, BOT_SHARDS)
+        return
+    # SIGTERM (deploy/supervisor) encerra como Ctrl+C: fecha os serviços antes de sair
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    bot.run(TOKEN)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Métricas do bot: contadores, medidores e histogramas de latência.
+
+Tudo é atualizado no loop de eventos, sem locks. `Registro.exportar()` gera
+o formato texto do Prometheus e `servir()` publica /metrics com aiohttp no
+mesmo loop do bot. Além dos buckets cumulativos, cada histograma guarda as
+últimas amostras para o !perf calcular p50/p95/p99 exatos.
+
+Contadores e medidores aceitam `funcao`: o valor é lido na hora da
+exportação (útil para estatísticas que outro objeto já mantém).
+"""
+import math
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+
+from aiohttp import web
+
+LATENCIA = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+RAPIDO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _rotulos(nomes: tuple, valores: tuple, extra: str = "") -> str:
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _numero(valor: float) -> str:
+    if math.isinf(valor):
+        return "+Inf" if valor > 0 else "-Inf"
+    return repr(float(valor)) if not float(valor).is_integer() else str(int(valor))
+
+
+class _Metrica:
+    tipo = "untyped"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: tuple = (), funcao=None):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self.funcao = funcao  # () -> número, ou {tupla de rótulos: número}
+        self.valores: dict[tuple, float] = {}
+
+    def valor(self, *rotulos) -> float:
+        return self.coletar().get(tuple(rotulos), 0.0)
+
+    def coletar(self) -> dict[tuple, float]:
+        if self.funcao is None:
+            return self.valores
+        valores = self.funcao()
+        return valores if isinstance(valores, dict) else {(): valores}
+
+    def linhas(self) -> list[str]:
+        return [
+            f"{self.nome}{_rotulos(self.rotulos, chave)} {_numero(valor)}"
+            for chave, valor in sorted(self.coletar().items())
+        ]
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def inc(self, *rotulos, valor: float = 1.0):
+        self.valores[rotulos] = self.valores.get(rotulos, 0.0) + valor
+
+
+class Medidor(_Metrica):
+    tipo = "gauge"
+
+    def definir(self, valor: float, *rotulos):
+        self.valores[rotulos] = valor
+
+    def inc(self, *rotulos, valor: float = 1.0):
+        self.valores[rotulos] = self.valores.get(rotulos, 0.0) + valor
+
+    def dec(self, *rotulos, valor: float = 1.0):
+        self.inc(*rotulos, valor=-valor)
+
+    @contextmanager
+    def acompanhar(self, *rotulos):
+        """Conta o bloco como em andamento enquanto ele roda."""
+        self.inc(*rotulos)
+        try:
+            yield
+        finally:
+            self.dec(*rotulos)
+
+
+class _Serie:
+    __slots__ = ("contagens", "soma", "total", "recentes")
+
+    def __init__(self, buckets: int, amostras: int):
+        self.contagens = [0] * (buckets + 1)  # o último é o +Inf
+        self.soma = 0.0
+        self.total = 0
+        self.recentes = deque(maxlen=amostras)
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nome: str, ajuda: str, buckets: tuple = LATENCIA, rotulos: tuple = (),
+                 amostras: int = 2048):
+        super().__init__(nome, ajuda, rotulos)
+        self.buckets = tuple(sorted(buckets))
+        self.amostras = amostras
+        self.series: dict[tuple, _Serie] = {}
+
+    def observar(self, valor: float, *rotulos):
+        serie = self.series.get(rotulos)
+        if serie is None:
+            serie = self.series[rotulos] = _Serie(len(self.buckets), self.amostras)
+        serie.contagens[bisect_left(self.buckets, valor)] += 1
+        serie.soma += valor
+        serie.total += 1
+        serie.recentes.append(valor)
+
+    @contextmanager
+    def medir(self, *rotulos):
+        """Observa a duração do bloco (também quando ele termina em exceção)."""
+        inicio = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observar(time.monotonic() - inicio, *rotulos)
+
+    def total(self, *rotulos) -> int:
+        serie = self.series.get(rotulos)
+        return serie.total if serie else 0
+
+    def percentis(self, *rotulos, qs: tuple = (0.5, 0.95, 0.99)) -> list[float] | None:
+        """Percentis das últimas amostras (None se não houve nenhuma)."""
+        serie = self.series.get(rotulos)
+        if not serie or not serie.recentes:
+            return None
+        ordenadas = sorted(serie.recentes)
+        return [ordenadas[min(len(ordenadas) - 1, int(q * len(ordenadas)))] for q in qs]
+
+    def linhas(self) -> list[str]:
+        saida = []
+        for chave, serie in sorted(self.series.items()):
+            acumulado = 0
+            for limite, contagem in zip(self.buckets + (math.inf,), serie.contagens):
+                acumulado += contagem
+                le = 'le="' + _numero(limite) + '"'
+                saida.append(f"{self.nome}_bucket{_rotulos(self.rotulos, chave, le)} {acumulado}")
+            saida.append(f"{self.nome}_sum{_rotulos(self.rotulos, chave)} {_numero(serie.soma)}")
+            saida.append(f"{self.nome}_count{_rotulos(self.rotulos, chave)} {serie.total}")
+        return saida
+
+
+class Registro:
+    def __init__(self):
+        self.metricas: dict[str, _Metrica] = {}
+
+    def _registrar(self, metrica: _Metrica):
+        if metrica.nome in self.metricas:
+            raise ValueError(f"métrica duplicada: {metrica.nome}")
+        self.metricas[metrica.nome] = metrica
+        return metrica
+
+    def contador(self, nome: str, ajuda: str, rotulos: tuple = (), funcao=None) -> Contador:
+        return self._registrar(Contador(nome, ajuda, rotulos, funcao))
+
+    def medidor(self, nome: str, ajuda: str, rotulos: tuple = (), funcao=None) -> Medidor:
+        return self._registrar(Medidor(nome, ajuda, rotulos, funcao))
+
+    def histograma(self, nome: str, ajuda: str, buckets: tuple = LATENCIA, rotulos: tuple = ()) -> Histograma:
+        return self._registrar(Histograma(nome, ajuda, buckets, rotulos))
+
+    def exportar(self) -> str:
+        linhas = []
+        for metrica in self.metricas.values():
+            try:
+                amostras = metrica.linhas()
+            except Exception as e:  # uma coleta quebrada não derruba o /metrics
+                print(f"[METRICAS] Falha ao coletar {metrica.nome}: {e}")
+                continue
+            linhas.append(f"# HELP {metrica.nome} {metrica.ajuda}")
+            linhas.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+            linhas.extend(amostras)
+        return "\n".join(linhas) + "\n"
+
+
+async def servir(registro: Registro, host: str, porta: int) -> web.AppRunner:
+    """Publica GET /metrics no loop atual. Devolve o runner para `cleanup()`."""
+    async def metrics(request: web.Request) -> web.Response:
+        return web.Response(text=registro.exportar(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, porta).start()
+    return runner
@@ -0,0 +1,106 @@
+"""Histórico de conversa persistido em SQLite (modo WAL).
+
+As gravações vão para o banco em lote pela EscritaEmLote (escrita.py);
+todo acesso ao banco roda na thread dela, então o loop de eventos nunca
+espera pelo disco.
+"""
+import sqlite3
+import time
+
+from escrita import EscritaEmLote
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS mensagens (
+    id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    papel   TEXT    NOT NULL,
+    texto   TEXT    NOT NULL,
+    criado  REAL    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_mensagens_usuario ON mensagens (user_id, id);
+"""
+
+
+class HistoricoSQLite:
+    def __init__(self, caminho: str, retencao: int = 50, intervalo: float = 2.0, lote: int = 500):
+        self.caminho = caminho
+        self.retencao = retencao
+        self._conn = None
+        self._escrita = EscritaEmLote(
+            self._gravar_sync, "historico", intervalo=intervalo, lote=lote, erros=(sqlite3.Error,)
+        )
+
+    # ------------------------------
+    # Ciclo de vida
+    # ------------------------------
+    async def abrir(self):
+        await self._escrita.executar(self._abrir_sync)
+        self._escrita.iniciar()
+
+    async def fechar(self):
+        await self._escrita.encerrar(self._conn.close)
+
+    # ------------------------------
+    # API usada pelo bot
+    # ------------------------------
+    def registrar(self, user_id: int, papel: str, texto: str):
+        """Enfileira um turno; não toca no disco."""
+        self._escrita.adicionar((user_id, papel, texto, time.time()))
+
+    async def carregar(self, user_id: int, limite: int) -> list[tuple[str, str]]:
+        """Últimos `limite` turnos do usuário, do mais antigo ao mais novo."""
+        if self._tem_pendente(user_id):
+            await self.descarregar()
+        return await self._escrita.executar(self._carregar_sync, user_id, limite)
+
+    async def ultimo_id(self, user_id: int) -> int | None:
+        """Id do turno mais recente do usuário; muda a cada gravação de qualquer processo."""
+        if self._tem_pendente(user_id):
+            await self.descarregar()
+        return await self._escrita.executar(self._ultimo_id_sync, user_id)
+
+    async def apagar(self, user_id: int) -> int:
+        self._escrita.pendentes = [p for p in self._escrita.pendentes if p[0] != user_id]
+        return await self._escrita.executar(self._apagar_sync, user_id)
+
+    async def descarregar(self):
+        await self._escrita.descarregar()
+
+    # ------------------------------
+    # Interno
+    # ------------------------------
+    def _tem_pendente(self, user_id: int) -> bool:
+        return any(p[0] == user_id for p in self._escrita.pendentes)
+
+    def _abrir_sync(self):
+        self._conn = sqlite3.connect(self.caminho, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")  # o banco pode ser de vários processos
+        self._conn.executescript(ESQUEMA)
+
+    def _gravar_sync(self, lote):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO mensagens (user_id, papel, texto, criado) VALUES (?, ?, ?, ?)", lote
+            )
+            for user_id in {p[0] for p in lote}:
+                self._conn.execute(
+                    "DELETE FROM mensagens WHERE user_id = ? AND id <= ("
+                    " SELECT id FROM mensagens WHERE user_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (user_id, user_id, self.retencao),
+                )
+
+    def _carregar_sync(self, user_id, limite):
+        linhas = self._conn.execute(
+            "SELECT papel, texto FROM mensagens WHERE user_id = ? ORDER BY id DESC LIMIT ?",
+            (user_id, limite),
+        ).fetchall()
+        return linhas[::-1]
+
+    def _ultimo_id_sync(self, user_id):
+        return self._conn.execute("SELECT MAX(id) FROM mensagens WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+    def _apagar_sync(self, user_id):
+        with self._conn:
+            return self._conn.execute("DELETE FROM mensagens WHERE user_id = ?", (user_id,)).rowcount
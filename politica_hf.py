@@ -0,0 +1,177 @@
+"""Política de repetição para o router do Hugging Face (geração de imagem).
+
+- Modelo carregando (503): espera o `estimated_time` que o HF informa, em
+  vez de um valor fixo.
+- Demais falhas transitórias: backoff exponencial com jitter.
+- Prazo total: nunca segura o usuário além de `prazo` segundos.
+- Hedging opcional: se a tentativa passar do percentil de latência
+  observado, dispara uma segunda e fica com a que terminar primeiro.
+- Disjuntor: durante uma queda, falha na hora com mensagem clara.
+"""
+import asyncio
+import random
+import time
+from collections import deque
+
+import aiohttp
+
+from resiliencia import CircuitBreaker
+
+
+class ErroHF(Exception):
+    """Falha definitiva, com mensagem pronta para o usuário."""
+
+
+class _Carregando(Exception):
+    def __init__(self, espera: float):
+        self.espera = espera
+
+
+class _Transitorio(Exception):
+    def __init__(self, motivo: str, espera: float | None = None):
+        super().__init__(motivo)
+        self.espera = espera
+
+
+class PoliticaHF:
+    def __init__(self, sessao: aiohttp.ClientSession, url: str, token: str, *,
+                 prazo: float = 110.0, timeout_tentativa: float = 60.0,
+                 base: float = 1.0, teto: float = 15.0,
+                 hedge: bool = True, hedge_percentil: float = 0.9, hedge_min_amostras: int = 20,
+                 disjuntor: CircuitBreaker | None = None):
+        self.sessao = sessao
+        self.url = url
+        self.token = token
+        self.prazo = prazo
+        self.timeout_tentativa = timeout_tentativa
+        self.base = base
+        self.teto = teto
+        self.hedge = hedge
+        self.hedge_percentil = hedge_percentil
+        self.hedge_min_amostras = hedge_min_amostras
+        self.disjuntor = disjuntor or CircuitBreaker(limite_falhas=5, tempo_aberto=60)
+        self.latencias: deque[float] = deque(maxlen=200)
+        self.hedges = 0
+        self.hedges_vencedores = 0
+
+    # ------------------------------
+    # API
+    # ------------------------------
+    async def gerar(self, prompt: str) -> bytes:
+        sonda = self.disjuntor.verificar()
+        limite = time.monotonic() + self.prazo
+        tentativa = 0
+        try:
+            while True:
+                restante = limite - time.monotonic()
+                try:
+                    return await self._com_hedge(prompt, restante)
+                except _Carregando as e:
+                    # Modelo subindo: não é falha do serviço
+                    espera = e.espera * random.uniform(1.0, 1.2)
+                    motivo = f"o modelo ainda está carregando (~{e.espera:.0f}s)"
+                except _Transitorio as e:
+                    self.disjuntor.falha()
+                    sonda = self.disjuntor.verificar()
+                    espera = e.espera if e.espera is not None else self.backoff(tentativa)
+                    motivo = str(e)
+                tentativa += 1
+                if time.monotonic() + espera >= limite:
+                    raise ErroHF(f"Não foi possível gerar a imagem a tempo: {motivo}.")
+                print(f"[IMG] Tentativa {tentativa} falhou ({motivo}); nova em {espera:.1f}s")
+                await asyncio.sleep(espera)
+        finally:
+            if sonda:
+                self.disjuntor.testando = False
+
+    def backoff(self, tentativa: int) -> float:
+        return random.uniform(0, min(self.teto, self.base * 2 ** tentativa))
+
+    def limiar_hedge(self) -> float | None:
+        """Latência (s) a partir da qual vale disparar a segunda tentativa."""
+        if not self.hedge or len(self.latencias) < self.hedge_min_amostras:
+            return None
+        ordenadas = sorted(self.latencias)
+        return ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * self.hedge_percentil))]
+
+    # ------------------------------
+    # Interno
+    # ------------------------------
+    async def _com_hedge(self, prompt: str, restante: float) -> bytes:
+        limiar = self.limiar_hedge()
+        primeira = asyncio.create_task(self._tentativa(prompt, restante))
+        tarefas = {primeira}
+        try:
+            if limiar is None or limiar >= restante:
+                return await primeira
+            feitas, _ = await asyncio.wait(tarefas, timeout=limiar)
+            if feitas:
+                return primeira.result()
+
+            self.hedges += 1
+            segunda = asyncio.create_task(self._tentativa(prompt, restante - limiar))
+            tarefas.add(segunda)
+            pendentes = set(tarefas)
+            erro = None
+            while pendentes:
+                feitas, pendentes = await asyncio.wait(pendentes, return_when=asyncio.FIRST_COMPLETED)
+                for tarefa in feitas:
+                    if tarefa.exception() is None:
+                        if tarefa is segunda:
+                            self.hedges_vencedores += 1
+                        return tarefa.result()
+                    erro = tarefa.exception()
+            raise erro
+        finally:
+            for tarefa in tarefas:
+                if not tarefa.done():
+                    tarefa.cancel()
+
+    async def _tentativa(self, prompt: str, restante: float) -> bytes:
+        inicio = time.monotonic()
+        timeout = aiohttp.ClientTimeout(total=max(1.0, min(self.timeout_tentativa, restante)))
+        try:
+            async with self.sessao.post(
+                self.url,
+                headers={"Authorization": f"Bearer {self.token}"},
+                json={"inputs": prompt},
+                timeout=timeout,
+            ) as resp:
+                if resp.status == 200:
+                    if "image" in resp.headers.get("Content-Type", ""):
+                        dados = await resp.read()
+                        self.latencias.append(time.monotonic() - inicio)
+                        self.disjuntor.sucesso()
+                        return dados
+                    raise _Transitorio(f"resposta inesperada: {(await resp.text())[:200]}")
+                corpo = await self._ler_json(resp)
+                if resp.status == 503 and "estimated_time" in corpo:
+                    raise _Carregando(float(corpo["estimated_time"]))
+                if resp.status in (401, 403):
+                    self.disjuntor.sucesso()
+                    raise ErroHF("HF_TOKEN inválido ou sem permissão.")
+                if resp.status == 429:
+                    raise _Transitorio("limite de requisições do Hugging Face", _retry_after(resp))
+                if resp.status >= 500:
+                    raise _Transitorio(f"erro {resp.status} no Hugging Face", _retry_after(resp))
+                self.disjuntor.sucesso()
+                raise ErroHF(f"Pedido recusado pelo Hugging Face ({resp.status}): {corpo.get('error', '')}")
+        except asyncio.TimeoutError:
+            raise _Transitorio("tempo esgotado") from None
+        except aiohttp.ClientError as e:
+            raise _Transitorio(f"falha de conexão: {e}") from None
+
+    @staticmethod
+    async def _ler_json(resp) -> dict:
+        try:
+            dados = await resp.json(content_type=None)
+        except (ValueError, aiohttp.ClientError):
+            return {}
+        return dados if isinstance(dados, dict) else {}
+
+
+def _retry_after(resp) -> float | None:
+    try:
+        return float(resp.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
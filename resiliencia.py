@@ -0,0 +1,240 @@
+"""Camada de resiliência para APIs com cota (Gemini).
+
+- Repetição com backoff exponencial e jitter, respeitando o tempo de
+  espera sugerido pelo servidor (RetryInfo / Retry-After).
+- Disjuntor (circuit breaker): depois de falhas seguidas, recusa na hora
+  em vez de enfileirar pedidos que vão falhar.
+- Pool de chaves com saúde por chave: uma chave em 429 descansa enquanto
+  as outras continuam atendendo.
+"""
+import asyncio
+import random
+import re
+import time
+
+
+class CircuitoAberto(Exception):
+    def __init__(self, reabre_em: float):
+        super().__init__(f"serviço instável, nova tentativa em ~{reabre_em:.0f}s")
+        self.reabre_em = reabre_em
+
+
+class CircuitBreaker:
+    """Fechado → aberto após `limite_falhas` seguidas → meio-aberto após `tempo_aberto`.
+
+    No estado meio-aberto só um pedido de teste passa; se ele falhar o
+    disjuntor reabre com o dobro do tempo (até `tempo_maximo`).
+    """
+
+    def __init__(self, limite_falhas: int = 5, tempo_aberto: float = 30.0, tempo_maximo: float = 300.0):
+        self.limite_falhas = limite_falhas
+        self.tempo_base = tempo_aberto
+        self.tempo_aberto = tempo_aberto
+        self.tempo_maximo = tempo_maximo
+        self.falhas = 0
+        self.aberto_ate = 0.0
+        self.testando = False
+
+    @property
+    def estado(self) -> str:
+        if self.falhas < self.limite_falhas:
+            return "fechado"
+        return "aberto" if time.monotonic() < self.aberto_ate else "meio-aberto"
+
+    def reabre_em(self) -> float:
+        return max(0.0, self.aberto_ate - time.monotonic())
+
+    def verificar(self) -> bool:
+        """Levanta CircuitoAberto se o pedido não deve nem ser tentado.
+
+        Retorna True se este é o pedido de teste do meio-aberto: só ele
+        libera `testando` ao terminar (pedidos que começaram com o disjuntor
+        fechado e acabam durante o meio-aberto não podem soltar mais testes).
+        """
+        estado = self.estado
+        if estado == "aberto" or (estado == "meio-aberto" and self.testando):
+            raise CircuitoAberto(self.reabre_em())
+        if estado == "meio-aberto":
+            self.testando = True
+            return True
+        return False
+
+    def sucesso(self):
+        self.falhas = 0
+        self.testando = False
+        self.tempo_aberto = self.tempo_base
+
+    def falha(self):
+        if self.testando:
+            self.tempo_aberto = min(self.tempo_aberto * 2, self.tempo_maximo)
+        self.testando = False
+        self.falhas += 1
+        if self.falhas >= self.limite_falhas:
+            self.aberto_ate = time.monotonic() + self.tempo_aberto
+
+
+class Chave:
+    __slots__ = ("nome", "cliente", "em_uso", "falhas", "descansa_ate", "sucessos", "erros")
+
+    def __init__(self, nome: str, cliente):
+        self.nome = nome
+        self.cliente = cliente
+        self.em_uso = 0
+        self.falhas = 0
+        self.descansa_ate = 0.0
+        self.sucessos = 0
+        self.erros = 0
+
+
+class PoolChaves:
+    """Distribui pedidos entre as chaves saudáveis, a menos ocupada primeiro."""
+
+    def __init__(self, chaves: list[Chave]):
+        if not chaves:
+            raise ValueError("nenhuma chave configurada")
+        self.chaves = chaves
+        self._proxima = 0
+
+    def escolher(self) -> Chave | None:
+        agora = time.monotonic()
+        saudaveis = [c for c in self.chaves if c.descansa_ate <= agora]
+        if not saudaveis:
+            return None
+        # Rodízio para desempatar entre chaves igualmente ocupadas
+        self._proxima = (self._proxima + 1) % len(self.chaves)
+        return min(saudaveis, key=lambda c: (c.em_uso, (self.chaves.index(c) - self._proxima) % len(self.chaves)))
+
+    def proxima_livre_em(self) -> float:
+        return max(0.0, min(c.descansa_ate for c in self.chaves) - time.monotonic())
+
+    def sucesso(self, chave: Chave):
+        chave.falhas = 0
+        chave.sucessos += 1
+
+    def falha(self, chave: Chave, descanso: float):
+        chave.falhas += 1
+        chave.erros += 1
+        chave.descansa_ate = max(chave.descansa_ate, time.monotonic() + descanso)
+
+
+# ==============================
+# Classificação de erros
+# ==============================
+REPETIVEIS = {408, 429, 500, 502, 503, 504}
+DA_CHAVE = {401, 403}
+
+
+def status_do_erro(erro: Exception) -> int | None:
+    for atributo in ("code", "status_code", "status"):
+        valor = getattr(erro, atributo, None)
+        if isinstance(valor, int):
+            return valor
+    return None
+
+
+def eh_transitorio(erro: Exception) -> bool:
+    """Timeouts e falhas de conexão (asyncio, httpx, aiohttp)."""
+    if isinstance(erro, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    modulo = type(erro).__module__
+    return modulo.startswith(("httpx", "aiohttp")) and status_do_erro(erro) is None
+
+
+def dica_de_espera(erro: Exception) -> float | None:
+    """Tempo sugerido pelo servidor: RetryInfo.retryDelay ou cabeçalho Retry-After."""
+    pilha = [getattr(erro, "details", None)]
+    while pilha:
+        item = pilha.pop()
+        if isinstance(item, dict):
+            atraso = item.get("retryDelay")
+            if isinstance(atraso, str):
+                numero = re.match(r"([\d.]+)s", atraso)
+                if numero:
+                    return float(numero.group(1))
+            pilha.extend(item.values())
+        elif isinstance(item, list):
+            pilha.extend(item)
+
+    resposta = getattr(erro, "response", None)
+    cabecalhos = getattr(resposta, "headers", None)
+    if cabecalhos:
+        valor = cabecalhos.get("retry-after") or cabecalhos.get("Retry-After")
+        try:
+            return float(valor)
+        except (TypeError, ValueError):
+            pass
+    return None
+
+
+# ==============================
+# Execução com repetição
+# ==============================
+class Resiliente:
+    """Executa `operacao(cliente)` escolhendo chave, repetindo e alimentando o disjuntor."""
+
+    def __init__(self, pool: PoolChaves, disjuntor: CircuitBreaker, tentativas: int = 4,
+                 base: float = 1.0, teto: float = 30.0, prazo: float = 90.0):
+        self.pool = pool
+        self.disjuntor = disjuntor
+        self.tentativas = tentativas
+        self.base = base
+        self.teto = teto
+        self.prazo = prazo
+
+    def backoff(self, tentativa: int) -> float:
+        # "Full jitter": espalha as repetições de vários pedidos no tempo
+        return random.uniform(0, min(self.teto, self.base * 2 ** tentativa))
+
+    async def executar(self, operacao, repetivel=lambda: True):
+        """`repetivel()` diz se ainda dá para repetir (ex.: nada foi enviado ao usuário)."""
+        limite = time.monotonic() + self.prazo
+        tentativa = 0
+        while True:
+            chave = self.pool.escolher()
+            if chave is None:
+                espera = self.pool.proxima_livre_em()
+                if time.monotonic() + espera > limite:
+                    raise CircuitoAberto(espera)
+                await asyncio.sleep(espera)
+                continue
+
+            sonda = self.disjuntor.verificar()
+            chave.em_uso += 1
+            try:
+                resultado = await operacao(chave.cliente)
+            except Exception as erro:
+                status = status_do_erro(erro)
+                if status in DA_CHAVE:
+                    # Chave inválida ou sem permissão: tira do rodízio por um bom tempo
+                    self.pool.falha(chave, 600)
+                    if len(self.pool.chaves) == 1 or not repetivel():
+                        raise
+                    continue
+                if status not in REPETIVEIS and not eh_transitorio(erro):
+                    # O serviço respondeu; o problema é o pedido
+                    self.disjuntor.sucesso()
+                    raise
+
+                self.disjuntor.falha()
+                dica = dica_de_espera(erro)
+                espera = dica if dica is not None else self.backoff(tentativa)
+                self.pool.falha(chave, espera)
+                tentativa += 1
+                if tentativa >= self.tentativas or not repetivel():
+                    raise
+                # Outra chave saudável tenta na hora; senão espera a mais próxima
+                if self.pool.escolher() is None:
+                    espera = self.pool.proxima_livre_em()
+                    if time.monotonic() + espera > limite:
+                        raise
+                    await asyncio.sleep(espera)
+                continue
+            finally:
+                chave.em_uso -= 1
+                if sonda:
+                    # Pedido de teste (meio-aberto) terminou, bem ou mal
+                    self.disjuntor.testando = False
+
+            self.pool.sucesso(chave)
+            self.disjuntor.sucesso()
+            return resultado
@@ -0,0 +1,111 @@
+"""Roteamento de pedidos entre níveis de modelo do Gemini.
+
+Cada pedido é classificado pelo tamanho da pergunta, por pedir código ou
+site e pelo tamanho do histórico: conversa curta vai para o nível leve,
+geração pesada para o pesado, cada um com seu teto de tokens de saída.
+
+A latência de cada nível (tempo até o primeiro trecho, que não depende do
+tamanho da resposta) fica numa janela móvel de tempo. Se o p95 do nível
+escolhido passar do limite, o pedido cai para o nível mais rápido. Sem
+tráfego, as amostras ruins saem da janela e o nível volta a ser usado,
+o que serve de sondagem.
+"""
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+
+# Palavras inteiras (ou radicais, com \w*): "api" não casa com "capital" nem "terapia"
+PALAVRAS_PESADAS = (
+    r"c[óo]digos?", r"scripts?", r"fun[çc](?:ão|ao|ões|oes)", r"programa(?:s|r|ção|cao)?", r"sites?",
+    r"p[áa]ginas?", "html", "css", "javascript", "typescript", "python", "java", "sql", r"apis?",
+    r"apps?", "aplicativos?", "landing", r"componentes?", r"refator\w*", r"implement\w*", r"algoritmos?",
+)
+PADRAO_PESADO = re.compile(r"\b(?:" + "|".join(PALAVRAS_PESADAS) + r")\b")
+
+
+@dataclass
+class Nivel:
+    nome: str
+    modelo: str
+    max_saida: int      # max_output_tokens
+    limite_p95: float   # segundos até o 1º trecho; acima disso cede ao nível mais rápido
+
+
+class JanelaLatencia:
+    """Amostras dos últimos `janela` segundos (no máximo `maximo`)."""
+
+    def __init__(self, janela: float = 300.0, maximo: int = 512, relogio=time.monotonic):
+        self.janela = janela
+        self.relogio = relogio
+        self.amostras: deque[tuple[float, float]] = deque(maxlen=maximo)  # (instante, duração)
+
+    def registrar(self, duracao: float):
+        self.amostras.append((self.relogio(), duracao))
+
+    def _recentes(self) -> list[float]:
+        corte = self.relogio() - self.janela
+        while self.amostras and self.amostras[0][0] < corte:
+            self.amostras.popleft()
+        return [duracao for _, duracao in self.amostras]
+
+    def __len__(self) -> int:
+        return len(self._recentes())
+
+    def percentil(self, q: float) -> float | None:
+        valores = sorted(self._recentes())
+        if not valores:
+            return None
+        return valores[min(len(valores) - 1, int(q * len(valores)))]
+
+
+class Roteador:
+    def __init__(self, leve: Nivel, pesado: Nivel, ativo: bool = True, min_chars: int = 400,
+                 min_tokens_historico: int = 3000, janela: float = 300.0, min_amostras: int = 8):
+        self.leve = leve
+        self.pesado = pesado
+        self.ativo = ativo
+        self.min_chars = min_chars                        # pergunta longa → pesado
+        self.min_tokens_historico = min_tokens_historico  # conversa longa → pesado
+        self.min_amostras = min_amostras
+        self.niveis = {leve.nome: leve, pesado.nome: pesado}
+        self.latencias = {nome: JanelaLatencia(janela) for nome in self.niveis}
+        self.desvios = 0  # pedidos que caíram para o nível rápido
+
+    def classificar(self, pergunta: str, tokens_historico: int = 0) -> Nivel:
+        if not self.ativo:
+            return self.pesado
+        texto = pergunta.lower()
+        if (
+            len(pergunta) >= self.min_chars
+            or tokens_historico >= self.min_tokens_historico
+            or "```" in texto
+            or PADRAO_PESADO.search(texto)
+        ):
+            return self.pesado
+        return self.leve
+
+    def degradado(self, nivel: Nivel) -> bool:
+        janela = self.latencias[nivel.nome]
+        return len(janela) >= self.min_amostras and janela.percentil(0.95) > nivel.limite_p95
+
+    def prever(self, pergunta: str, tokens_historico: int = 0) -> tuple[Nivel, str]:
+        """Como `escolher`, sem contar desvio (para consultas antes do pedido)."""
+        nivel = self.classificar(pergunta, tokens_historico)
+        if nivel is self.pesado and self.ativo and self.degradado(nivel) and not self.degradado(self.leve):
+            p95 = self.latencias[nivel.nome].percentil(0.95)
+            return self.leve, f"{nivel.nome} lento (p95 {p95:.1f}s)"
+        return nivel, "classificado" if self.ativo else "roteamento desligado"
+
+    def escolher(self, pergunta: str, tokens_historico: int = 0) -> tuple[Nivel, str]:
+        """(nível, motivo); o motivo aparece no !iastatus."""
+        nivel, motivo = self.prever(pergunta, tokens_historico)
+        if nivel is not self.classificar(pergunta, tokens_historico):
+            self.desvios += 1
+        return nivel, motivo
+
+    def registrar(self, nivel: Nivel, duracao: float):
+        self.latencias[nivel.nome].registrar(duracao)
+
+    def p95(self, nivel: Nivel) -> float | None:
+        return self.latencias[nivel.nome].percentil(0.95)
@@ -0,0 +1,266 @@
+"""Memória de conversa da IA — sessões por usuário com teto global.
+
+Cada usuário tem um anel de turnos de tamanho máximo fixo e, opcionalmente,
+um orçamento de tokens: os turnos mais antigos que não cabem são cortados
+ou saem, e (com `resumir`) ficam guardados até virarem parte do resumo
+corrido da conversa, produzido fora do caminho da resposta. Respostas
+antigas do modelo podem passar por `compactar` (ex.: omitir blocos de
+código já entregues). O conjunto de sessões respeita um limite de
+quantidade e de bytes, despejando a menos usada recentemente (LRU) e as
+que ficaram ociosas além do TTL.
+"""
+import time
+from collections import OrderedDict, deque
+
+from compactacao import estimar_tokens, truncar
+
+MIN_TRUNCADO = 200  # tokens; abaixo disso o turno antigo sai inteiro em vez de ser cortado
+MAX_FORA = 40       # turnos esperando o resumo (se o resumo falhar, os mais antigos se perdem)
+
+
+class Turno:
+    """Um turno da conversa, com o `types.Content` já montado."""
+
+    __slots__ = ("papel", "texto", "tamanho", "tokens", "content")
+
+    def __init__(self, papel: str, texto: str, content, tokens: int | None = None):
+        self.papel = papel
+        self.texto = texto
+        self.tamanho = len(texto.encode("utf-8"))
+        self.tokens = tokens or estimar_tokens(texto)  # contado uma vez só
+        self.content = content
+
+
+class Sessao:
+    __slots__ = ("turnos", "bytes", "tokens", "ultimo_uso", "versao", "resumo", "resumo_contents",
+                 "resumo_tokens", "fora")
+
+    def __init__(self, max_turnos: int):
+        self.turnos = deque(maxlen=max_turnos)
+        self.bytes = 0
+        self.tokens = 0  # soma dos tokens dos turnos
+        self.ultimo_uso = time.monotonic()
+        self.versao = None  # marca de quem guarda o histórico (ex.: último id no banco)
+        self.resumo = ""
+        self.resumo_contents = []
+        self.resumo_tokens = 0
+        self.fora: list[tuple[str, str]] = []  # (papel, texto) que saíram e ainda não estão no resumo
+
+
+class SessaoStore:
+    """Guarda o histórico de cada usuário com despejo LRU e TTL de ociosidade.
+
+    `construir_content(papel, texto)` monta o objeto que vai para o modelo;
+    ele é criado uma vez por turno e reaproveitado em todas as chamadas.
+    `orcamento_tokens` (0 desliga) limita o histórico enviado, contando o
+    resumo; `compactar(texto)` é aplicado a cada resposta do modelo quando
+    chega a seguinte.
+    """
+
+    def __init__(self, construir_content, max_turnos: int = 20, max_sessoes: int = 10000,
+                 max_bytes: int = 64 * 1024 * 1024, ttl_ocioso: float = 12 * 3600,
+                 orcamento_tokens: int = 0, compactar=None, resumir: bool = False):
+        self.construir_content = construir_content
+        self.max_turnos = max_turnos
+        self.max_sessoes = max_sessoes
+        self.max_bytes = max_bytes
+        self.ttl_ocioso = ttl_ocioso
+        self.orcamento_tokens = orcamento_tokens
+        self.compactar = compactar
+        self.resumir = resumir
+        self.sessoes: OrderedDict[int, Sessao] = OrderedDict()
+        self.bytes = 0
+        self.despejos = 0
+
+    def __contains__(self, user_id: int) -> bool:
+        return self._obter(user_id) is not None
+
+    def __len__(self) -> int:
+        return len(self.sessoes)
+
+    # ------------------------------
+    # Leitura
+    # ------------------------------
+    def conteudos(self, user_id: int) -> list:
+        """Histórico pronto para o modelo (mais antigo primeiro)."""
+        sessao = self._obter(user_id)
+        if sessao is None:
+            return []
+        self.sessoes.move_to_end(user_id)
+        sessao.ultimo_uso = time.monotonic()
+        return sessao.resumo_contents + [turno.content for turno in sessao.turnos]
+
+    def turnos(self, user_id: int) -> list[Turno]:
+        sessao = self._obter(user_id)
+        return list(sessao.turnos) if sessao else []
+
+    def tamanho(self, user_id: int) -> int:
+        """Número de mensagens guardadas, sem criar sessão."""
+        sessao = self._obter(user_id)
+        return len(sessao.turnos) if sessao else 0
+
+    def tokens(self, user_id: int) -> int:
+        """Tokens (estimados) do que vai para o modelo: turnos + resumo."""
+        sessao = self._obter(user_id)
+        return sessao.tokens + sessao.resumo_tokens if sessao else 0
+
+    def versao(self, user_id: int):
+        sessao = self._obter(user_id)
+        return sessao.versao if sessao else None
+
+    def pendentes_resumo(self, user_id: int) -> tuple[str, list[tuple[str, str]]]:
+        """(resumo atual, turnos que saíram e ainda não entraram nele)."""
+        sessao = self._obter(user_id)
+        return (sessao.resumo, list(sessao.fora)) if sessao else ("", [])
+
+    # ------------------------------
+    # Escrita
+    # ------------------------------
+    def adicionar(self, user_id: int, papel: str, texto: str, tokens: int | None = None):
+        """Acrescenta um turno. `tokens`: contagem real, se já se sabe (ex.: da resposta)."""
+        sessao = self._obter(user_id)
+        if sessao is None:
+            sessao = self.sessoes[user_id] = Sessao(self.max_turnos)
+        else:
+            self.sessoes.move_to_end(user_id)
+
+        if len(sessao.turnos) == sessao.turnos.maxlen:
+            self._retirar(sessao)
+
+        if papel == "model" and self.compactar is not None:
+            # A resposta anterior deixa de ser a mais recente: compacta uma vez
+            anterior = next((t for t in reversed(sessao.turnos) if t.papel == "model"), None)
+            if anterior is not None:
+                compacto = self.compactar(anterior.texto)
+                if compacto != anterior.texto:
+                    self._substituir(sessao, anterior, compacto)
+
+        turno = Turno(papel, texto, self.construir_content(papel, texto), tokens)
+        sessao.turnos.append(turno)
+        sessao.bytes += turno.tamanho
+        sessao.tokens += turno.tokens
+        self.bytes += turno.tamanho
+        sessao.ultimo_uso = time.monotonic()
+        self._aplicar_orcamento(sessao)
+        self._aplicar_limites(preservar=user_id)
+
+    def definir_resumo(self, user_id: int, resumo: str, resumidos: list[tuple[str, str]]) -> bool:
+        """Troca o resumo por um que já inclui `resumidos` (vindos de `pendentes_resumo`).
+
+        Não faz nada se a sessão mudou nesse meio tempo (apagada, recarregada).
+        """
+        sessao = self._obter(user_id)
+        if sessao is None or sessao.fora[:len(resumidos)] != resumidos:
+            return False
+        liberados = sessao.fora[:len(resumidos)]
+        del sessao.fora[:len(resumidos)]
+        delta = len(resumo.encode("utf-8")) - len(sessao.resumo.encode("utf-8"))
+        delta -= sum(len(texto.encode("utf-8")) for _, texto in liberados)
+        sessao.bytes += delta
+        self.bytes += delta
+        sessao.resumo = resumo
+        sessao.resumo_contents = [
+            self.construir_content("user", f"Resumo da nossa conversa até aqui:\n{resumo}"),
+            self.construir_content("model", "Entendido, vou levar esse contexto em conta."),
+        ] if resumo else []
+        sessao.resumo_tokens = estimar_tokens(resumo) + 20 if resumo else 0
+        self._aplicar_orcamento(sessao)
+        return True
+
+    def marcar(self, user_id: int, versao):
+        """Anota a versão do histórico que a sessão reflete (sem efeito se não há sessão)."""
+        sessao = self._obter(user_id)
+        if sessao is not None:
+            sessao.versao = versao
+
+    def apagar(self, user_id: int) -> bool:
+        sessao = self.sessoes.pop(user_id, None)
+        if sessao is None:
+            return False
+        self.bytes -= sessao.bytes
+        return True
+
+    def varrer(self) -> int:
+        """Remove sessões ociosas além do TTL. Retorna quantas saíram."""
+        limite = time.monotonic() - self.ttl_ocioso
+        removidas = 0
+        # Ordem LRU: as ociosas estão no começo
+        while self.sessoes:
+            user_id, sessao = next(iter(self.sessoes.items()))
+            if sessao.ultimo_uso > limite:
+                break
+            self.apagar(user_id)
+            removidas += 1
+        self.despejos += removidas
+        return removidas
+
+    def estatisticas(self) -> dict:
+        turnos = sum(len(s.turnos) for s in self.sessoes.values())
+        return {
+            "sessoes": len(self.sessoes),
+            "turnos": turnos,
+            "tokens": sum(s.tokens + s.resumo_tokens for s in self.sessoes.values()),
+            "resumos": sum(1 for s in self.sessoes.values() if s.resumo),
+            "bytes": self.bytes,
+            "max_sessoes": self.max_sessoes,
+            "max_bytes": self.max_bytes,
+            "despejos": self.despejos,
+        }
+
+    # ------------------------------
+    # Interno
+    # ------------------------------
+    def _obter(self, user_id: int) -> Sessao | None:
+        sessao = self.sessoes.get(user_id)
+        if sessao is not None and time.monotonic() - sessao.ultimo_uso > self.ttl_ocioso:
+            self.apagar(user_id)
+            self.despejos += 1
+            return None
+        return sessao
+
+    def _retirar(self, sessao: Sessao):
+        """Tira o turno mais antigo; guarda-o para o resumo se for o caso."""
+        antigo = sessao.turnos.popleft()
+        sessao.tokens -= antigo.tokens
+        if self.resumir:
+            sessao.fora.append((antigo.papel, antigo.texto))
+            if len(sessao.fora) > MAX_FORA:
+                _, texto = sessao.fora.pop(0)
+                sessao.bytes -= len(texto.encode("utf-8"))
+                self.bytes -= len(texto.encode("utf-8"))
+        else:
+            sessao.bytes -= antigo.tamanho
+            self.bytes -= antigo.tamanho
+
+    def _substituir(self, sessao: Sessao, turno: Turno, texto: str):
+        novo = Turno(turno.papel, texto, self.construir_content(turno.papel, texto))
+        sessao.bytes += novo.tamanho - turno.tamanho
+        sessao.tokens += novo.tokens - turno.tokens
+        self.bytes += novo.tamanho - turno.tamanho
+        turno.texto, turno.tamanho, turno.tokens, turno.content = novo.texto, novo.tamanho, novo.tokens, novo.content
+
+    def _aplicar_orcamento(self, sessao: Sessao):
+        if not self.orcamento_tokens:
+            return
+        livre = self.orcamento_tokens - sessao.resumo_tokens
+        while sessao.tokens > livre and len(sessao.turnos) > 1:
+            antigo = sessao.turnos[0]
+            restante = antigo.tokens - (sessao.tokens - livre)
+            if restante >= MIN_TRUNCADO:
+                self._substituir(sessao, antigo, truncar(antigo.texto, restante))
+                break
+            self._retirar(sessao)
+            # O histórico não começa por uma resposta sem a pergunta
+            if len(sessao.turnos) > 1 and sessao.turnos[0].papel == "model":
+                self._retirar(sessao)
+
+    def _aplicar_limites(self, preservar: int):
+        while len(self.sessoes) > self.max_sessoes or self.bytes > self.max_bytes:
+            user_id = next(iter(self.sessoes))
+            if user_id == preservar:
+                if len(self.sessoes) == 1:
+                    break
+                self.sessoes.move_to_end(user_id)
+                continue
+            self.apagar(user_id)
+            self.despejos += 1
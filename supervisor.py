@@ -0,0 +1,110 @@
+"""Supervisor do modo multiprocesso (BOT_PROCESSOS > 1).
+
+Descobre o total de shards (BOT_SHARDS ou o recomendado pelo Discord),
+sobe um processo `main.py` por fatia com BOT_PROCESSO=i e reinicia os que
+caírem, com espera crescente. SIGTERM/SIGINT viram SIGINT nos filhos, que
+encerram os serviços (e descarregam o histórico) antes de sair.
+O processo i roda os shards i, i + N, i + 2N, ... (N = BOT_PROCESSOS).
+"""
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import discord
+
+ESPERA_MAX = 60.0     # teto da espera entre reinícios
+TEMPO_ESTAVEL = 60.0  # um filho que durou isso zera a contagem de falhas
+
+
+async def consultar_gateway(token: str) -> tuple[int, int]:
+    """(shards recomendados, max_concurrency do IDENTIFY) segundo o Discord."""
+    http = discord.http.HTTPClient(asyncio.get_running_loop())
+    try:
+        await http.static_login(token)
+        shards, _, limite = await http.get_bot_gateway()
+    finally:
+        await http.close()
+    return shards, limite.get("max_concurrency", 1)
+
+
+class Filho:
+    def __init__(self, indice: int, comando: list[str], env: dict):
+        self.indice = indice
+        self.comando = comando
+        self.env = env
+        self.processo: subprocess.Popen | None = None
+        self.inicio = 0.0
+        self.falhas = 0
+        self.reiniciar_em = 0.0
+
+    def iniciar(self):
+        self.processo = subprocess.Popen(self.comando, env=self.env)
+        self.inicio = time.monotonic()
+        print(f"[SUP] Processo {self.indice} iniciado (pid {self.processo.pid})")
+
+    def verificar(self):
+        """Agenda o reinício se o processo saiu; reinicia quando der a hora."""
+        agora = time.monotonic()
+        if self.processo is not None:
+            codigo = self.processo.poll()
+            if codigo is None:
+                return
+            self.falhas = 1 if agora - self.inicio >= TEMPO_ESTAVEL else self.falhas + 1
+            espera = min(ESPERA_MAX, 2.0 ** self.falhas)
+            print(f"[SUP] Processo {self.indice} saiu (código {codigo}); reinicia em {espera:.0f}s")
+            self.processo = None
+            self.reiniciar_em = agora + espera
+        if agora >= self.reiniciar_em:
+            self.iniciar()
+
+
+def rodar(script: str, token: str, processos: int, shards: int = 0):
+    concorrencia = int(os.getenv("BOT_IDENTIFY_CONCORRENCIA", "0"))
+    if not shards or not concorrencia:
+        recomendados, max_concorrencia = asyncio.run(consultar_gateway(token))
+        shards = shards or recomendados
+        concorrencia = concorrencia or max_concorrencia
+    processos = max(1, min(processos, shards))
+    print(f"[SUP] {shards} shards em {processos} processos (IDENTIFY: {concorrencia} por vez)")
+
+    filhos = []
+    for indice in range(processos):
+        env = dict(
+            os.environ,
+            BOT_PROCESSO=str(indice),
+            BOT_PROCESSOS=str(processos),
+            BOT_SHARDS=str(shards),
+            BOT_IDENTIFY_CONCORRENCIA=str(concorrencia),
+        )
+        filhos.append(Filho(indice, [sys.executable, script], env))
+
+    parar = False
+
+    def ao_sinal(sinal, _quadro):
+        nonlocal parar
+        parar = True
+        for filho in filhos:
+            if filho.processo is not None and filho.processo.poll() is None:
+                filho.processo.send_signal(signal.SIGINT)
+
+    signal.signal(signal.SIGTERM, ao_sinal)
+    signal.signal(signal.SIGINT, ao_sinal)
+
+    for filho in filhos:
+        filho.iniciar()
+    while not parar:
+        time.sleep(1.0)
+        if not parar:
+            for filho in filhos:
+                filho.verificar()
+
+    for filho in filhos:
+        if filho.processo is not None:
+            try:
+                filho.processo.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                filho.processo.kill()
+    print("[SUP] Encerrado")
@@ -0,0 +1,64 @@
+"""Transcodificação das imagens geradas antes do upload.
+
+O SDXL devolve PNG de ~1,5–2 MB em 1024². Aqui a imagem é recodificada em
+WebP/JPEG (e opcionalmente reduzida) e fica o formato que gerar o menor
+arquivo. `transcodificar` é uma função de módulo para poder rodar num
+ProcessPoolExecutor: o trabalho de CPU não passa pelo loop de eventos.
+
+Pillow é opcional: sem ele, `DISPONIVEL` é False e a imagem segue como veio.
+"""
+import io
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - depende do ambiente
+    Image = None
+
+DISPONIVEL = Image is not None
+FORMATOS = ("webp", "jpeg", "png")
+ASSINATURAS = {
+    b"\x89PNG": "png",
+    b"\xff\xd8\xff": "jpeg",
+    b"RIFF": "webp",
+    b"GIF8": "gif",
+}
+EXTENSOES_IMAGEM = {"png": "png", "jpeg": "jpg", "webp": "webp", "gif": "gif"}
+
+
+def formato_de(dados: bytes) -> str:
+    """Formato pelos bytes iniciais (PNG se não reconhecer)."""
+    for assinatura, formato in ASSINATURAS.items():
+        if dados.startswith(assinatura):
+            return formato
+    return "png"
+
+
+def codificar(imagem, formato: str, qualidade: int) -> bytes:
+    saida = io.BytesIO()
+    if formato == "jpeg":
+        imagem.convert("RGB").save(saida, "JPEG", quality=qualidade, optimize=True, progressive=True)
+    elif formato == "webp":
+        imagem.save(saida, "WEBP", quality=qualidade, method=4)
+    else:
+        imagem.save(saida, "PNG", optimize=True)
+    return saida.getvalue()
+
+
+def transcodificar(dados: bytes, formatos: tuple[str, ...] = ("webp", "jpeg"),
+                   qualidade: int = 85, lado_max: int = 0) -> tuple[bytes, str]:
+    """Recodifica nos `formatos` pedidos e devolve (bytes, formato) do menor.
+
+    O original entra na disputa: se nenhuma recodificação ficar menor (e a
+    imagem não foi reduzida), ele é mantido.
+    """
+    imagem = Image.open(io.BytesIO(dados))
+    imagem.load()
+    reduzida = False
+    if lado_max and max(imagem.size) > lado_max:
+        imagem.thumbnail((lado_max, lado_max), Image.LANCZOS)
+        reduzida = True
+
+    candidatos = [(codificar(imagem, formato, qualidade), formato) for formato in formatos]
+    if not reduzida:
+        candidatos.append((dados, formato_de(dados)))
+    return min(candidatos, key=lambda c: len(c[0]))
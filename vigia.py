@@ -0,0 +1,126 @@
+"""Vigia do loop de eventos e perfil por amostragem.
+
+O `Vigia` mede o atraso do loop (quanto um timer dispara depois da hora)
+e, numa thread à parte, percebe quando o loop fica preso num callback:
+passado o limite, registra a pilha da thread do loop naquele instante.
+É a mesma ideia do `slow_callback_duration` do modo debug do asyncio,
+mas sem o custo do modo debug e mostrando onde o callback está parado,
+não só qual era.
+
+`amostrar()` faz um perfil por amostragem de todas as threads do
+processo; `collapsed()` gera as pilhas no formato aceito por
+flamegraph.pl e pelo speedscope.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from contextlib import suppress
+
+
+class Vigia:
+    def __init__(self, limite: float = 0.1, intervalo: float = 0.05, ao_medir=None):
+        self.limite = limite        # segundos parado até registrar a pilha
+        self.intervalo = intervalo  # período do timer que mede o atraso
+        self.ao_medir = ao_medir    # chamado no loop com o atraso de cada tique
+        self.batida = time.monotonic()
+        self.ultimo_atraso = 0.0
+        self.travamentos = 0
+        self._id_loop = None
+        self._tarefa = None
+        self._thread = None
+        self._parar = threading.Event()
+
+    def iniciar(self):
+        """Começa a vigiar o loop atual (chamar de dentro dele)."""
+        self._id_loop = threading.get_ident()
+        self.batida = time.monotonic()
+        self._parar.clear()
+        self._tarefa = asyncio.get_running_loop().create_task(self._medir())
+        self._thread = threading.Thread(target=self._vigiar, name="vigia-loop", daemon=True)
+        self._thread.start()
+
+    async def encerrar(self):
+        self._parar.set()
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._tarefa
+            self._tarefa = None
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join)
+            self._thread = None
+
+    async def _medir(self):
+        while True:
+            esperado = time.monotonic() + self.intervalo
+            await asyncio.sleep(self.intervalo)
+            self.batida = agora = time.monotonic()
+            self.ultimo_atraso = atraso = max(0.0, agora - esperado)
+            if atraso >= self.limite:
+                print(f"[VIGIA] Loop ficou {atraso * 1000:.0f} ms sem responder")
+            if self.ao_medir:
+                self.ao_medir(atraso)
+
+    def _vigiar(self):
+        registrado = None  # batida do último travamento já registrado
+        while not self._parar.wait(self.limite / 2):
+            batida = self.batida
+            parado = time.monotonic() - batida - self.intervalo
+            if parado < self.limite or batida == registrado:
+                continue
+            registrado = batida
+            self.travamentos += 1
+            quadro = sys._current_frames().get(self._id_loop)
+            pilha = "".join(traceback.format_stack(quadro)) if quadro else "(pilha indisponível)\n"
+            print(f"[VIGIA] Loop travado há {parado * 1000:.0f} ms em:\n{pilha}", end="")
+
+
+def _pilha(quadro) -> list[str]:
+    partes = []
+    while quadro is not None:
+        codigo = quadro.f_code
+        partes.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{quadro.f_lineno})")
+        quadro = quadro.f_back
+    partes.reverse()
+    return partes
+
+
+def amostrar(segundos: float, intervalo: float = 0.005) -> tuple[Counter, int]:
+    """Amostra as pilhas de todas as threads por `segundos`.
+
+    Bloqueia quem chama: rode numa thread (asyncio.to_thread). Retorna
+    (contagem por pilha "thread;f1;f2;...", número de amostras).
+    """
+    propria = threading.get_ident()
+    nomes = {}
+    pilhas = Counter()
+    amostras = 0
+    fim = time.monotonic() + segundos
+    while time.monotonic() < fim:
+        for ident, quadro in sys._current_frames().items():
+            if ident == propria:
+                continue
+            if ident not in nomes:
+                nomes = {t.ident: t.name for t in threading.enumerate()}
+            pilhas[";".join([nomes.get(ident, f"thread-{ident}")] + _pilha(quadro))] += 1
+        amostras += 1
+        time.sleep(intervalo)
+    return pilhas, amostras
+
+
+def collapsed(pilhas: Counter) -> str:
+    return "".join(f"{pilha} {n}\n" for pilha, n in pilhas.most_common())
+
+
+def mais_vistas(pilhas: Counter, thread: str, n: int = 5) -> list[tuple[str, int]]:
+    """Funções no topo da pilha de `thread` mais vezes (sem contar a espera do select)."""
+    folhas = Counter()
+    for pilha, contagem in pilhas.items():
+        quadros = pilha.split(";")
+        if quadros[0] == thread and len(quadros) > 1 and not quadros[-1].startswith(("select (", "poll (")):
+            folhas[quadros[-1]] += contagem
+    return folhas.most_common(n)